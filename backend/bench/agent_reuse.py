@@ -0,0 +1,87 @@
+"""
+Benchmark of building the question generation agent for every request (a new GeminiModel and Agent,
+as the get_*_agent dependencies did before) against taking it from agent_registry.
+
+Times the agent lookup alone, then lookup plus a run against pydantic_ai's TestModel, which calls no
+tools and makes no network request, so only the per-request overhead around the model call is measured.
+
+    python bench/agent_reuse.py --iterations 500
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic_ai import Agent
+from pydantic_ai.models.gemini import GeminiModel
+from pydantic_ai.models.test import TestModel
+from typing import List
+from schemas import ResponseQuestions
+from utils import (
+    API_KEY, MODEL_NAME, QUESTIONS_INSTRUCTIONS, QuestionParams, SummaryQuestionGeneratorAgent,
+    _questions_prompt, agent_registry
+)
+
+
+def build_agent(tools) -> Agent:
+    agent = Agent(
+        GeminiModel(MODEL_NAME, api_key=API_KEY),
+        result_type=List[ResponseQuestions],
+        system_prompt=QUESTIONS_INSTRUCTIONS,
+        deps_type=QuestionParams,
+        tools=tools
+    )
+    agent.system_prompt(_questions_prompt)
+    return agent
+
+
+def registered_agent(tools) -> Agent:
+    return agent_registry.get_agent(
+        "questions",
+        List[ResponseQuestions],
+        system_prompt=QUESTIONS_INSTRUCTIONS,
+        prompt_builder=_questions_prompt,
+        tools=tools,
+        deps_type=QuestionParams
+    )
+
+
+async def timed(step, iterations: int) -> float:
+    """
+    Returns the mean time taken by step, in ms.
+    """
+    await step()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await step()
+    return (time.perf_counter() - started) / iterations * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    tools = SummaryQuestionGeneratorAgent().tools
+    model = TestModel(call_tools=[])
+    deps = QuestionParams(5, "easy")
+
+    for name, get_agent in (("per request", build_agent), ("registry", registered_agent)):
+        async def lookup():
+            get_agent(tools)
+
+        async def lookup_and_run():
+            await get_agent(tools).run("Document", deps=deps, model=model)
+
+        build = await timed(lookup, args.iterations)
+        run = await timed(lookup_and_run, args.iterations)
+        print(f"{name:>11}: {build:6.3f} ms to get the agent, {run:6.3f} ms to get it and run it on TestModel")
+
+    await agent_registry.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,135 @@
+"""
+Benchmark of async endpoints reading from a SQLite file database through a sync Session, which
+blocks the event loop for the whole query (as the routers did before), and through an AsyncSession.
+
+--requests concurrent coroutines each read --pages pages of their user's summaries with keyset_page,
+while a heartbeat task sleeps for --tick ms in a loop. The heartbeat's lateness is how long any other
+request on the same loop (a health check, a streamed response, a 304) would have waited.
+
+    python bench/async_sessions.py --requests 32 --pages 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from database import Base, create_db_engine, create_async_db_engine
+from models import Summary, User
+from pagination import keyset_select, split_page
+
+
+def fill(engine, users: int, summaries: int, batch: int = 20000):
+    Base.metadata.create_all(bind=engine)
+    started = datetime(2025, 1, 1)
+
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password": "x"} for i in range(1, users + 1)
+        ])
+        for first in range(0, summaries, batch):
+            connection.execute(Summary.__table__.insert(), [
+                {
+                    "content": "Lorem ipsum " * 150,
+                    "original_filename": "notes.pdf",
+                    "word_count": 300,
+                    "detail_level": "medium",
+                    "user_id": random.randint(1, users),
+                    "created_at": started + timedelta(seconds=i * 30),
+                }
+                for i in range(first, min(first + batch, summaries))
+            ])
+
+
+async def heartbeat(tick: float, lateness: list, done: asyncio.Event):
+    while not done.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(tick)
+        lateness.append((time.perf_counter() - started - tick) * 1000)
+
+
+async def read_sync(SessionLocal, user_id: int, pages: int, limit: int):
+    cursor = None
+    for _ in range(pages):
+        with SessionLocal() as db:
+            rows = db.execute(keyset_select(select(Summary).where(Summary.user_id == user_id), Summary, cursor, limit)).scalars().all()
+        _, cursor = split_page(rows, limit)
+        # Yields between pages, as a request does between its awaits
+        await asyncio.sleep(0)
+        if cursor is None:
+            return
+
+
+async def read_async(AsyncSessionLocal, user_id: int, pages: int, limit: int):
+    cursor = None
+    for _ in range(pages):
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(keyset_select(select(Summary).where(Summary.user_id == user_id), Summary, cursor, limit))
+            rows = result.scalars().all()
+        _, cursor = split_page(rows, limit)
+        if cursor is None:
+            return
+
+
+async def run(name: str, read, sessions, users: int, requests: int, pages: int, limit: int, tick: float):
+    lateness = []
+    done = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(tick, lateness, done))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(read(sessions, random.randint(1, users), pages, limit) for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    done.set()
+    await beat
+    print(
+        f"{name:>13}: {requests * pages / elapsed:6.0f} pages/s, "
+        f"heartbeat late by median {statistics.median(lateness):6.1f} ms, max {max(lateness):6.1f} ms"
+    )
+
+
+async def bench(url: str, users: int, requests: int, pages: int, limit: int, tick: float, rounds: int):
+    engine = create_db_engine(url)
+    async_engine = create_async_db_engine(url)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    for _ in range(rounds):
+        await run("Session", read_sync, SessionLocal, users, requests, pages, limit, tick)
+        await run("AsyncSession", read_async, AsyncSessionLocal, users, requests, pages, limit, tick)
+
+    engine.dispose()
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--summaries", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=32, help="Concurrent requests")
+    parser.add_argument("--pages", type=int, default=10, help="Pages read per request")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--tick", type=float, default=5, help="Heartbeat interval, in ms")
+    parser.add_argument("--rounds", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        engine = create_db_engine(url)
+        fill(engine, args.users, args.summaries)
+        engine.dispose()
+
+        asyncio.run(bench(url, args.users, args.requests, args.pages, args.limit, args.tick / 1000, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
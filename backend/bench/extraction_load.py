@@ -0,0 +1,226 @@
+"""
+Load test of the text extraction service.
+
+Sends bursts of concurrent uploads (DOCX and TXT files generated on the fly) through
+TextExtractionService and reports latency percentiles, throughput and rejected uploads.
+With --kill-worker, one worker process is killed in the middle of each burst to check
+that the pool recovers instead of failing every later upload.
+
+    python bench/extraction_load.py --files 64 --concurrency 4 16 64
+
+With --app, drives the app in process over httpx's ASGITransport instead: GET /summary/ is called in
+a loop while a burst of large PDFs is uploaded to POST /summary/generate-summary (with a stubbed
+model), once with the extraction parsing the PDFs on the event loop as before and once through
+TextExtractionService, and the latency percentiles of GET /summary/ are reported for each.
+
+    python bench/extraction_load.py --app --uploads 8 --pdf-pages 200
+"""
+from starlette.datastructures import UploadFile
+import argparse
+import asyncio
+import io
+import logging
+import os
+import signal
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx
+import httpx
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from database import Base, create_db_engine, create_async_db_engine, get_async_db
+from models import Summary, User
+from oauth2 import create_access_token
+from pdf_extraction import extract_read, make_pdf
+from utils import TextExtractionService, EXTRACTION_WORKERS, EXTRACTION_TIMEOUT, get_summary_question_generator_agent
+
+
+def make_docx(paragraphs: int) -> bytes:
+    document = docx.Document()
+    for i in range(paragraphs):
+        document.add_paragraph(f"Paragraph {i} about cells, membranes and the light reactions of photosynthesis. " * 5)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def make_upload(index: int, docx_body: bytes) -> UploadFile:
+    if index % 2:
+        return UploadFile(file=io.BytesIO(docx_body), filename=f"file{index}.docx")
+    body = ("Line about the light reactions of photosynthesis.\n" * 2000).encode()
+    return UploadFile(file=io.BytesIO(body), filename=f"file{index}.txt")
+
+
+async def extract_one(service: TextExtractionService, upload: UploadFile):
+    started = time.perf_counter()
+    try:
+        await service.extract(upload)
+        return time.perf_counter() - started, None
+    except HTTPException as e:
+        return time.perf_counter() - started, e.status_code
+
+
+async def kill_a_worker(service: TextExtractionService, delay: float):
+    await asyncio.sleep(delay)
+    executor = service._executor
+    processes = list((getattr(executor, "_processes", None) or {}).values())
+    if processes:
+        os.kill(processes[0].pid, signal.SIGKILL)
+
+
+async def burst(service: TextExtractionService, files: int, concurrency: int, docx_body: bytes, kill_worker: bool):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(index: int):
+        async with semaphore:
+            return await extract_one(service, make_upload(index, docx_body))
+
+    killer = asyncio.create_task(kill_a_worker(service, 0.05)) if kill_worker else None
+    started = time.perf_counter()
+    results = await asyncio.gather(*(limited(i) for i in range(files)))
+    elapsed = time.perf_counter() - started
+    if killer:
+        await killer
+
+    latencies = sorted(latency for latency, error in results if error is None)
+    errors = [error for _, error in results if error is not None]
+    p50 = statistics.median(latencies) * 1000 if latencies else 0
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0
+
+    print(
+        f"concurrency={concurrency:>3}  ok={len(latencies):>4}  rejected={len(errors):>3} {sorted(set(errors)) or ''}  "
+        f"p50={p50:7.1f} ms  p95={p95:7.1f} ms  throughput={len(latencies) / elapsed:6.1f} files/s"
+    )
+
+
+class StubAgent:
+    async def summarize_text(self, text: str, word_length: int = 150, detail_level: str = "medium") -> str:
+        return f"Summary of {len(text)} characters"
+
+
+def percentile(latencies: list, fraction: float) -> float:
+    latencies = sorted(latencies)
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+
+
+async def poll_listing(client: httpx.AsyncClient, latencies: list, done: asyncio.Event, interval: float):
+    while not done.is_set():
+        started = time.perf_counter()
+        response = await client.get("/summary/", params={"view": "listing"})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+
+async def app_burst(client: httpx.AsyncClient, name: str, extract, pdf_body: bytes, uploads: int, interval: float):
+    import routers.summary
+    routers.summary.extract_text_from_file_async = extract
+
+    latencies = []
+    done = asyncio.Event()
+    poller = asyncio.create_task(poll_listing(client, latencies, done, interval))
+
+    async def upload(index: int):
+        response = await client.post(
+            "/summary/generate-summary",
+            files={"file": (f"file{index}.pdf", pdf_body, "application/pdf")},
+            timeout=None
+        )
+        response.raise_for_status()
+
+    started = time.perf_counter()
+    if uploads:
+        await asyncio.gather(*(upload(i) for i in range(uploads)))
+    else:
+        await asyncio.sleep(2)
+    elapsed = time.perf_counter() - started
+    done.set()
+    await poller
+
+    print(
+        f"{name:>8}: {uploads} upload(s) in {elapsed:5.1f} s, GET /summary/ x{len(latencies):<4} "
+        f"p50={percentile(latencies, 0.5):7.1f} ms  p99={percentile(latencies, 0.99):7.1f} ms  max={max(latencies) * 1000:7.1f} ms"
+    )
+
+
+async def app_load(args):
+    from main import app
+
+    # The previous extraction path, parsing the PDF on the event loop
+    async def extract_inline(file: UploadFile) -> str:
+        return extract_read(file)
+
+    service = TextExtractionService(
+        max_workers=args.workers, max_pending=max(args.max_pending, args.uploads), timeout=EXTRACTION_TIMEOUT,
+        max_chars=sys.maxsize
+    )
+    pdf_body = make_pdf(args.pdf_pages)
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        engine = create_db_engine(url)
+        async_engine = create_async_db_engine(url)
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            connection.execute(User.__table__.insert(), [{"id": 1, "username": "bench", "email": "bench@example.com", "password": "x"}])
+            connection.execute(Summary.__table__.insert(), [
+                {"content": "Summary", "original_filename": "notes.pdf", "word_count": 150, "detail_level": "medium", "user_id": 1}
+                for _ in range(100)
+            ])
+        AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+        async def override_get_async_db():
+            async with AsyncSessionLocal() as db:
+                yield db
+
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        app.dependency_overrides[get_summary_question_generator_agent] = StubAgent
+        headers = {"Authorization": f"Bearer {create_access_token({'user_id': 1})}"}
+        try:
+            # The startup handlers (job workers, model client) don't run over ASGITransport
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", headers=headers) as client:
+                print(f"{args.uploads} concurrent uploads of a {args.pdf_pages}-page PDF ({len(pdf_body) / 1024:.0f} KiB), {args.workers} worker(s)")
+                await app_burst(client, "idle", service.extract, pdf_body, 0, args.interval)
+                await app_burst(client, "inline", extract_inline, pdf_body, args.uploads, args.interval)
+                await app_burst(client, "pool", service.extract, pdf_body, args.uploads, args.interval)
+        finally:
+            app.dependency_overrides.clear()
+            service.shutdown()
+            engine.dispose()
+            await async_engine.dispose()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--workers", type=int, default=EXTRACTION_WORKERS)
+    parser.add_argument("--max-pending", type=int, default=64)
+    parser.add_argument("--kill-worker", action="store_true")
+    parser.add_argument("--app", action="store_true", help="Measure GET /summary/ latency during PDF uploads to the app")
+    parser.add_argument("--uploads", type=int, default=8, help="Concurrent PDF uploads, with --app")
+    parser.add_argument("--pdf-pages", type=int, default=200, help="Pages of each uploaded PDF, with --app")
+    parser.add_argument("--interval", type=float, default=0.01, help="Pause between two GET /summary/, with --app")
+    args = parser.parse_args()
+
+    if args.app:
+        logging.disable(logging.INFO)
+        await app_load(args)
+        return
+
+    service = TextExtractionService(max_workers=args.workers, max_pending=args.max_pending, timeout=EXTRACTION_TIMEOUT)
+    docx_body = make_docx(200)
+    try:
+        for concurrency in args.concurrency:
+            await burst(service, args.files, concurrency, docx_body, args.kill_worker)
+    finally:
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,113 @@
+"""
+Benchmark of the study plan listings on a large SQLite table, with and without the
+(user_id, created_at) listing index.
+
+Fills a temporary database with --rows study plans spread over --users users, then times the
+statements the router issues (keyset_select over select_plan_listing and select_plan_bodies) for
+the first page and for a page deep in the listing, and prints their query plans.
+
+    python bench/listing_scale.py --rows 1000000 --users 1000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from database import Base, create_db_engine
+from models import StudyPlan, User
+from pagination import keyset_select, split_page
+from routers.studyplan import select_plan_bodies, select_plan_listing
+
+INDEX = "ix_studyplans_user_id_created_at"
+
+
+def fill(engine, rows: int, users: int, batch: int = 50000):
+    Base.metadata.create_all(bind=engine)
+    started = datetime(2025, 1, 1)
+    body = '{"overview": "Overview", "learning_objectives": [], "sections": [], "total_estimated_time": "1h"}'
+
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {"id": i, "username": f"user{i}", "email": f"user{i}@example.com", "password": "x"} for i in range(1, users + 1)
+        ])
+        for first in range(0, rows, batch):
+            connection.execute(StudyPlan.__table__.insert(), [
+                {
+                    "topic": f"Topic {i}",
+                    "content": body,
+                    "response_body": body,
+                    "user_id": random.randint(1, users),
+                    "created_at": started + timedelta(seconds=i * 30),
+                }
+                for i in range(first, min(first + batch, rows))
+            ])
+
+
+def fetch_pages(connection, stmt, user_id: int, pages: int, limit: int) -> float:
+    """
+    Follows the cursors down to the given page and returns the time taken by the last one, in ms.
+    """
+    cursor = None
+    for _ in range(pages):
+        started = time.perf_counter()
+        rows = connection.execute(keyset_select(stmt.where(StudyPlan.user_id == user_id), StudyPlan, cursor, limit)).all()
+        elapsed = (time.perf_counter() - started) * 1000
+        _, cursor = split_page(rows, limit)
+        if cursor is None:
+            break
+    return elapsed
+
+
+def run(engine, users: int, samples: int, limit: int, deep_page: int):
+    user_ids = random.sample(range(1, users + 1), min(samples, users))
+    with engine.connect() as connection:
+        for name, select_page in (("listing", select_plan_listing), ("full", select_plan_bodies)):
+            for pages in (1, deep_page):
+                timings = [fetch_pages(connection, select_page(), user_id, pages, limit) for user_id in user_ids]
+                print(f"    {name:>7} page {pages:>3}: median {statistics.median(timings):8.2f} ms, max {max(timings):8.2f} ms")
+
+        plan = connection.execute(
+            text("EXPLAIN QUERY PLAN " + str(keyset_select(select_plan_listing().where(StudyPlan.user_id == 1), StudyPlan, None, limit)
+                 .compile(engine, compile_kwargs={"literal_binds": True})))
+        ).all()
+        print("    plan: " + "; ".join(row[-1] for row in plan))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--samples", type=int, default=20, help="Users whose listing is timed")
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--deep-page", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_db_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+
+        started = time.perf_counter()
+        fill(engine, args.rows, args.users)
+        print(f"{args.rows} study plans for {args.users} users inserted in {time.perf_counter() - started:.1f} s")
+
+        print(f"with {INDEX}:")
+        run(engine, args.users, args.samples, args.limit, args.deep_page)
+
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP INDEX {INDEX}"))
+        # Pooled connections keep the statements prepared against the index
+        engine.dispose()
+        print(f"without {INDEX}:")
+        run(engine, args.users, args.samples, args.limit, args.deep_page)
+
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
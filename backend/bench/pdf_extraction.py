@@ -0,0 +1,149 @@
+"""
+Benchmark of PDF text extraction on generated 10-, 100- and 1000-page PDFs.
+
+Each PDF is extracted three ways, each in a fresh process so that the peak RSS of one case does
+not hide the next one:
+
+  - read:       the previous path, reading the whole upload, wrapping it in BytesIO and calling
+                extract_text twice per page, in the request process
+  - service:    TextExtractionService with the configured character budget (EXTRACTION_MAX_CHARS),
+                which stops once enough text has been extracted
+  - unbounded:  TextExtractionService extracting every page
+
+Throughput is counted in pages of the PDF per second. Peak RSS is reported for the request process
+and for the largest extraction worker (RUSAGE_CHILDREN, once the pool has exited).
+
+    python bench/pdf_extraction.py --pages 10 100 1000
+"""
+from starlette.datastructures import UploadFile
+import argparse
+import asyncio
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import PyPDF2
+from utils import TextExtractionService, EXTRACTION_WORKERS, EXTRACTION_PAGES_PER_JOB, EXTRACTION_MAX_CHARS
+
+LINES_PER_PAGE = 40
+MODES = ("read", "service", "unbounded")
+
+
+def make_pdf(pages: int) -> bytes:
+    """
+    Builds a PDF of the given number of pages, each holding LINES_PER_PAGE lines of text in Helvetica.
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(pages)) + b"] /Count %d >>" % pages,
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i in range(pages):
+        lines = b"".join(
+            b"(Page %d line %d: the light reactions of photosynthesis take place in the thylakoids.) Tj T* " % (i, line)
+            for line in range(LINES_PER_PAGE)
+        )
+        stream = b"BT /F1 10 Tf 12 TL 40 760 Td " + lines + b"ET"
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % (5 + 2 * i)
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    body = io.BytesIO()
+    body.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(body.tell())
+        body.write(b"%d 0 obj\n" % number + obj + b"\nendobj\n")
+    xref = body.tell()
+    body.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    body.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+    body.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return body.getvalue()
+
+
+def extract_read(file: UploadFile) -> str:
+    """
+    The extraction path before TextExtractionService.
+    """
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(file.file.read()))
+    return "\n".join(page.extract_text() for page in pdf_reader.pages if page.extract_text())
+
+
+async def extract_service(file: UploadFile, workers: int, max_chars: int) -> str:
+    service = TextExtractionService(
+        max_workers=workers, max_pending=1, timeout=3600, pages_per_job=EXTRACTION_PAGES_PER_JOB, max_chars=max_chars
+    )
+    try:
+        return await service.extract(file)
+    finally:
+        # Waits for the workers to exit, so that their peak RSS is counted in RUSAGE_CHILDREN
+        if service._executor is not None:
+            service._executor.shutdown(wait=True)
+        service.shutdown()
+
+
+def run_case(path: str, mode: str, workers: int) -> dict:
+    """
+    Extracts the PDF at path once, in this process, and returns the measurements.
+    """
+    with open(path, "rb") as f:
+        file = UploadFile(file=f, filename="bench.pdf")
+        started = time.perf_counter()
+        if mode == "read":
+            text = extract_read(file)
+        else:
+            max_chars = EXTRACTION_MAX_CHARS if mode == "service" else sys.maxsize
+            text = asyncio.run(extract_service(file, workers, max_chars))
+        elapsed = time.perf_counter() - started
+
+    # ru_maxrss is in KiB on Linux
+    return {
+        "elapsed": elapsed,
+        "chars": len(text),
+        "rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "workers_rss": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--workers", type=int, default=EXTRACTION_WORKERS)
+    parser.add_argument("--case", nargs=2, metavar=("PATH", "MODE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case[0], args.case[1], args.workers)))
+        return
+
+    print(f"{args.workers} worker(s), {EXTRACTION_PAGES_PER_JOB} pages per job, budget of {EXTRACTION_MAX_CHARS} characters")
+    with tempfile.TemporaryDirectory() as directory:
+        for pages in args.pages:
+            path = os.path.join(directory, f"{pages}.pdf")
+            with open(path, "wb") as f:
+                f.write(make_pdf(pages))
+            print(f"{pages} pages ({os.path.getsize(path) / 1024 / 1024:.1f} MiB):")
+
+            for mode in MODES:
+                output = subprocess.run(
+                    [sys.executable, __file__, "--workers", str(args.workers), "--case", path, mode],
+                    check=True, capture_output=True, text=True
+                ).stdout
+                result = json.loads(output.splitlines()[-1])
+                print(
+                    f"    {mode:>9}: {pages / result['elapsed']:7.1f} pages/s, {result['chars']:>8} characters, "
+                    f"peak RSS {result['rss']:6.1f} MiB (workers {result['workers_rss']:6.1f} MiB)"
+                )
+
+
+if __name__ == "__main__":
+    main()
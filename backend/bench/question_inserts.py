@@ -0,0 +1,85 @@
+"""
+Benchmark of storing generated tests and their questions on a SQLite file database, through an
+AsyncSession as the questions router does.
+
+The per-object path commits and refreshes the test, then adds one Question object per question and
+commits again (as the router did before). The bulk path flushes the test and stores its questions in
+a single executemany insert, in the same transaction (as get_questions does now).
+
+    python bench/question_inserts.py --tests 30 --questions 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from database import Base, create_db_engine, create_async_db_engine
+from models import Question, Test, User
+from schemas import ResponseQuestions
+
+
+async def store_per_object(db, questions):
+    test = Test(title="Test", num_questions=len(questions), difficulty="easy", user_id=1)
+    db.add(test)
+    await db.commit()
+    await db.refresh(test)
+
+    db.add_all([Question(**q.model_dump(), test_id=test.id) for q in questions])
+    await db.commit()
+
+
+async def store_bulk(db, questions):
+    test = Test(title="Test", num_questions=len(questions), difficulty="easy", user_id=1)
+    db.add(test)
+    await db.flush()
+
+    await db.execute(insert(Question), [{**q.model_dump(), "test_id": test.id} for q in questions])
+    await db.commit()
+
+
+async def run(url: str, tests: int, questions: int, rounds: int):
+    engine = create_async_db_engine(url)
+    AsyncSessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    generated = [
+        ResponseQuestions(question=f"Question {i}?", option_a="a", option_b="b", option_c="c", option_d="d", answer="a")
+        for i in range(questions)
+    ]
+
+    for _ in range(rounds):
+        for name, store in (("per-object", store_per_object), ("bulk", store_bulk)):
+            started = time.perf_counter()
+            for _ in range(tests):
+                async with AsyncSessionLocal() as db:
+                    await store(db, generated)
+            elapsed = time.perf_counter() - started
+            print(f"{name:>10}: {tests * questions / elapsed:7.0f} questions/s, {elapsed / tests * 1000:6.1f} ms per test")
+
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tests", type=int, default=30)
+    parser.add_argument("--questions", type=int, default=200, help="Questions per test")
+    parser.add_argument("--rounds", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        engine = create_db_engine(url)
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as connection:
+            connection.execute(User.__table__.insert(), [{"id": 1, "username": "bench", "email": "bench@example.com", "password": "x"}])
+        engine.dispose()
+
+        asyncio.run(run(url, args.tests, args.questions, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
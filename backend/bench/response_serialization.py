@@ -0,0 +1,104 @@
+"""
+Benchmark of rendering response bodies from validated models, on payloads built from schemas.py.
+
+Each payload is rendered three ways:
+
+  - jsonable_encoder + json:    FastAPI's default JSONResponse path
+  - jsonable_encoder + orjson:  only swapping the JSON library
+  - model_dump + orjson:        dumping the validated models straight to an ORJSONResponse, as the
+                                listing views, the generated questions and the interview reviews do
+
+    python bench/response_serialization.py --iterations 300
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from schemas import InterviewReviewResponse, ResponseQuestions, StudyPlanResponse, SummaryListing, SummaryResponse
+
+
+def dump(payload):
+    """
+    Dumps the models of a payload, as the routes do before handing it to ORJSONResponse.
+    """
+    if isinstance(payload, list):
+        return [item.model_dump() for item in payload]
+    if isinstance(payload, dict):
+        return {key: dump(value) for key, value in payload.items()}
+    if hasattr(payload, "model_dump"):
+        return payload.model_dump()
+    return payload
+
+
+def payloads() -> dict:
+    now = datetime(2025, 1, 1)
+    section = {
+        "title": "Section",
+        "description": "Description " * 16,
+        "topics": ["Topic " * 5] * 6,
+        "resources": [{"title": "Resource", "url": "https://example.com", "description": "Description " * 6, "type": "article"}] * 4,
+        "activities": ["Activity " * 4] * 4,
+        "estimated_time": "2h",
+        "assessment_methods": ["Assessment " * 3] * 3,
+    }
+    return {
+        "200 summaries": [
+            SummaryResponse(id=i, content="Lorem ipsum " * 150, original_filename="notes.pdf", word_count=300,
+                            detail_level="medium", created_at=now)
+            for i in range(200)
+        ],
+        "200 summary listings": [
+            SummaryListing(id=i, original_filename="notes.pdf", word_count=300, detail_level="medium", created_at=now)
+            for i in range(200)
+        ],
+        "study plan": StudyPlanResponse(
+            id=1, topic="Topic", overview="Overview " * 40, learning_objectives=["Learning objective " * 2] * 6,
+            sections=[section] * 6, total_estimated_time="12h", created_at=now
+        ),
+        "100 questions": {
+            "questions": [
+                ResponseQuestions(question="Question " * 12, option_a="A " * 20, option_b="B " * 20,
+                                  option_c="C " * 20, option_d="D " * 20, answer="A")
+                for _ in range(100)
+            ],
+            "test_id": 1,
+        },
+        "20 interview reviews": {
+            "interview_id": 1,
+            "reviews": [InterviewReviewResponse(category=f"Category {i}", rating=4, review="Review " * 40) for i in range(20)],
+        },
+    }
+
+
+def timed(render, iterations: int) -> float:
+    """
+    Returns the mean time taken by render, in ms.
+    """
+    render()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        render()
+    return (time.perf_counter() - started) / iterations * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{'':>22}  {'encoder+json':>12}  {'encoder+orjson':>14}  {'dump+orjson':>11}")
+    for name, payload in payloads().items():
+        default = timed(lambda: JSONResponse(jsonable_encoder(payload)).body, args.iterations)
+        encoded = timed(lambda: ORJSONResponse(jsonable_encoder(payload)).body, args.iterations)
+        dumped = timed(lambda: ORJSONResponse(dump(payload)).body, args.iterations)
+        print(f"{name:>22}  {default:9.2f} ms  {encoded:11.2f} ms  {dumped:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark of concurrent commits on a SQLite file database, through a plain create_engine and
+through create_db_engine (WAL, synchronous=NORMAL, busy timeout and the sized pool).
+
+Each thread commits --commits summaries, one per session, as the routes do.
+
+    python bench/sqlite_commits.py --threads 8 --commits 150
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import (
+    Base, create_db_engine, WEB_CONCURRENCY, DB_MAX_CONNECTIONS, DB_TOTAL_CONNECTIONS,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_SYNC_POOL_SIZE, DB_SYNC_MAX_OVERFLOW
+)
+from models import Summary, User
+
+
+def run(engine, label: str, threads: int, commits: int):
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    with SessionLocal() as db:
+        db.add(User(id=1, username="bench", email="bench@example.com", password="x"))
+        db.commit()
+
+    errors = []
+
+    def commit_summaries():
+        for _ in range(commits):
+            with SessionLocal() as db:
+                try:
+                    db.add(Summary(content="x" * 2000, word_count=300, detail_level="brief", user_id=1))
+                    db.commit()
+                except Exception as e:
+                    errors.append(e)
+                    db.rollback()
+
+    workers = [threading.Thread(target=commit_summaries) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"{label:>17}: {threads * commits / elapsed:7.0f} commits/s, {len(errors)} error(s)")
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--commits", type=int, default=150, help="Commits per thread")
+    args = parser.parse_args()
+
+    print(
+        f"{WEB_CONCURRENCY} process(es), async pool {DB_POOL_SIZE}+{DB_MAX_OVERFLOW}, "
+        f"sync pool {DB_SYNC_POOL_SIZE}+{DB_SYNC_MAX_OVERFLOW}: "
+        f"up to {DB_TOTAL_CONNECTIONS} of {DB_MAX_CONNECTIONS} connections"
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        run(create_engine(f"sqlite:///{os.path.join(directory, 'plain.db')}"), "create_engine", args.threads, args.commits)
+        run(create_db_engine(f"sqlite:///{os.path.join(directory, 'tuned.db')}"), "create_db_engine", args.threads, args.commits)
+
+
+if __name__ == "__main__":
+    main()
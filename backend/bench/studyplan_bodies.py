@@ -0,0 +1,172 @@
+"""
+Benchmark of the study plan read routes, served from the response bodies stored at write time.
+
+Fills a temporary SQLite database with --plans study plans for one user, then times full listings
+(following the cursors with --limit plans per page) and GETs by id through the app in process, for:
+
+  - stored:   plans saved with their response body, as they are now
+  - legacy:   plans saved before bodies were stored, serialized from their content on read
+  - parsed:   the listing as the route built it before, parsing the content of each plan and
+              validating it through the response model (mounted by this script, listing only)
+
+    python bench/studyplan_bodies.py --plans 500 --limit 200
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from typing import List, Optional
+from database import Base, create_db_engine, create_async_db_engine, get_db, get_async_db
+from models import StudyPlan, User
+from oauth2 import create_access_token, get_current_user_id
+from pagination import NEXT_CURSOR_HEADER, keyset_page
+from routers.studyplan import serialize_study_plan
+from schemas import StudyPlanResponse
+
+PLAN = {
+    "overview": "Overview " * 40,
+    "learning_objectives": ["Learning objective " * 2] * 6,
+    "sections": [{
+        "title": "Section",
+        "description": "Description " * 16,
+        "topics": ["Topic " * 5] * 6,
+        "resources": [{"title": "Resource", "url": "https://example.com", "description": "Description " * 6, "type": "article"}] * 4,
+        "activities": ["Activity " * 4] * 4,
+        "estimated_time": "2h",
+        "assessment_methods": ["Assessment " * 3] * 3,
+    }] * 6,
+    "total_estimated_time": "12h",
+}
+
+parsed_router = APIRouter(prefix="/bench")
+
+
+@parsed_router.get("/parsed", response_model=List[StudyPlanResponse])
+async def get_parsed_studyplans(
+    response: Response,
+    limit: int = Query(50),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    study_plans, next_cursor = await keyset_page(db, select(StudyPlan).where(StudyPlan.user_id == current_user_id), StudyPlan, cursor, limit)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+    response_data = []
+    for plan in study_plans:
+        plan_dict = json.loads(plan.content)
+        response_data.append({
+            "id": plan.id,
+            "topic": plan.topic,
+            "overview": plan_dict.get("overview", ""),
+            "learning_objectives": plan_dict.get("learning_objectives", []),
+            "sections": plan_dict.get("sections", []),
+            "total_estimated_time": plan_dict.get("total_estimated_time", ""),
+            "created_at": plan.created_at
+        })
+    return response_data
+
+
+def fill(SessionLocal, plans: int):
+    with SessionLocal() as db:
+        db.add(User(id=1, username="bench", email="bench@example.com", password="x"))
+        db.add_all([StudyPlan(topic=f"Topic {i}", content=json.dumps(PLAN), user_id=1) for i in range(plans)])
+        db.commit()
+
+
+def store_bodies(SessionLocal):
+    with SessionLocal() as db:
+        for plan in db.scalars(select(StudyPlan)):
+            plan.response_body = serialize_study_plan(plan)
+        db.commit()
+
+
+def list_all(client: TestClient, path: str, limit: int) -> int:
+    count, cursor = 0, None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(path, params=params)
+        count += len(response.json())
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            return count
+
+
+def time_listing(client: TestClient, path: str, limit: int, rounds: int) -> str:
+    list_all(client, path, limit)
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        count = list_all(client, path, limit)
+        timings.append((time.perf_counter() - started) * 1000)
+    return f"median {statistics.median(timings):7.1f} ms per listing of {count} plans"
+
+
+def time_get(client: TestClient, plans: int) -> str:
+    started = time.perf_counter()
+    for plan_id in range(1, plans + 1):
+        client.get(f"/studyplan/{plan_id}", headers={"Accept-Encoding": "identity"})
+    return f"{(time.perf_counter() - started) / plans * 1000:5.2f} ms per GET by id"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plans", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=200, help="Plans per page")
+    parser.add_argument("--rounds", type=int, default=10, help="Full listings timed per mode")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    from main import app
+    app.include_router(parsed_router)
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        engine = create_db_engine(url)
+        async_engine = create_async_db_engine(url)
+        Base.metadata.create_all(bind=engine)
+        SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+        AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+        fill(SessionLocal, args.plans)
+
+        def override_get_db():
+            with SessionLocal() as db:
+                yield db
+
+        async def override_get_async_db():
+            async with AsyncSessionLocal() as db:
+                yield db
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_async_db] = override_get_async_db
+        try:
+            # Not used as a context manager, so the startup handlers (job workers, model client) don't run
+            client = TestClient(app)
+            client.headers["Authorization"] = f"Bearer {create_access_token({'user_id': 1})}"
+
+            print(f"  parsed: {time_listing(client, '/bench/parsed', args.limit, args.rounds)}")
+            print(f"  legacy: {time_listing(client, '/studyplan/', args.limit, args.rounds)}, {time_get(client, args.plans)}")
+            store_bodies(SessionLocal)
+            print(f"  stored: {time_listing(client, '/studyplan/', args.limit, args.rounds)}, {time_get(client, args.plans)}")
+        finally:
+            app.dependency_overrides.clear()
+            engine.dispose()
+            asyncio.run(async_engine.dispose())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark of study plan generation with stubbed model calls.
+
+The study plan and quick reference agents are replaced by stubs that sleep for the given
+latencies, then the plan and the guide are generated one after the other (as before they were
+run concurrently) and with generate_study_plan_with_reference. With --reference-fails, the guide
+stub raises, to check that the plan is still returned and that no error text stands in for the guide.
+
+    python bench/studyplan_concurrency.py --plan-latency 2 --reference-latency 1.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from schemas import StudyPlanData
+from utils import StudyPlanAgent
+
+
+def stub_agent(plan_latency: float, reference_latency: float, reference_fails: bool) -> StudyPlanAgent:
+    agent = StudyPlanAgent()
+
+    async def generate_study_plan(topic: str) -> StudyPlanData:
+        await asyncio.sleep(plan_latency)
+        return StudyPlanData(topic=topic, overview="Overview", learning_objectives=[], sections=[], total_estimated_time="1h")
+
+    async def build_quick_reference_guide(topic: str) -> str:
+        await asyncio.sleep(reference_latency)
+        if reference_fails:
+            raise RuntimeError("model error")
+        return f"# {topic}"
+
+    agent.generate_study_plan = generate_study_plan
+    agent._build_quick_reference_guide = build_quick_reference_guide
+    return agent
+
+
+async def timed(coroutine):
+    started = time.perf_counter()
+    result = await coroutine
+    return time.perf_counter() - started, result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plan-latency", type=float, default=2.0)
+    parser.add_argument("--reference-latency", type=float, default=1.5)
+    parser.add_argument("--requests", type=int, default=10, help="Concurrent requests per run")
+    parser.add_argument("--reference-fails", action="store_true")
+    args = parser.parse_args()
+
+    agent = stub_agent(args.plan_latency, args.reference_latency, args.reference_fails)
+
+    async def sequential(topic: str):
+        plan = await agent.generate_study_plan(topic)
+        return plan, await agent.generate_quick_reference_guide(topic)
+
+    for name, generate in (("sequential", sequential), ("concurrent", agent.generate_study_plan_with_reference)):
+        elapsed, results = await timed(asyncio.gather(*(generate(f"topic {i}") for i in range(args.requests))))
+        guides = sum(reference is not None for _, reference in results)
+        print(f"{name:>10}: {args.requests} concurrent requests done in {elapsed:.2f} s, {guides} guide(s) generated")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,177 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from typing import Dict, Optional, Sequence
+from dotenv import load_dotenv
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+load_dotenv()
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+
+# Immutable artifacts are gzipped once when they are saved, at the highest level since it is paid only once
+PRECOMPRESS_ARTIFACTS = os.getenv("PRECOMPRESS_ARTIFACTS", "true").lower() == "true"
+PRECOMPRESS_GZIP_LEVEL = int(os.getenv("PRECOMPRESS_GZIP_LEVEL", "9"))
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml")
+
+
+def available_encodings() -> Sequence[str]:
+    """
+    Supported encodings in order of preference. Brotli and zstd are used when their packages are installed.
+    """
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    accepted = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def negotiate_encoding(header: Optional[str], encodings: Sequence[str]) -> Optional[str]:
+    """
+    Picks the encoding with the highest q-value in the Accept-Encoding header,
+    preferring the earlier encodings in the list on ties.
+    """
+    accepted = parse_accept_encoding(header)
+    candidates = [
+        (accepted.get(encoding, accepted.get("*", 0.0)), -index, encoding)
+        for index, encoding in enumerate(encodings)
+    ]
+    candidates = [candidate for candidate in candidates if candidate[0] > 0]
+    return max(candidates)[2] if candidates else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def precompress(body: str) -> Optional[bytes]:
+    """
+    Gzipped copy of an artifact response body to store next to it, or None when pre-compression is disabled.
+    """
+    if not PRECOMPRESS_ARTIFACTS:
+        return None
+    return gzip.compress(body.encode("utf-8"), compresslevel=PRECOMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def weaken_etag(headers: MutableHeaders):
+    # The encoded body is a different representation, so a strong ETag has to become weak
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = "W/" + etag
+
+
+def precompressed_response(body: bytes, media_type: str, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Response for a body gzipped by precompress. The middleware leaves it alone since its encoding is already set.
+    """
+    response = Response(content=body, media_type=media_type, headers=headers)
+    response.headers["Content-Encoding"] = "gzip"
+    response.headers.add_vary_header("Accept-Encoding")
+    weaken_etag(response.headers)
+    return response
+
+
+class CompressionMiddleware:
+    """
+    Compresses complete text responses with the best encoding the client accepts.
+    Streamed responses, small bodies and responses that already have a Content-Encoding are sent as they are.
+    """
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE, encodings: Optional[Sequence[str]] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = encodings or available_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("Accept-Encoding"), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+
+        async def send_compressed(message: Message):
+            nonlocal start_message
+
+            if message["type"] == "http.response.start":
+                # Held back until the first body message tells whether the response can be compressed
+                start_message = message
+                return
+
+            if start_message is None:
+                await send(message)
+                return
+
+            start, start_message = start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            body = message.get("body", b"")
+
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or "no-transform" in headers.get("cache-control", "")
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            ):
+                await send(start)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            if len(compressed) >= len(body):
+                await send(start)
+                await send(message)
+                return
+
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            weaken_etag(headers)
+
+            await send(start)
+            await send({**message, "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
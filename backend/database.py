@@ -1,13 +1,167 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from dotenv import load_dotenv
+import logging
+import os
 
+load_dotenv()
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./sql_app.db"
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sql_app.db")
+
+# Connection pools. Every worker process (WEB_CONCURRENCY, as read by gunicorn and uvicorn --workers)
+# has an async engine, used by the async routers and the job queue, and a sync engine, used by the users
+# and login routes. The database sees up to
+#     WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW + DB_SYNC_POOL_SIZE + DB_SYNC_MAX_OVERFLOW)
+# connections, so by default DB_MAX_CONNECTIONS is divided between the processes, DB_SYNC_POOL_SHARE of
+# each share goes to the sync engine, and two thirds of each engine's connections are kept in its pool.
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "90"))
+WEB_CONCURRENCY = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+DB_SYNC_POOL_SHARE = float(os.getenv("DB_SYNC_POOL_SHARE", "0.2"))
+
+_process_connections = max(DB_MAX_CONNECTIONS // WEB_CONCURRENCY, 4)
+_sync_connections = max(int(_process_connections * DB_SYNC_POOL_SHARE), 2)
+_async_connections = _process_connections - _sync_connections
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(max(_async_connections * 2 // 3, 1))))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", str(max(_async_connections - DB_POOL_SIZE, 0))))
+DB_SYNC_POOL_SIZE = int(os.getenv("DB_SYNC_POOL_SIZE", str(max(_sync_connections * 2 // 3, 1))))
+DB_SYNC_MAX_OVERFLOW = int(os.getenv("DB_SYNC_MAX_OVERFLOW", str(max(_sync_connections - DB_SYNC_POOL_SIZE, 0))))
+DB_TOTAL_CONNECTIONS = WEB_CONCURRENCY * (DB_POOL_SIZE + DB_MAX_OVERFLOW + DB_SYNC_POOL_SIZE + DB_SYNC_MAX_OVERFLOW)
+
+if DB_TOTAL_CONNECTIONS > DB_MAX_CONNECTIONS:
+    logging.warning(
+        f"The connection pools of {WEB_CONCURRENCY} process(es) may open {DB_TOTAL_CONNECTIONS} connections, "
+        f"more than DB_MAX_CONNECTIONS ({DB_MAX_CONNECTIONS})"
+    )
+
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# SQLite tuning, applied to every new connection
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    # A negative cache_size is a size in KiB rather than a number of pages
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+
+# Sync drivers used by the sync engine and the migrations for each backend,
+# so that DATABASE_URL may name either the sync or the async driver
+SYNC_DRIVERS = {
+    "sqlite": "sqlite",
+    "postgresql": "postgresql+psycopg2",
+}
+
+
+def sync_database_url(url: str) -> str:
+    """
+    Returns the URL with the async driver (aiosqlite, asyncpg) replaced by its sync counterpart.
+    """
+    url = make_url(url)
+    url = url.set(drivername=SYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+    return url.render_as_string(hide_password=False)
+
+
+def create_db_engine(
+    url: str = SQLALCHEMY_DATABASE_URL,
+    pool_size: int = DB_SYNC_POOL_SIZE,
+    max_overflow: int = DB_SYNC_MAX_OVERFLOW
+) -> Engine:
+    """
+    Creates the engine for the given URL (SQLite or PostgreSQL) with a connection pool
+    configured by the DB_SYNC_* and DB_POOL_* settings. SQLite file databases also get WAL mode and the pragmas above.
+    """
+    url = sync_database_url(url)
+    if not url.startswith("sqlite"):
+        return create_engine(
+            url,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            pool_recycle=DB_POOL_RECYCLE
+        )
+
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        # In-memory databases live in a single connection, so there is no pool to size
+        engine = create_engine(url)
+    else:
+        engine = create_engine(
+            url,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=DB_POOL_TIMEOUT,
+            connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+        )
+
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+# Async drivers used by the async engine for each backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def create_async_db_engine(
+    url: str = SQLALCHEMY_DATABASE_URL,
+    pool_size: int = DB_POOL_SIZE,
+    max_overflow: int = DB_MAX_OVERFLOW
+) -> AsyncEngine:
+    """
+    Creates the async counterpart of create_db_engine, on aiosqlite or asyncpg.
+    """
+    url = make_url(url)
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+    if url.get_backend_name() != "sqlite":
+        return create_async_engine(
+            url,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_pre_ping=DB_POOL_PRE_PING,
+            pool_recycle=DB_POOL_RECYCLE
+        )
+
+    if url.database in (None, "", ":memory:"):
+        async_engine = create_async_engine(url)
+    else:
+        async_engine = create_async_engine(
+            url,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=DB_POOL_TIMEOUT,
+            connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+        )
+
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return async_engine
+
+
+engine = create_db_engine()
+async_engine = create_async_db_engine()
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -20,3 +174,7 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,56 @@
+from fastapi import Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import Dict, Optional
+from dotenv import load_dotenv
+import hashlib
+import os
+
+load_dotenv()
+
+# Generated artifacts never change once created, so clients may keep them for a long time
+ARTIFACT_CACHE_MAX_AGE = int(os.getenv("ARTIFACT_CACHE_MAX_AGE", str(365 * 24 * 3600)))
+
+
+def artifact_etag(kind: str, id: int, created_at: datetime) -> str:
+    """
+    Strong ETag of an immutable artifact, derived from its kind, id and creation time.
+    """
+    digest = hashlib.sha256(f"{kind}:{id}:{created_at.isoformat()}".encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    return {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={ARTIFACT_CACHE_MAX_AGE}, immutable"
+    }
+
+
+async def not_modified(db: AsyncSession, model, id: int, kind: str, if_none_match: Optional[str]) -> Optional[Response]:
+    """
+    Returns a 304 response when If-None-Match holds the current ETag of the artifact, and None otherwise.
+    Only the id and creation time are read, so the content of the artifact is not loaded.
+    """
+    if not if_none_match:
+        return None
+
+    created_at = (await db.execute(select(model.created_at).where(model.id == id))).scalar()
+    if created_at is None:
+        return None
+
+    etag = artifact_etag(kind, id, created_at)
+    if not etag_matches(if_none_match, etag):
+        return None
+
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
@@ -0,0 +1,417 @@
+from fastapi import HTTPException
+from typing import Awaitable, Callable, Dict, Optional
+from sqlalchemy import Select, Update, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+from database import AsyncSessionLocal
+from models import Job, Test, Question, Summary, StudyPlan, Interview
+from utils import get_summary_question_generator_agent, get_study_plan_agent, get_interview_agent
+from routers.studyplan import serialize_study_plan
+from compression import precompress
+from datetime import datetime, timedelta, timezone
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BACKOFF = float(os.getenv("JOB_RETRY_BACKOFF", "2"))
+# A running job whose worker has not renewed its lease for this long is considered interrupted
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", str(JOB_LEASE_SECONDS / 4)))
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# A handler runs the agent call for a job, adds the result to the session and returns the id of the new row.
+# Handlers only flush: the queue commits the result together with the job's status, or rolls it back
+JobHandler = Callable[[AsyncSession, Job, dict], Awaitable[int]]
+
+
+def utcnow() -> datetime:
+    # Naive UTC, like the CURRENT_TIMESTAMP server defaults of the timestamp columns
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Statements issued by the queue, also run by query_plan_audit.py
+
+def claim_job(job_id: int, worker_id: str) -> Update:
+    return (
+        update(Job)
+        .where(Job.id == job_id, Job.status == QUEUED)
+        .values(status=RUNNING, attempts=Job.attempts + 1, worker_id=worker_id, updated_at=utcnow())
+    )
+
+
+def renew_lease(job_id: int, worker_id: str) -> Update:
+    return (
+        update(Job)
+        .where(Job.id == job_id, Job.status == RUNNING, Job.worker_id == worker_id)
+        .values(updated_at=utcnow())
+    )
+
+
+def finish_job(job_id: int, worker_id: str, **values) -> Update:
+    return (
+        update(Job)
+        .where(Job.id == job_id, Job.status == RUNNING, Job.worker_id == worker_id)
+        .values(worker_id=None, updated_at=utcnow(), **values)
+    )
+
+
+def cancel_job(job_id: int) -> Update:
+    return update(Job).where(Job.id == job_id, Job.status.in_((QUEUED, RUNNING))).values(status=CANCELLED, worker_id=None)
+
+
+def fail_expired_jobs(cutoff: datetime, max_attempts: int) -> Update:
+    return (
+        update(Job)
+        .where(Job.status == RUNNING, Job.updated_at < cutoff, Job.attempts >= max_attempts)
+        .values(status=FAILED, worker_id=None, error="The job was interrupted too many times")
+    )
+
+
+def requeue_expired_jobs(cutoff: datetime) -> Update:
+    # updated_at is kept, so the requeued jobs count as not picked up by select_pending_jobs
+    return (
+        update(Job)
+        .where(Job.status == RUNNING, Job.updated_at < cutoff)
+        .values(status=QUEUED, worker_id=None, updated_at=Job.updated_at)
+    )
+
+
+def select_pending_jobs(cutoff: Optional[datetime] = None) -> Select:
+    stmt = select(Job.id).where(Job.status == QUEUED).order_by(Job.id)
+    if cutoff is not None:
+        stmt = stmt.where(Job.updated_at < cutoff)
+    return stmt
+
+
+def release_jobs(worker_id: str, updated_at: datetime) -> Update:
+    return (
+        update(Job)
+        .where(Job.status == RUNNING, Job.worker_id == worker_id)
+        .values(status=QUEUED, worker_id=None, updated_at=updated_at)
+    )
+
+
+class JobQueue:
+    """
+    Runs long generations outside of the HTTP request on a bounded pool of workers.
+    Jobs are persisted in the jobs table and shared by every process using the database:
+    a job is claimed with a conditional update, so only one worker runs it, and the worker renews
+    its lease (updated_at) while it runs. Jobs whose lease expired are recovered by any process.
+    """
+    def __init__(self, num_workers: int = 2, max_attempts: int = 3, retry_backoff: float = 2,
+                 lease_seconds: float = 120, heartbeat_seconds: float = 30):
+        self.num_workers = num_workers
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queue = None
+        self._enqueued = set()
+        self._workers = []
+        self._running = {}
+        self._stopping = False
+
+    def register(self, kind: str, handler: JobHandler):
+        self._handlers[kind] = handler
+
+    async def start(self):
+        self._stopping = False
+        self._queue = asyncio.Queue()
+        self._enqueued = set()
+        await self._recover(all_queued=True)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+        self._workers.append(asyncio.create_task(self._reaper()))
+
+    async def stop(self):
+        self._stopping = True
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        # Jobs interrupted by the shutdown are handed back right away instead of waiting for their lease to expire
+        async with AsyncSessionLocal() as db:
+            await db.execute(release_jobs(self.worker_id, utcnow() - timedelta(seconds=self.lease_seconds)))
+            await db.commit()
+
+    def _enqueue(self, job_id: int):
+        if job_id not in self._enqueued:
+            self._enqueued.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    async def submit(self, db: AsyncSession, kind: str, payload: dict, user_id: int) -> Job:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        job = Job(kind=kind, status=QUEUED, payload=json.dumps(payload), user_id=user_id)
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+
+        self._enqueue(job.id)
+        return job
+
+    async def cancel(self, db: AsyncSession, job: Job) -> Job:
+        """
+        Marks a queued or running job as cancelled. A running job is stopped by its worker,
+        in this process right away, and in any other process at its next heartbeat.
+        """
+        await db.execute(cancel_job(job.id))
+        await db.commit()
+        await db.refresh(job)
+
+        if job.status == CANCELLED and job.id in self._running:
+            self._running[job.id].cancel()
+        return job
+
+    async def _recover(self, all_queued: bool = False):
+        """
+        Fails the running jobs whose lease expired once they used up their attempts, and queues the others again.
+        Queued jobs that no process picked up within a lease (e.g. retries scheduled by a process that stopped)
+        are added to the local queue, or all queued jobs when all_queued is set.
+        """
+        cutoff = utcnow() - timedelta(seconds=self.lease_seconds)
+
+        async with AsyncSessionLocal() as db:
+            failed = (await db.execute(fail_expired_jobs(cutoff, self.max_attempts))).rowcount
+            requeued = (await db.execute(requeue_expired_jobs(cutoff))).rowcount
+            await db.commit()
+
+            pending = (await db.execute(select_pending_jobs(None if all_queued else cutoff))).scalars().all()
+
+        for job_id in pending:
+            self._enqueue(job_id)
+
+        if failed or requeued:
+            logger.warning(f"Recovered {requeued} interrupted job(s), failed {failed} out of attempts")
+        if pending:
+            logger.info(f"Queued {len(pending)} pending job(s)")
+
+    async def _reaper(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 2)
+            try:
+                await self._recover()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error while recovering jobs: {e}", exc_info=True)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            self._enqueued.discard(job_id)
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Unexpected error while running job {job_id}: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    async def _heartbeat(self, job_id: int, task: asyncio.Task):
+        """
+        Renews the lease of a running job, and stops it once the job was cancelled or taken over by another process.
+        """
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            async with AsyncSessionLocal() as db:
+                renewed = (await db.execute(renew_lease(job_id, self.worker_id))).rowcount
+                await db.commit()
+
+            if not renewed:
+                logger.info(f"Job {job_id} is no longer held by this worker, stopping it")
+                task.cancel()
+                return
+
+    async def _finish(self, db: AsyncSession, job_id: int, **values) -> bool:
+        """
+        Stores the outcome of a job in the same transaction as the rows added by its handler,
+        unless it was cancelled or taken over in the meantime, in which case those rows are rolled back.
+        """
+        finished = (await db.execute(finish_job(job_id, self.worker_id, **values))).rowcount
+        if finished:
+            await db.commit()
+        else:
+            await db.rollback()
+        return bool(finished)
+
+    async def _run(self, job_id: int):
+        async with AsyncSessionLocal() as db:
+            # Claim the job atomically, so it runs once even when several processes have it queued
+            claimed = (await db.execute(claim_job(job_id, self.worker_id))).rowcount
+            await db.commit()
+            if not claimed:
+                return
+
+            job = await db.get(Job, job_id, populate_existing=True)
+            # A rollback expires the job, and expired attributes cannot be lazy loaded on an async session
+            kind, attempts = job.kind, job.attempts
+
+            task = asyncio.create_task(self._handlers[kind](db, job, json.loads(job.payload)))
+            heartbeat = asyncio.create_task(self._heartbeat(job_id, task))
+            self._running[job_id] = task
+            try:
+                result_id = await task
+                if await self._finish(db, job_id, status=SUCCEEDED, result_id=result_id, error=None):
+                    logger.info(f"Job {job_id} ({kind}) succeeded")
+                else:
+                    logger.info(f"Job {job_id} ({kind}) was cancelled or taken over, its result was discarded")
+
+            except asyncio.CancelledError:
+                if self._stopping:
+                    raise
+                await db.rollback()
+                # cancel already stored the status, this only covers a task cancelled without it
+                await self._finish(db, job_id, status=CANCELLED)
+                logger.info(f"Job {job_id} ({kind}) cancelled")
+
+            except Exception as e:
+                await db.rollback()
+                error = str(e.detail) if isinstance(e, HTTPException) else str(e)
+
+                retryable = not (isinstance(e, HTTPException) and e.status_code < 500)
+                if retryable and attempts < self.max_attempts:
+                    delay = self.retry_backoff * 2 ** (attempts - 1)
+                    if await self._finish(db, job_id, status=QUEUED, error=error):
+                        logger.warning(f"Job {job_id} ({kind}) failed, retrying in {delay}s: {error}")
+                        asyncio.get_running_loop().call_later(delay, self._enqueue, job_id)
+                else:
+                    await self._finish(db, job_id, status=FAILED, error=error)
+                    logger.error(f"Job {job_id} ({kind}) failed: {error}")
+
+            finally:
+                heartbeat.cancel()
+                self._running.pop(job_id, None)
+
+
+job_queue = JobQueue(
+    num_workers=JOB_WORKERS,
+    max_attempts=JOB_MAX_ATTEMPTS,
+    retry_backoff=JOB_RETRY_BACKOFF,
+    lease_seconds=JOB_LEASE_SECONDS,
+    heartbeat_seconds=JOB_HEARTBEAT_SECONDS
+)
+
+
+async def generate_questions_job(db: AsyncSession, job: Job, payload: dict) -> int:
+    agent = get_summary_question_generator_agent()
+    questions_data = await agent.generate_questions(payload["text"], payload["num_questions"], payload["difficulty"])
+
+    new_test = Test(
+        title=payload["test_title"],
+        num_questions=payload["num_questions"],
+        difficulty=payload["difficulty"],
+        user_id=job.user_id
+    )
+    db.add(new_test)
+    await db.flush()
+
+    if questions_data:
+        await db.execute(insert(Question), [
+            {**q.model_dump(), "test_id": new_test.id}
+            for q in questions_data
+        ])
+
+    return new_test.id
+
+
+async def generate_summary_job(db: AsyncSession, job: Job, payload: dict) -> int:
+    agent = get_summary_question_generator_agent()
+    summary_content = await agent.summarize_text(
+        text=payload["text"],
+        word_length=payload["word_length"],
+        detail_level=payload["detail_level"]
+    )
+
+    new_summary = Summary(
+        content=summary_content,
+        original_filename=payload["original_filename"],
+        word_count=payload["word_length"],
+        detail_level=payload["detail_level"],
+        user_id=job.user_id
+    )
+    db.add(new_summary)
+    await db.flush()
+
+    return new_summary.id
+
+
+async def generate_studyplan_job(db: AsyncSession, job: Job, payload: dict) -> int:
+    agent = get_study_plan_agent()
+    study_plan_data, quick_ref_data = await agent.generate_study_plan_with_reference(payload["topic"])
+
+    # Let the queue retry instead of storing a plan that only holds the error
+    if study_plan_data.error:
+        raise RuntimeError(study_plan_data.error)
+
+    # Retried once, and left NULL if it fails again, so that reading the guide generates it later
+    if quick_ref_data is None:
+        quick_ref_data = await agent.generate_quick_reference_guide(payload["topic"])
+
+    study_plan_dict = study_plan_data.model_dump()
+    new_study_plan = StudyPlan(
+        topic=payload["topic"],
+        content=json.dumps(study_plan_dict),
+        quick_reference=quick_ref_data,
+        user_id=job.user_id
+    )
+    db.add(new_study_plan)
+    await db.flush()
+    await db.refresh(new_study_plan)
+
+    new_study_plan.response_body = serialize_study_plan(new_study_plan, study_plan_dict)
+    new_study_plan.response_body_gzip = precompress(new_study_plan.response_body)
+    await db.flush()
+
+    return new_study_plan.id
+
+
+async def generate_interview_job(db: AsyncSession, job: Job, payload: dict) -> int:
+    agent = get_interview_agent()
+    generated_questions = await agent.generate_interview_questions(
+        role=payload["role"],
+        interview_type=payload["type"],
+        level=payload["level"],
+        techstack=payload["techstack"],
+        num_questions=payload["amount"]
+    )
+
+    if not generated_questions:
+        raise RuntimeError("Interview generation agent returned no questions.")
+
+    db_interview = Interview(
+        role=payload["role"],
+        type=payload["type"],
+        level=payload["level"],
+        techstack=json.dumps(payload["techstack"]),
+        questions=json.dumps(generated_questions),
+        user_id=job.user_id
+    )
+    db.add(db_interview)
+    await db.flush()
+
+    return db_interview.id
+
+
+job_queue.register("questions", generate_questions_job)
+job_queue.register("summary", generate_summary_job)
+job_queue.register("studyplan", generate_studyplan_job)
+job_queue.register("interview", generate_interview_job)
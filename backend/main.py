@@ -1,10 +1,15 @@
 from fastapi import FastAPI, Body
+from fastapi.responses import ORJSONResponse
 import uvicorn
+import asyncio
 import logging
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from database import init_db
-from routers import users, auth, questions, summary, studyplan, interview
+from utils import extraction_service, agent_registry, WebScraper, get_study_plan_agent
+from compression import CompressionMiddleware, COMPRESSION_MIN_SIZE
+from routers import users, auth, questions, summary, studyplan, interview, jobs
+from jobs import job_queue
 
 class TestingRequest(BaseModel):
     answers: str
@@ -22,6 +27,8 @@ app = FastAPI(
     title="LevelUp Learning API",
     description="API for LevelUp Learning application",
     version="1.0.0",
+    # Serialize responses with orjson rather than the standard library json
+    default_response_class=ORJSONResponse,
 )
 
 origins = ['*']
@@ -32,20 +39,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
 app.include_router(users.router)
 app.include_router(auth.router)
 app.include_router(questions.router)
 app.include_router(summary.router)
 app.include_router(studyplan.router)
 app.include_router(interview.router)
+app.include_router(jobs.router)
 
 # Event handlers
 @app.on_event("startup")
 async def startup_event():
     logger.info("Application startup")
     init_db()
+    # Build the model client and its connection pool once, up front
+    agent_registry.get_model()
+    await job_queue.start()
+    # Pages scraped before the knowledge store existed are indexed in the background
+    asyncio.get_running_loop().run_in_executor(None, get_study_plan_agent().knowledge.index_cached_pages)
     # Log your router registrations for debugging
     logger.info("Registered routes:")
     for route in app.routes:
@@ -54,6 +70,10 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Application shutdown")
+    await job_queue.stop()
+    extraction_service.shutdown()
+    await WebScraper.close_client()
+    await agent_registry.aclose()
 
 @app.get('/')
 def home():
@@ -0,0 +1,47 @@
+"""add listing indexes
+
+Adds (user_id, created_at) indexes for the per-user listings and an index
+on questions.test_id. Tables are created by database.init_db, so indexes
+are only added to the tables that already exist.
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ("ix_questions_test_id", "questions", ["test_id"]),
+    ("ix_tests_user_id_created_at", "tests", ["user_id", "created_at"]),
+    ("ix_summaries_user_id_created_at", "summaries", ["user_id", "created_at"]),
+    ("ix_studyplans_user_id_created_at", "studyplans", ["user_id", "created_at"]),
+    ("ix_interviews_user_id_created_at", "interviews", ["user_id", "created_at"]),
+    ("ix_jobs_user_id_created_at", "jobs", ["user_id", "created_at"]),
+    ("ix_jobs_status", "jobs", ["status"]),
+]
+
+
+def upgrade() -> None:
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    for name, table, columns in INDEXES:
+        if table in tables:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    for name, table, _ in reversed(INDEXES):
+        if table in tables:
+            op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,41 @@
+"""add studyplan response body
+
+Adds studyplans.response_body, the StudyPlanResponse JSON serialized when
+the plan is saved. Existing plans keep a NULL body and are serialized from
+their content when they are read.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_column() -> bool:
+    inspector = sa.inspect(op.get_bind())
+    if "studyplans" not in inspector.get_table_names():
+        return False
+    return "response_body" in [column["name"] for column in inspector.get_columns("studyplans")]
+
+
+def upgrade() -> None:
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if "studyplans" in tables and not _has_column():
+        op.add_column("studyplans", sa.Column("response_body", sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    if _has_column():
+        with op.batch_alter_table("studyplans") as batch_op:
+            batch_op.drop_column("response_body")
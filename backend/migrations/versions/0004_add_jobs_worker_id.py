@@ -0,0 +1,41 @@
+"""add jobs worker id
+
+Adds jobs.worker_id, the process that claimed a running job. Together with
+updated_at, renewed while the job runs, it lets any process recover the jobs
+of a worker that stopped without running jobs that are still alive twice.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_column() -> bool:
+    inspector = sa.inspect(op.get_bind())
+    if "jobs" not in inspector.get_table_names():
+        return False
+    return "worker_id" in [column["name"] for column in inspector.get_columns("jobs")]
+
+
+def upgrade() -> None:
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if "jobs" in tables and not _has_column():
+        op.add_column("jobs", sa.Column("worker_id", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    if _has_column():
+        with op.batch_alter_table("jobs") as batch_op:
+            batch_op.drop_column("worker_id")
@@ -1,8 +1,47 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, Boolean # Added Boolean, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, Boolean, Index, LargeBinary # Added Boolean, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.sql.sqltypes import TIMESTAMP
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.dialects.sqlite import DATETIME
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import JSON
 from database import Base
+import json
+
+
+# SQLite stores CURRENT_TIMESTAMP without microseconds, so bind values in the same format
+# to keep comparisons on created_at (e.g. pagination cursors) exact
+Timestamp = TIMESTAMP().with_variant(
+    DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite"
+)
+
+
+class JSONText(TypeDecorator):
+    """
+    Column holding a JSON document that the application reads and writes as a JSON string.
+    Stored natively as JSONB on PostgreSQL and JSON on MySQL, and as plain text elsewhere.
+    """
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(JSONB())
+        if dialect.name in ("mysql", "mariadb"):
+            return dialect.type_descriptor(JSON())
+        return dialect.type_descriptor(Text())
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and dialect.name in ("postgresql", "mysql", "mariadb"):
+            return json.loads(value)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None and dialect.name in ("postgresql", "mysql", "mariadb"):
+            return json.dumps(value)
+        return value
 
 
 class User(Base):
@@ -12,7 +51,7 @@ class User(Base):
     username = Column(String, nullable=False, unique=True)
     email = Column(String, nullable=False, unique=True)
     password = Column(String, nullable=False)
-    created_at = Column(TIMESTAMP, server_default=func.current_timestamp(), nullable=False)
+    created_at = Column(Timestamp, server_default=func.current_timestamp(), nullable=False)
 
     # Establish relationship with Test model
     tests = relationship("Test", back_populates="user")
@@ -26,9 +65,15 @@ class User(Base):
     # Establish relationship with Interview model
     interviews = relationship("Interview", back_populates="user") # Added relationship
 
+    # Establish relationship with Job model
+    jobs = relationship("Job", back_populates="user")
+
 
 class Question(Base):
     __tablename__ = "questions"
+    __table_args__ = (
+        Index("ix_questions_test_id", "test_id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     question = Column(String, nullable=False)
@@ -45,12 +90,16 @@ class Question(Base):
 
 class Test(Base):
     __tablename__ = "tests"
+    __table_args__ = (
+        # Serves the "my items, newest first" listings
+        Index("ix_tests_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     title = Column(String, nullable=False)
     num_questions = Column(Integer, nullable=False)
     difficulty = Column(String, nullable=False)
-    created_at = Column(TIMESTAMP, server_default=func.current_timestamp(), nullable=False)
+    created_at = Column(Timestamp, server_default=func.current_timestamp(), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
     # Relationship with User
@@ -62,13 +111,16 @@ class Test(Base):
 
 class Summary(Base):
     __tablename__ = "summaries"
+    __table_args__ = (
+        Index("ix_summaries_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     content = Column(Text, nullable=False)
     original_filename = Column(String, nullable=True)
     word_count = Column(Integer, nullable=False)
     detail_level = Column(String, nullable=False)
-    created_at = Column(TIMESTAMP, server_default=func.current_timestamp(), nullable=False)
+    created_at = Column(Timestamp, server_default=func.current_timestamp(), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
     # Relationship with User
@@ -77,12 +129,19 @@ class Summary(Base):
 
 class StudyPlan(Base):
     __tablename__ = "studyplans"
+    __table_args__ = (
+        Index("ix_studyplans_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     topic = Column(String, nullable=False)
-    content = Column(Text, nullable=False)
+    content = Column(JSONText, nullable=False)
+    # StudyPlanResponse serialized once when the plan is saved, served as is by the read endpoints
+    response_body = Column(Text, nullable=True)
+    # Gzipped copy of response_body, sent as is to clients that accept gzip
+    response_body_gzip = Column(LargeBinary, nullable=True)
     quick_reference = Column(Text, nullable=True)
-    created_at = Column(TIMESTAMP, server_default=func.current_timestamp(), nullable=False)
+    created_at = Column(Timestamp, server_default=func.current_timestamp(), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
     # Relationship with User
@@ -92,19 +151,44 @@ class StudyPlan(Base):
 # New Interview Model
 class Interview(Base):
     __tablename__ = "interviews"
+    __table_args__ = (
+        Index("ix_interviews_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     role = Column(String, nullable=False)
     type = Column(String, nullable=False) # e.g., "behavioural", "technical"
     level = Column(String, nullable=False) # e.g., "junior", "senior"
-    # Storing lists as JSON strings in a Text field is common
-    techstack = Column(Text, nullable=False) # Store as JSON string '["Python", "FastAPI"]'
-    questions = Column(Text, nullable=False) # Store as JSON string '["Q1", "Q2"]'
+    # Lists are read and written as JSON strings, and stored natively where the database supports JSON
+    techstack = Column(JSONText, nullable=False) # Store as JSON string '["Python", "FastAPI"]'
+    questions = Column(JSONText, nullable=False) # Store as JSON string '["Q1", "Q2"]'
     finalized = Column(Boolean, default=True, nullable=False)
-    created_at = Column(TIMESTAMP, server_default=func.current_timestamp(), nullable=False)
+    created_at = Column(Timestamp, server_default=func.current_timestamp(), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
 
     # Relationship with User
     user = relationship("User", back_populates="interviews")
 
 
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("ix_jobs_user_id_created_at", "user_id", "created_at"),
+        Index("ix_jobs_status", "status"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False) # e.g., "questions", "summary", "studyplan", "interview"
+    status = Column(String, nullable=False, default="queued") # queued, running, succeeded, failed, cancelled
+    payload = Column(Text, nullable=False) # Store the job input as a JSON string
+    result_id = Column(Integer, nullable=True) # Id of the Test/Summary/StudyPlan/Interview row that was created
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    # Process running the job, which renews updated_at as its lease while the job runs
+    worker_id = Column(String, nullable=True)
+    created_at = Column(Timestamp, server_default=func.current_timestamp(), nullable=False)
+    updated_at = Column(Timestamp, server_default=func.current_timestamp(), onupdate=func.current_timestamp(), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+
+    # Relationship with User
+    user = relationship("User", back_populates="jobs")
@@ -2,9 +2,12 @@ from fastapi import Depends, status, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv
+from cachetools import TTLCache
 import os
+import threading
 import schemas, database, models
 
 load_dotenv()
@@ -20,6 +23,17 @@ SECRET_KEY = os.getenv('SECRET_KEY')
 ALGORITHM = os.getenv('ALGORITHM')
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv('ACCESS_TOKEN_EXPIRE_MINUTES'))
 
+# Identity cache, so authenticated requests don't hit the database for the user on every call
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '60'))
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '1024'))
+
+_user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+_user_cache_lock = threading.Lock()
+
+def invalidate_cached_user(user_id: int):
+  with _user_cache_lock:
+    _user_cache.pop(user_id, None)
+
 def create_access_token(data: dict):
   to_encode = data.copy()
 
@@ -43,14 +57,37 @@ def verify_access_token(token: str, credentials_exception):
     raise credentials_exception
   
   return token_data
+
+def _credentials_exception():
+  return HTTPException(status_code=status.HTTP_403_FORBIDDEN, 
+                       detail="could not validate credentials",
+                       headers={"WWW-Authenticate": "Bearer"})
   
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-  credentials_exception = HTTPException(status_code=status.HTTP_403_FORBIDDEN, 
-                                        detail="could not validate credentials",
-                                        headers={"WWW-Authenticate": "Bearer"})
-  
-  token = verify_access_token(token, credentials_exception)
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_async_db)):
+  token = verify_access_token(token, _credentials_exception())
 
-  user = db.query(models.User).filter(models.User.id == token.id).first()
+  with _user_cache_lock:
+    user = _user_cache.get(token.id)
+  if user is not None:
+    return user
+
+  user = (await db.execute(select(models.User).where(models.User.id == token.id))).scalars().first()
+
+  if user is not None:
+    # Detach the user so that commits in other sessions don't expire the cached copy
+    db.expunge(user)
+    with _user_cache_lock:
+      _user_cache[token.id] = user
   
-  return user
\ No newline at end of file
+  return user
+
+def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
+  """
+  Token-only fast path for endpoints that only need the id of the current user
+  """
+  token = verify_access_token(token, _credentials_exception())
+
+  if token.id is None:
+    raise _credentials_exception()
+
+  return token.id
\ No newline at end of file
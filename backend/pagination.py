@@ -0,0 +1,86 @@
+from fastapi import HTTPException, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import Select, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from typing import List, Optional, Tuple
+from dotenv import load_dotenv
+import base64
+import binascii
+import os
+
+load_dotenv()
+
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "50"))
+LIST_MAX_PAGE_SIZE = int(os.getenv("LIST_MAX_PAGE_SIZE", "200"))
+
+# Response header carrying the cursor of the next page, absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def keyset_select(stmt: Select, model, cursor: Optional[str], limit: int) -> Select:
+    """
+    Restricts the statement to the page after the cursor, newest first, ordered on (created_at, id).
+    One extra row is selected to tell whether there is a next page.
+    """
+    stmt = stmt.order_by(model.created_at.desc(), model.id.desc())
+
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            model.created_at < created_at,
+            and_(model.created_at == created_at, model.id < last_id)
+        ))
+
+    return stmt.limit(limit + 1)
+
+
+def split_page(rows: List, limit: int) -> Tuple[List, Optional[str]]:
+    """
+    Drops the extra row selected by keyset_select and returns the cursor of the next page.
+    """
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
+async def keyset_page(db: AsyncSession, stmt: Select, model, cursor: Optional[str], limit: int) -> Tuple[List, Optional[str]]:
+    """
+    Returns one page of the statement, newest first, along with the cursor of the next page.
+    Selecting the model returns ORM objects, selecting columns returns rows.
+    """
+    result = await db.execute(keyset_select(stmt, model, cursor, limit))
+
+    descriptions = stmt.column_descriptions
+    if len(descriptions) == 1 and descriptions[0]["type"] is model:
+        rows = result.scalars().all()
+    else:
+        rows = result.all()
+
+    return split_page(list(rows), limit)
+
+
+def listing_response(rows: List, schema, next_cursor: Optional[str]) -> ORJSONResponse:
+    """
+    Serializes projected rows with the given listing schema.
+    """
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    # Validated once here, and dumped straight to orjson without a pass through jsonable_encoder
+    return ORJSONResponse(
+        content=[schema.model_validate(row).model_dump() for row in rows],
+        headers=headers
+    )
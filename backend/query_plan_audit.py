@@ -0,0 +1,183 @@
+"""
+Runs the statements issued by the routes, the auth layer and the job queue against a SQLite copy of
+the schema with EXPLAIN QUERY PLAN, and exits with a non-zero status if any of them scans a table or
+sorts its results in a temporary b-tree.
+
+The route statements are the ones the routers build (keyset_select, select_plan_bodies, the listing
+projections, ...): they are captured by calling the read and delete routes of the app in process.
+The job queue statements come from the builders in jobs.py.
+
+    python query_plan_audit.py
+"""
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from datetime import datetime, timedelta
+from typing import List, Tuple
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+
+from database import Base, create_db_engine, create_async_db_engine, get_db, get_async_db
+from models import User, Test, Question, Summary, StudyPlan, Interview, Job
+from pagination import encode_cursor
+from oauth2 import create_access_token
+import jobs
+import utils
+
+# Statement kinds whose plan is checked
+AUDITED_STATEMENTS = ("SELECT", "UPDATE", "DELETE")
+
+
+def seed(db):
+    """
+    Adds one row of each kind, so that the routes go past their 404 checks.
+    """
+    db.add(User(id=1, username="audit", email="audit@example.com", password=utils.hash("x")))
+    db.add(Test(id=1, title="Test", num_questions=1, difficulty="easy", user_id=1))
+    db.add(Question(question="Q", option_a="a", option_b="b", option_c="c", option_d="d", answer="a", test_id=1))
+    db.add(Summary(id=1, content="Summary", original_filename="a.txt", word_count=10, detail_level="brief", user_id=1))
+    db.add(StudyPlan(
+        id=1, topic="Topic", content=json.dumps({"overview": ""}), response_body="{}",
+        response_body_gzip=b"", quick_reference="# Topic", user_id=1
+    ))
+    db.add(Interview(
+        id=1, role="dev", type="technical", level="junior", techstack=json.dumps(["Python"]),
+        questions=json.dumps(["Q"]), user_id=1
+    ))
+    db.add(Job(id=1, kind="summary", status=jobs.QUEUED, payload="{}", user_id=1))
+    db.commit()
+
+
+def audit_routes(client: TestClient):
+    """
+    Calls every read and delete route, on the first page and on a following page of the listings.
+    """
+    cursor = encode_cursor(datetime(2100, 1, 1), 10)
+    etag = {"If-None-Match": '"audit"'}
+
+    requests = [("POST", "/login", {"data": {"username": "audit", "password": "x"}}), ("GET", "/users/1", {})]
+
+    for path in ("/questions/my-tests", "/summary/", "/studyplan/", "/interviews/"):
+        for view in ("full", "listing"):
+            requests.append(("GET", path, {"params": {"view": view}}))
+            requests.append(("GET", path, {"params": {"view": view, "cursor": cursor}}))
+
+    for path in ("/questions/1", "/summary/1", "/studyplan/1", "/studyplan/1/reference", "/interviews/1"):
+        requests.append(("GET", path, {"headers": etag}))
+    requests.append(("GET", "/studyplan/1", {"headers": {"Accept-Encoding": "identity"}}))
+    requests.append(("GET", "/studyplan/1", {"headers": {"Accept-Encoding": "gzip"}}))
+
+    requests += [("GET", "/jobs/1", {}), ("DELETE", "/jobs/1", {})]
+    requests += [("DELETE", path, {}) for path in ("/summary/1", "/studyplan/1", "/interviews/1")]
+
+    for method, path, kwargs in requests:
+        response = client.request(method, path, **kwargs)
+        # A route that fails early would skip the statements it issues past its checks
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {path} failed with {response.status_code}: {response.text}")
+
+
+def audit_job_queue(db):
+    cutoff = jobs.utcnow() - timedelta(seconds=jobs.JOB_LEASE_SECONDS)
+    for stmt in (
+        jobs.claim_job(1, "audit"),
+        jobs.renew_lease(1, "audit"),
+        jobs.finish_job(1, "audit", status=jobs.SUCCEEDED),
+        jobs.cancel_job(1),
+        jobs.fail_expired_jobs(cutoff, jobs.JOB_MAX_ATTEMPTS),
+        jobs.requeue_expired_jobs(cutoff),
+        jobs.select_pending_jobs(),
+        jobs.select_pending_jobs(cutoff),
+        jobs.release_jobs("audit", cutoff),
+    ):
+        db.execute(stmt)
+    db.get(Job, 1)
+    db.commit()
+
+
+def collect_plans(path: str) -> List[Tuple[str, List[str]]]:
+    """
+    Returns each audited statement issued by the app with the details of its query plan.
+    """
+    from main import app
+
+    url = f"sqlite:///{path}"
+    engine = create_db_engine(url)
+    async_engine = create_async_db_engine(url)
+    Base.metadata.create_all(bind=engine)
+
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    with SessionLocal() as db:
+        seed(db)
+
+    plans = []
+
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(AUDITED_STATEMENTS):
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            rows = cursor.fetchall()
+            plans.append((statement, [row[-1] for row in rows]))
+
+    event.listen(engine, "before_cursor_execute", explain)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", explain)
+
+    def override_get_db():
+        with SessionLocal() as db:
+            yield db
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    try:
+        # Not used as a context manager, so the startup handlers (job workers, model client) don't run
+        client = TestClient(app)
+        client.headers["Authorization"] = f"Bearer {create_access_token({'user_id': 1})}"
+        audit_routes(client)
+        with SessionLocal() as db:
+            audit_job_queue(db)
+    finally:
+        app.dependency_overrides.clear()
+        engine.dispose()
+        asyncio.run(async_engine.dispose())
+
+    return plans
+
+
+def find_scans(plans: List[Tuple[str, List[str]]]) -> List[Tuple[str, List[str]]]:
+    """
+    Returns the statements whose plan scans a table or sorts in a temporary b-tree.
+    """
+    return [
+        (statement, details) for statement, details in plans
+        if any(detail.startswith("SCAN") or "TEMP B-TREE" in detail for detail in details)
+    ]
+
+
+def main() -> int:
+    # The statements are reported below, the app logs of each request would bury them
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as directory:
+        plans = collect_plans(os.path.join(directory, "audit.db"))
+
+    failures = find_scans(plans)
+    for statement, details in failures:
+        print("FAIL: " + " ".join(statement.split()))
+        for detail in details:
+            print("    " + detail)
+
+    print(f"{len(plans)} statements checked, {len(failures)} with a scan or sort")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
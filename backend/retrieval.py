@@ -0,0 +1,306 @@
+from collections import OrderedDict
+from typing import Callable, Iterable, List, Optional, Sequence
+from dotenv import load_dotenv
+import numpy as np
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+load_dotenv()
+
+RETRIEVAL_INDEX_DIR = os.getenv("RETRIEVAL_INDEX_DIR", "./retrieval_index")
+RETRIEVAL_INDEX_MAX_ENTRIES = int(os.getenv("RETRIEVAL_INDEX_MAX_ENTRIES", "256"))
+# Local sentence-transformers model used on the CPU when the package is installed, hashed TF-IDF otherwise
+RETRIEVAL_EMBEDDING_MODEL = os.getenv("RETRIEVAL_EMBEDDING_MODEL", "")
+RETRIEVAL_HASH_DIM = int(os.getenv("RETRIEVAL_HASH_DIM", "4096"))
+
+# Local knowledge store searched by the agents before they fall back to live web search
+KNOWLEDGE_STORE_PATH = os.getenv("KNOWLEDGE_STORE_PATH", "./knowledge.db")
+KNOWLEDGE_MAX_SOURCES = int(os.getenv("KNOWLEDGE_MAX_SOURCES", "5000"))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset((
+    "a an and are as at be by can for from has have in is it its of on or that the this to was were which with "
+    "not but if then than so such these those their there they we you he she his her our your will would"
+).split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+class TfidfEmbedder:
+    """
+    Embeds texts as L2-normalized TF-IDF vectors, with terms hashed into a fixed number of dimensions
+    so that no vocabulary has to be stored. The IDF weights are fitted on the passages of each index.
+    """
+    def __init__(self, dim: int = RETRIEVAL_HASH_DIM):
+        self.dim = dim
+        self.name = f"tfidf-{dim}"
+
+    def _counts(self, texts: Sequence[str]) -> np.ndarray:
+        counts = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            buckets = [zlib.crc32(token.encode("utf-8")) % self.dim for token in tokenize(text)]
+            if buckets:
+                counts[i] = np.bincount(buckets, minlength=self.dim)
+        return counts
+
+    def fit(self, texts: Sequence[str]) -> np.ndarray:
+        document_frequency = (self._counts(texts) > 0).sum(axis=0)
+        return (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+    def embed(self, texts: Sequence[str], weights: np.ndarray) -> np.ndarray:
+        vectors = np.log1p(self._counts(texts)) * weights
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class SentenceEmbedder:
+    """
+    Embeds texts with a local sentence-transformers model, run on the CPU.
+    """
+    def __init__(self, model_name: str):
+        self.name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def fit(self, texts: Sequence[str]) -> np.ndarray:
+        return np.zeros(0, dtype=np.float32)
+
+    def embed(self, texts: Sequence[str], weights: np.ndarray) -> np.ndarray:
+        return self.model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+
+def get_embedder():
+    if RETRIEVAL_EMBEDDING_MODEL and SentenceTransformer is not None:
+        return SentenceEmbedder(RETRIEVAL_EMBEDDING_MODEL)
+    if RETRIEVAL_EMBEDDING_MODEL:
+        logging.warning("sentence-transformers is not installed, falling back to TF-IDF retrieval")
+    return TfidfEmbedder()
+
+
+class VectorIndex:
+    """
+    Passages of a document with their normalized vectors and the section each passage belongs to.
+    """
+    def __init__(self, embedder, passages: List[str], sections: np.ndarray, vectors: np.ndarray, weights: np.ndarray):
+        self.embedder = embedder
+        self.passages = passages
+        self.sections = sections
+        self.vectors = vectors
+        self.weights = weights
+
+    @classmethod
+    def build(cls, embedder, passages: List[str], sections: List[int]) -> "VectorIndex":
+        weights = embedder.fit(passages)
+        return cls(embedder, passages, np.asarray(sections, dtype=np.int32), embedder.embed(passages, weights), weights)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        return self.embedder.embed([text], self.weights)[0]
+
+    def rank_sections(self, query: Optional[str] = None) -> List[np.ndarray]:
+        """
+        Passage ids of each section, ordered by their similarity to the centroid of the section
+        and to the query when one is given.
+        """
+        query_vector = self.embed_query(query) if query else None
+        ranked = []
+
+        for section in range(int(self.sections.max()) + 1 if len(self.sections) else 0):
+            ids = np.flatnonzero(self.sections == section)
+            vectors = self.vectors[ids]
+            scores = vectors @ vectors.mean(axis=0)
+            if query_vector is not None:
+                scores = scores + vectors @ query_vector
+            ranked.append(ids[np.argsort(-scores)])
+
+        return ranked
+
+    def save(self, path: str):
+        # TF-IDF vectors are mostly zeros, so they compress well
+        np.savez_compressed(
+            path,
+            passages=np.array(self.passages, dtype=str),
+            sections=self.sections,
+            vectors=self.vectors,
+            weights=self.weights
+        )
+
+    @classmethod
+    def load(cls, embedder, path: str) -> "VectorIndex":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(embedder, data["passages"].tolist(), data["sections"], data["vectors"], data["weights"])
+
+
+class IndexStore:
+    """
+    Vector indexes keyed by the hash of the indexed text, kept in .npz files on disk
+    so that a document uploaded again is not re-embedded. Recently used indexes are also kept in memory.
+    """
+    def __init__(self, directory: str, max_entries: int = 256, memory_entries: int = 16):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self._embedder = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def embedder(self):
+        # Loading a sentence-transformers model is slow, so it is done on first use
+        if self._embedder is None:
+            self._embedder = get_embedder()
+        return self._embedder
+
+    def make_key(self, text: str, **params) -> str:
+        payload = repr((self.embedder.name, sorted(params.items()), text))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get_or_build(self, key: str, build: Callable[[], VectorIndex]) -> VectorIndex:
+        """
+        Returns the index stored under key, building and storing it with build() when there is none.
+        """
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None:
+                self._entries.move_to_end(key)
+                return index
+
+        path = self._path(key)
+        try:
+            index = VectorIndex.load(self.embedder, path)
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            index = build()
+            self._save(path, index)
+
+        with self._lock:
+            self._entries[key] = index
+            while len(self._entries) > self.memory_entries:
+                self._entries.popitem(last=False)
+        return index
+
+    def _save(self, path: str, index: VectorIndex):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Written to a temporary file first so that readers never see a partial index
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".npz")
+            with os.fdopen(fd, "wb") as f:
+                index.save(f)
+            os.replace(tmp_path, path)
+            self._evict()
+        except OSError as e:
+            logging.warning(f"Could not store retrieval index {path}: {e}")
+
+    def _evict(self):
+        files = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith(".npz")]
+        if len(files) <= self.max_entries:
+            return
+
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+index_store = IndexStore(RETRIEVAL_INDEX_DIR, max_entries=RETRIEVAL_INDEX_MAX_ENTRIES)
+
+
+class KnowledgeStore:
+    """
+    On-disk store of reference passages (fetched pages, generated study plans, ...) with a BM25 full-text index,
+    backed by SQLite FTS5. Each source is stored as a set of passages and replaced as a whole when added again,
+    and the oldest sources are evicted above max_sources.
+    """
+    def __init__(self, path: str = "./knowledge.db", max_sources: int = 5000):
+        self.max_sources = max_sources
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            "source TEXT PRIMARY KEY, kind TEXT NOT NULL, title TEXT, added_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_sources_added_at ON sources (added_at)")
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS passages USING fts5(text, source UNINDEXED, title UNINDEXED)"
+        )
+        self._conn.commit()
+
+    def has(self, source: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM sources WHERE source = ?", (source,)).fetchone() is not None
+
+    def add(self, source: str, kind: str, title: Optional[str], passages: Iterable[str]):
+        with self._lock:
+            self._conn.execute("DELETE FROM passages WHERE source = ?", (source,))
+            self._conn.executemany(
+                "INSERT INTO passages (text, source, title) VALUES (?, ?, ?)",
+                [(passage, source, title) for passage in passages if passage.strip()]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sources (source, kind, title, added_at) VALUES (?, ?, ?, ?)",
+                (source, kind, title, time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def search(self, query: str, k: int = 5) -> List[dict]:
+        """
+        Returns the k passages ranked best by BM25 for the query, with the share of the query terms each one contains.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+
+        # Terms are quoted so that words like AND or NEAR are not read as query syntax
+        match = " OR ".join(f'"{term}"' for term in terms)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT text, source, title, bm25(passages) FROM passages WHERE passages MATCH ? "
+                "ORDER BY bm25(passages) LIMIT ?",
+                (match, k)
+            ).fetchall()
+
+        results = []
+        for text, source, title, score in rows:
+            found = set(tokenize(text))
+            results.append({
+                "title": title or source,
+                "source": source,
+                "content": text,
+                "score": -score,
+                "coverage": sum(term in found for term in terms) / len(terms)
+            })
+        return results
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM sources").fetchone()[0]
+        if count <= self.max_sources:
+            return
+
+        evicted = self._conn.execute(
+            "SELECT source FROM sources ORDER BY added_at LIMIT ?", (count - self.max_sources,)
+        ).fetchall()
+        for (source,) in evicted:
+            self._conn.execute("DELETE FROM passages WHERE source = ?", (source,))
+            self._conn.execute("DELETE FROM sources WHERE source = ?", (source,))
+
+
+knowledge_store = KnowledgeStore(KNOWLEDGE_STORE_PATH, max_sources=KNOWLEDGE_MAX_SOURCES)
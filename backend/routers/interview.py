@@ -1,12 +1,17 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Header, HTTPException, Query, Response, status, Depends
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import Interview, User
-from database import get_db
+from database import get_async_db
 import os
 from dotenv import load_dotenv
-from schemas import InterviewCreate, InterviewReviewAnswers
+from schemas import InterviewCreate, InterviewReviewAnswers, InterviewListing
+from pagination import LIST_PAGE_SIZE, LIST_MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, keyset_page, listing_response
+from http_cache import artifact_etag, cache_headers, not_modified
+from typing import Optional
 from utils import InterviewAgent, get_interview_agent
-from oauth2 import get_current_user
+from oauth2 import get_current_user, get_current_user_id
 import json
 import logging
 
@@ -28,7 +33,7 @@ router = APIRouter(
 async def create_interview_questions(
     # Use InterviewCreate for the input data
     interview_data: InterviewCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
     agent: InterviewAgent = Depends(get_interview_agent)
 ):
@@ -65,8 +70,8 @@ async def create_interview_questions(
         )
 
         db.add(db_interview)
-        db.commit()
-        db.refresh(db_interview)
+        await db.commit()
+        await db.refresh(db_interview)
 
         logger.info(f"Successfully created interview record with ID: {db_interview.id}")
 
@@ -76,7 +81,7 @@ async def create_interview_questions(
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error creating interview questions: {e}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -84,31 +89,68 @@ async def create_interview_questions(
         )
 
 
+def select_interview_listing():
+    """
+    Selects the listing fields of the interviews, without their questions
+    """
+    return select(
+        Interview.id,
+        Interview.role,
+        Interview.type,
+        Interview.level,
+        Interview.techstack,
+        Interview.finalized,
+        Interview.created_at
+    )
+
+
 # Use InterviewResponse for the response model list items
 @router.get("/", status_code=status.HTTP_200_OK)
 async def get_user_interviews(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_MAX_PAGE_SIZE, description="Number of interviews per page"),
+    cursor: Optional[str] = Query(None, description="Cursor of the page to fetch, from the X-Next-Cursor header"),
+    view: str = Query("full", pattern="^(full|listing)$", description="'listing' leaves out the questions"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id)
 ):
     """
-    Retrieves all interviews associated with the currently logged-in user.
+    Retrieves the interviews of the currently logged-in user, newest first, one page at a time.
+    The X-Next-Cursor response header holds the cursor of the next page.
     """
     # Now 'Interview' unambiguously refers to the SQLAlchemy model
     try:
-        logger.info(f"Fetching interviews for user ID: {current_user.id}")
+        logger.info(f"Fetching interviews for user ID: {current_user_id}")
         # Use the SQLAlchemy model 'Interview' here
-        interviews = db.query(Interview).filter(Interview.user_id == current_user.id).order_by(Interview.created_at.desc()).all()
+        if view == "listing":
+            stmt = select_interview_listing()
+        else:
+            stmt = select(Interview)
+
+        interviews, next_cursor = await keyset_page(
+            db,
+            stmt.where(Interview.user_id == current_user_id),
+            Interview,
+            cursor,
+            limit
+        )
 
         if not interviews:
-            logger.info(f"No interviews found for user ID: {current_user.id}")
+            logger.info(f"No interviews found for user ID: {current_user_id}")
             return []
 
-        logger.info(f"Found {len(interviews)} interviews for user ID: {current_user.id}")
+        logger.info(f"Found {len(interviews)} interviews for user ID: {current_user_id}")
+
+        if view == "listing":
+            return listing_response(interviews, InterviewListing, next_cursor)
+
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         # Return the list of SQLAlchemy objects; FastAPI uses response_model
         return interviews
 
     except Exception as e:
-        logger.error(f"Error fetching interviews for user {current_user.id}: {e}", exc_info=True)
+        logger.error(f"Error fetching interviews for user {current_user_id}: {e}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred while fetching interviews: {str(e)}"
@@ -118,15 +160,23 @@ async def get_user_interviews(
 @router.get("/{interview_id}", status_code=status.HTTP_200_OK)
 async def get_interview_by_id(
     interview_id: int,
-    db: Session = Depends(get_db)
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
     ):
     """
     Retrieves a specific interview by its ID for the currently logged-in user.
+    Interviews never change, so a matching If-None-Match returns a 304.
     """
     try:        
-        interview = db.query(Interview).filter(
+        cached = await not_modified(db, Interview, interview_id, "interview", if_none_match)
+        if cached:
+            return cached
+
+        result = await db.execute(select(Interview).where(
             Interview.id == interview_id,
-        ).first()
+        ))
+        interview = result.scalars().first()
         
         if not interview:
             raise HTTPException(
@@ -135,6 +185,7 @@ async def get_interview_by_id(
             )
             
         logger.info(f"Successfully retrieved interview ID: {interview_id}")
+        response.headers.update(cache_headers(artifact_etag("interview", interview.id, interview.created_at)))
         return interview
         
     except HTTPException as http_exc:
@@ -150,7 +201,7 @@ async def get_interview_by_id(
 @router.delete("/{interview_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_interview(
     interview_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -159,12 +210,12 @@ async def delete_interview(
     try:
         logger.info(f"Attempting to delete interview ID: {interview_id} for user ID: {current_user.id}")
         
-        interview_query = db.query(Interview).filter(
+        result = await db.execute(select(Interview.id).where(
             Interview.id == interview_id,
             Interview.user_id == current_user.id
-        )
+        ))
         
-        interview = interview_query.first()
+        interview = result.first()
         
         if not interview:
             logger.warning(f"Interview ID: {interview_id} not found for user ID: {current_user.id}")
@@ -173,8 +224,8 @@ async def delete_interview(
                 detail=f"Interview with ID {interview_id} not found"
             )
             
-        interview_query.delete(synchronize_session=False)
-        db.commit()
+        await db.execute(delete(Interview).where(Interview.id == interview_id))
+        await db.commit()
         
         logger.info(f"Successfully deleted interview ID: {interview_id}")
         return {"message": "Interview deleted successfully"}
@@ -182,7 +233,7 @@ async def delete_interview(
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error deleting interview ID {interview_id}: {e}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -193,7 +244,7 @@ async def delete_interview(
 async def review_interview(
     interview_data: InterviewReviewAnswers,
     agent: InterviewAgent = Depends(get_interview_agent),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -210,10 +261,11 @@ async def review_interview(
         
         # Verify the interview exists and belongs to the current user
         if interview_id:
-            interview = db.query(Interview).filter(
+            result = await db.execute(select(Interview.id).where(
                 Interview.id == interview_id,
                 Interview.user_id == current_user.id
-            ).first()
+            ))
+            interview = result.first()
             
             if not interview:
                 logger.warning(f"Interview with ID {interview_id} not found for user {current_user.id}")
@@ -241,10 +293,11 @@ async def review_interview(
         logger.info(f"Successfully generated reviews with {len(reviews)} evaluation points")
         print(reviews)
         # Return the generated reviews (without storing in database)
-        return {
+        # The agent already validated the reviews, so they skip jsonable_encoder and go straight to orjson
+        return ORJSONResponse(content={
             "interview_id": interview_id,
-            "reviews": reviews
-        }
+            "reviews": [review.model_dump() for review in reviews]
+        })
         
     except HTTPException as http_exc:
         # Re-raise HTTP exceptions as-is
@@ -0,0 +1,120 @@
+from fastapi import APIRouter, Query, File, UploadFile, HTTPException, status, Depends
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from models import Job
+from schemas import JobResponse, StudyPlanRequest, InterviewCreate
+from utils import extract_text_from_file_async
+from oauth2 import get_current_user_id
+from jobs import job_queue
+from routers.questions import Difficulty
+
+router = APIRouter(
+    prefix='/jobs',
+    tags=['jobs']
+)
+
+async def get_user_job(job_id: int, db: AsyncSession, current_user_id: int) -> Job:
+    result = await db.execute(select(Job).where(Job.id == job_id, Job.user_id == current_user_id))
+    job = result.scalars().first()
+
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Job with ID {job_id} not found"
+        )
+
+    return job
+
+@router.post("/questions", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def queue_questions(
+    file: UploadFile = File(...),
+    num_questions: int = Query(5, title="Number of Questions"),
+    difficulty: Difficulty = Query(..., title="Difficulty"),
+    test_title: str = Query(..., title="Test Title"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """
+    Queue the generation of a test from the uploaded file. Poll `GET /jobs/{id}` for the id of the created test.
+    """
+    text = await extract_text_from_file_async(file)
+
+    return await job_queue.submit(db, "questions", {
+        "text": text,
+        "num_questions": num_questions,
+        "difficulty": difficulty.value,
+        "test_title": test_title
+    }, current_user_id)
+
+@router.post("/summary", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def queue_summary(
+    file: UploadFile = File(...),
+    word_length: Optional[int] = Query(150, description="Target word count for the summary"),
+    detail_level: Optional[str] = Query("medium", description="Level of detail (low, medium, high)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """
+    Queue the summarization of the uploaded file. Poll `GET /jobs/{id}` for the id of the created summary.
+    """
+    if detail_level not in ["low", "medium", "high"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="detail_level must be one of: low, medium, high"
+        )
+
+    text = await extract_text_from_file_async(file)
+
+    return await job_queue.submit(db, "summary", {
+        "text": text,
+        "word_length": word_length,
+        "detail_level": detail_level,
+        "original_filename": file.filename
+    }, current_user_id)
+
+@router.post("/studyplan", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def queue_studyplan(
+    request: StudyPlanRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """
+    Queue the generation of a study plan. Poll `GET /jobs/{id}` for the id of the created study plan.
+    """
+    return await job_queue.submit(db, "studyplan", {"topic": request.topic}, current_user_id)
+
+@router.post("/interview", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def queue_interview(
+    interview_data: InterviewCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """
+    Queue the generation of interview questions. Poll `GET /jobs/{id}` for the id of the created interview.
+    """
+    return await job_queue.submit(db, "interview", interview_data.model_dump(), current_user_id)
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """
+    Get the status of a job, and the id of its result once it has succeeded.
+    """
+    return await get_user_job(job_id, db, current_user_id)
+
+@router.delete("/{job_id}", response_model=JobResponse)
+async def cancel_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id)
+):
+    """
+    Cancel a queued or running job. Finished jobs are returned unchanged.
+    """
+    job = await get_user_job(job_id, db, current_user_id)
+    return await job_queue.cancel(db, job)
@@ -1,12 +1,21 @@
-from fastapi import APIRouter, Query, File, UploadFile, HTTPException, status, Depends
-from typing import List, Union, Dict
+from fastapi import APIRouter, Query, File, UploadFile, Header, HTTPException, Response, status, Depends
+from fastapi.responses import ORJSONResponse
+from typing import List, Optional, Union, Dict
 from enum import Enum
-from sqlalchemy.orm import Session
-from utils import get_summary_question_generator_agent, extract_text_from_file, SummaryQuestionGeneratorAgent
-from schemas import ResponseQuestions
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from utils import (
+    get_summary_question_generator_agent, extract_text_from_file_async, extraction_service,
+    SummaryQuestionGeneratorAgent, QUESTIONS_BATCH_MAX_FILES
+)
+from schemas import BatchQuestionsResult, ResponseQuestions, TestListing
+from pagination import LIST_PAGE_SIZE, LIST_MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, keyset_page, listing_response
+from http_cache import artifact_etag, cache_headers, not_modified
 from models import Question, Test, User
-from database import get_db, init_db
-from oauth2 import get_current_user
+from database import get_async_db, init_db
+from oauth2 import get_current_user, get_current_user_id
+import asyncio
+import os
 
 
 router = APIRouter(
@@ -29,7 +38,7 @@ async def get_questions(
     num_questions: int = Query(5, title="Number of Questions"),
     difficulty: Difficulty = Query(..., title="Difficulty"),
     test_title: str = Query(..., title="Test Title"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),  # Get the logged-in user
     agent: SummaryQuestionGeneratorAgent = Depends(get_summary_question_generator_agent)  # Dependency injection for the agent
 ):
@@ -44,8 +53,8 @@ async def get_questions(
     - **description**: Optional description for the test
     """
     try:
-        extracted_text = extract_text_from_file(file)
-        questions_data = await agent.generate_questions(extracted_text, num_questions, difficulty)
+        extracted_text = await extract_text_from_file_async(file)
+        questions_data = await agent.generate_questions(extracted_text, num_questions, difficulty.value)
 
         # Create a new test entry associated with the authenticated user with the new fields
         new_test = Test(
@@ -55,54 +64,166 @@ async def get_questions(
             user_id=current_user.id
         )
         db.add(new_test)
-        db.commit()
-        db.refresh(new_test)
-
-        # Store generated questions in the database
-        questions_to_store = []
-        for q in questions_data:
-            new_question = Question(
-                question=q.question,
-                option_a=q.option_a,
-                option_b=q.option_b,
-                option_c=q.option_c,
-                option_d=q.option_d,
-                answer=q.answer,
-                test_id=new_test.id
-            )
-            questions_to_store.append(new_question)
-
-        db.add_all(questions_to_store)
-        db.commit()
-
-        return {"questions": questions_data, "test_id": new_test.id}
+        await db.flush()
+
+        # Store the test and its questions in one transaction, the questions as a single bulk insert
+        if questions_data:
+            await db.execute(insert(Question), [
+                {**q.model_dump(), "test_id": new_test.id}
+                for q in questions_data
+            ])
+        await db.commit()
+
+        # The questions were validated by the agent, so they are not validated again against the response model
+        return ORJSONResponse(content={
+            "questions": [q.model_dump() for q in questions_data],
+            "test_id": new_test.id
+        })
 
+    except HTTPException as http_exc:
+        await db.rollback()
+        raise http_exc
     except Exception as e:
-        db.rollback()  # Add rollback in case of error
+        await db.rollback()  # Add rollback in case of error
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
-    
+
+
+@router.post("/generate-questions/batch", response_model=List[BatchQuestionsResult])
+async def get_questions_batch(
+    files: List[UploadFile] = File(...),
+    num_questions: int = Query(5, title="Number of Questions"),
+    difficulty: Difficulty = Query(..., title="Difficulty"),
+    title_prefix: Optional[str] = Query(None, title="Test Title Prefix"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+    agent: SummaryQuestionGeneratorAgent = Depends(get_summary_question_generator_agent)
+):
+    """
+    Generate a test for each uploaded file, and store all of them in one transaction.
+    Files are extracted and their questions generated concurrently, so the request takes about as long as the slowest file.
+    A file that fails does not fail the others, its result holds the error instead.
+
+    - **files**: Documents containing content for question generation
+    - **num_questions**: Number of questions to generate per file
+    - **difficulty**: Difficulty level of the questions
+    - **title_prefix**: Optional prefix for the test titles, which are otherwise the file names
+    """
+    if len(files) > QUESTIONS_BATCH_MAX_FILES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {QUESTIONS_BATCH_MAX_FILES} files can be uploaded at once"
+        )
+
+    # Half of the extraction queue is left to other requests, so a large batch does not get its own files rejected
+    extraction_slots = asyncio.Semaphore(max(1, extraction_service.max_pending // 2))
+
+    async def generate(file: UploadFile) -> List[ResponseQuestions]:
+        async with extraction_slots:
+            text = await extract_text_from_file_async(file)
+        return await agent.generate_questions(text, num_questions, difficulty.value)
+
+    outcomes = await asyncio.gather(*(generate(file) for file in files), return_exceptions=True)
+
+    results = []
+    succeeded = []
+    for file, outcome in zip(files, outcomes):
+        if isinstance(outcome, BaseException):
+            error = outcome.detail if isinstance(outcome, HTTPException) else str(outcome)
+            results.append({"filename": file.filename, "status": "failed", "test_id": None, "questions": [], "error": error})
+            continue
+
+        title = os.path.splitext(file.filename)[0]
+        test = Test(
+            title=f"{title_prefix} - {title}" if title_prefix else title,
+            num_questions=num_questions,
+            difficulty=difficulty.value,
+            user_id=current_user.id
+        )
+        result = {"filename": file.filename, "status": "succeeded", "test_id": None,
+                  "questions": [q.model_dump() for q in outcome], "error": None}
+        results.append(result)
+        succeeded.append((test, result))
+
+    try:
+        if succeeded:
+            db.add_all([test for test, _ in succeeded])
+            await db.flush()
+
+            rows = [
+                {**question, "test_id": test.id}
+                for test, result in succeeded
+                for question in result["questions"]
+            ]
+            if rows:
+                await db.execute(insert(Question), rows)
+            await db.commit()
+
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+    for test, result in succeeded:
+        result["test_id"] = test.id
+
+    return ORJSONResponse(content=results)
+
+
+def select_test_listing():
+    """
+    Selects the listing fields of the tests, without their questions
+    """
+    return select(Test.id, Test.title, Test.num_questions, Test.difficulty, Test.created_at)
+
 
 @router.get("/my-tests")
 async def get_my_tests(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_MAX_PAGE_SIZE, description="Number of tests per page"),
+    cursor: Optional[str] = Query(None, description="Cursor of the page to fetch, from the X-Next-Cursor header"),
+    view: str = Query("full", pattern="^(full|listing)$", description="'listing' only returns the listing fields"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id)
 ):
     """
-    Get all tests created by the logged-in user.
+    Get the tests created by the logged-in user, newest first, one page at a time.
+    The X-Next-Cursor response header holds the cursor of the next page.
     """
-    return db.query(Test).filter(Test.user_id == current_user.id).all()
+    if view == "listing":
+        stmt = select_test_listing()
+    else:
+        stmt = select(Test)
+
+    tests, next_cursor = await keyset_page(db, stmt.where(Test.user_id == current_user_id), Test, cursor, limit)
+
+    if view == "listing":
+        return listing_response(tests, TestListing, next_cursor)
+
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return tests
 
 @router.get("/{test_id}", response_model=List[ResponseQuestions])
-def get_test_questions(test_id: int, db: Session = Depends(get_db)):
+async def get_test_questions(
+    test_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Get all questions associated with a test by test_id.
+    Tests never change, so a matching If-None-Match returns a 304 without loading the questions.
     """
+    cached = await not_modified(db, Test, test_id, "test", if_none_match)
+    if cached:
+        return cached
+
     # Check if test exists
-    test = db.query(Test).filter(Test.id == test_id).first()
+    test = (await db.execute(select(Test).where(Test.id == test_id))).scalars().first()
     if not test:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Test not found")
 
     # Retrieve all questions for the given test ID
-    questions = db.query(Question).filter(Question.test_id == test_id).all()
+    questions = (await db.execute(select(Question).where(Question.test_id == test_id))).scalars().all()
 
+    response.headers.update(cache_headers(artifact_etag("test", test.id, test.created_at)))
     return questions
\ No newline at end of file
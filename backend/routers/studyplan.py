@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Response, status
+from fastapi.responses import ORJSONResponse
+from sqlalchemy import case, select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from database import get_async_db, AsyncSessionLocal
 from models import StudyPlan, User
-from schemas import StudyPlanRequest, StudyPlanResponse, QuickReferenceResponse
+from schemas import StudyPlanRequest, StudyPlanResponse, StudyPlanListing, QuickReferenceResponse
+from pagination import LIST_PAGE_SIZE, LIST_MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, keyset_page, listing_response
+from http_cache import artifact_etag, cache_headers, not_modified
+from compression import negotiate_encoding, precompress, precompressed_response
 from utils import StudyPlanAgent, get_study_plan_agent  # Import the dependency function
-from oauth2 import get_current_user
+from oauth2 import get_current_user, get_current_user_id
 import json
 
 router = APIRouter(
@@ -13,93 +18,171 @@ router = APIRouter(
     tags=['study plan']
 )
 
+# Plans whose quick reference guide is being generated in the background
+_filling_quick_reference = set()
+
+async def fill_quick_reference(plan_id: int, topic: str, study_plan_agent: StudyPlanAgent):
+    """
+    Generates the quick reference guide for a study plan that was saved without one.
+    The column stays NULL if it fails again, so that the next read of the guide retries it.
+    """
+    if plan_id in _filling_quick_reference:
+        return
+
+    _filling_quick_reference.add(plan_id)
+    try:
+        quick_ref_data = await study_plan_agent.generate_quick_reference_guide(topic)
+        if quick_ref_data is None:
+            return
+
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                update(StudyPlan)
+                .where(StudyPlan.id == plan_id, StudyPlan.quick_reference.is_(None))
+                .values(quick_reference=quick_ref_data)
+            )
+            await db.commit()
+    finally:
+        _filling_quick_reference.discard(plan_id)
+
+def serialize_study_plan(plan, plan_dict: Optional[dict] = None) -> str:
+    """
+    Serializes a study plan as its StudyPlanResponse JSON body
+    """
+    if plan_dict is None:
+        plan_dict = json.loads(plan.content)
+
+    return StudyPlanResponse(
+        id=plan.id,
+        topic=plan.topic,
+        overview=plan_dict.get("overview", ""),
+        learning_objectives=plan_dict.get("learning_objectives", []),
+        sections=plan_dict.get("sections", []),
+        total_estimated_time=plan_dict.get("total_estimated_time", ""),
+        created_at=plan.created_at
+    ).model_dump_json()
+
+def select_plan_bodies():
+    """
+    Selects the stored response bodies, and the content of plans saved before bodies were stored
+    """
+    return select(
+        StudyPlan.id,
+        StudyPlan.topic,
+        StudyPlan.created_at,
+        StudyPlan.response_body,
+        case((StudyPlan.response_body.is_(None), StudyPlan.content)).label("content")
+    )
+
+def select_plan_listing():
+    """
+    Selects the listing fields of the study plans, without their content
+    """
+    return select(StudyPlan.id, StudyPlan.topic, StudyPlan.created_at)
+
 @router.post('/generate-studyplan/', response_model=StudyPlanResponse)
 async def generate_studyplan(
     request: StudyPlanRequest, 
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
     study_plan_agent: StudyPlanAgent = Depends(get_study_plan_agent)  # Use dependency injection
 ):
     """
     Generate a study plan for a given topic and save it to the database
     """
-    # Generate study plan
-    study_plan_data = await study_plan_agent.generate_study_plan(request.topic)
-    
-    # Generate quick reference guide
-    quick_ref_data = await study_plan_agent.generate_quick_reference_guide(request.topic)
-    
-    # Convert Pydantic model to dict, then to JSON string for storage
-    study_plan_json = json.dumps(study_plan_data.model_dump())
+    # Generate study plan and quick reference guide concurrently
+    study_plan_data, quick_ref_data = await study_plan_agent.generate_study_plan_with_reference(request.topic)
+    study_plan_dict = study_plan_data.model_dump()
     
     # Create new study plan in database
     new_study_plan = StudyPlan(
         topic=request.topic,
-        content=study_plan_json,
+        content=json.dumps(study_plan_dict),
         quick_reference=quick_ref_data,
         user_id=current_user.id
     )
     
     db.add(new_study_plan)
-    db.commit()
-    db.refresh(new_study_plan)
-    
-    # Parse JSON back to dict for response
-    study_plan_dict = json.loads(new_study_plan.content)
-    
-    # Format response data
-    response_data = {
-        "id": new_study_plan.id,
-        "topic": new_study_plan.topic,
-        "overview": study_plan_dict.get("overview", ""),
-        "learning_objectives": study_plan_dict.get("learning_objectives", []),
-        "sections": study_plan_dict.get("sections", []),
-        "total_estimated_time": study_plan_dict.get("total_estimated_time", ""),
-        "created_at": new_study_plan.created_at
-    }
+    await db.flush()
+    await db.refresh(new_study_plan)
+
+    # Serialize the response once, the read endpoints serve the stored body as is
+    new_study_plan.response_body = serialize_study_plan(new_study_plan, study_plan_dict)
+    new_study_plan.response_body_gzip = precompress(new_study_plan.response_body)
+    await db.commit()
+
+    # The reference guide failed or timed out, fill it in once the response is sent
+    if quick_ref_data is None:
+        background_tasks.add_task(fill_quick_reference, new_study_plan.id, request.topic, study_plan_agent)
     
-    return response_data
+    return Response(content=new_study_plan.response_body, media_type="application/json")
 
 @router.get('/', response_model=List[StudyPlanResponse])
 async def get_user_studyplans(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_MAX_PAGE_SIZE, description="Number of study plans per page"),
+    cursor: Optional[str] = Query(None, description="Cursor of the page to fetch, from the X-Next-Cursor header"),
+    view: str = Query("full", pattern="^(full|listing)$", description="'listing' leaves out the plan content"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user_id: int = Depends(get_current_user_id)
 ):
     """
-    Get all study plans for the current user
+    Get the study plans of the current user, newest first, one page at a time.
+    The X-Next-Cursor response header holds the cursor of the next page.
     """
-    study_plans = db.query(StudyPlan).filter(StudyPlan.user_id == current_user.id).all()
-    
-    response_data = []
-    for plan in study_plans:
-        # Parse JSON back to dict
-        plan_dict = json.loads(plan.content)
-        
-        # Format response data
-        plan_data = {
-            "id": plan.id,
-            "topic": plan.topic,
-            "overview": plan_dict.get("overview", ""),
-            "learning_objectives": plan_dict.get("learning_objectives", []),
-            "sections": plan_dict.get("sections", []),
-            "total_estimated_time": plan_dict.get("total_estimated_time", ""),
-            "created_at": plan.created_at
-        }
-        response_data.append(plan_data)
-    
-    return response_data
+    if view == "listing":
+        stmt = select_plan_listing()
+    else:
+        stmt = select_plan_bodies()
+
+    study_plans, next_cursor = await keyset_page(
+        db,
+        stmt.where(StudyPlan.user_id == current_user_id),
+        StudyPlan,
+        cursor,
+        limit
+    )
+
+    if view == "listing":
+        return listing_response(study_plans, StudyPlanListing, next_cursor)
+
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+
+    # The stored bodies are already serialized, so the page is a concatenation of them
+    bodies = [plan.response_body or serialize_study_plan(plan) for plan in study_plans]
+    return Response(content="[" + ",".join(bodies) + "]", media_type="application/json", headers=headers)
 
 @router.get('/{plan_id}', response_model=StudyPlanResponse)
 async def get_studyplan(
     plan_id: int,
-    db: Session = Depends(get_db),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
-    Get a specific study plan by ID
+    Get a specific study plan by ID. A matching If-None-Match returns a 304.
     """
-    study_plan = db.query(StudyPlan).filter(
+    cached = await not_modified(db, StudyPlan, plan_id, "studyplan", if_none_match)
+    if cached:
+        return cached
+
+    # Clients that accept gzip get the copy compressed when the plan was saved
+    if negotiate_encoding(accept_encoding, ["gzip"]):
+        result = await db.execute(select(
+            StudyPlan.id,
+            StudyPlan.created_at,
+            StudyPlan.response_body_gzip
+        ).where(StudyPlan.id == plan_id))
+        study_plan = result.first()
+
+        if study_plan and study_plan.response_body_gzip:
+            headers = cache_headers(artifact_etag("studyplan", study_plan.id, study_plan.created_at))
+            return precompressed_response(study_plan.response_body_gzip, "application/json", headers)
+
+    result = await db.execute(select_plan_bodies().where(
         StudyPlan.id == plan_id,
-    ).first()
+    ))
+    study_plan = result.first()
     
     if not study_plan:
         raise HTTPException(
@@ -107,33 +190,37 @@ async def get_studyplan(
             detail=f"Study plan with ID {plan_id} not found"
         )
     
-    # Parse JSON back to dict
-    plan_dict = json.loads(study_plan.content)
-    
-    # Format response data
-    response_data = {
-        "id": study_plan.id,
-        "topic": study_plan.topic,
-        "overview": plan_dict.get("overview", ""),
-        "learning_objectives": plan_dict.get("learning_objectives", []),
-        "sections": plan_dict.get("sections", []),
-        "total_estimated_time": plan_dict.get("total_estimated_time", ""),
-        "created_at": study_plan.created_at
-    }
-    
-    return response_data
+    body = study_plan.response_body or serialize_study_plan(study_plan)
+    headers = cache_headers(artifact_etag("studyplan", study_plan.id, study_plan.created_at))
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @router.get('/{plan_id}/reference', response_model=QuickReferenceResponse)
 async def get_quick_reference(
     plan_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    background_tasks: BackgroundTasks,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
+    study_plan_agent: StudyPlanAgent = Depends(get_study_plan_agent)
 ):
     """
-    Get the quick reference guide for a specific study plan
+    Get the quick reference guide for a specific study plan.
+    The guide never changes once it is stored, so a matching If-None-Match returns a 304.
+    A guide that could not be generated is generated again in the background, and a 404 is returned meanwhile.
     """
-    study_plan = db.query(StudyPlan).filter(
+    cached = await not_modified(db, StudyPlan, plan_id, "reference", if_none_match)
+    if cached:
+        return cached
+
+    result = await db.execute(select(
+        StudyPlan.id,
+        StudyPlan.topic,
+        StudyPlan.quick_reference,
+        StudyPlan.created_at
+    ).where(
         StudyPlan.id == plan_id,
-    ).first()
+    ))
+    study_plan = result.first()
     
     if not study_plan:
         raise HTTPException(
@@ -142,11 +229,15 @@ async def get_quick_reference(
         )
     
     if not study_plan.quick_reference:
-        raise HTTPException(
+        # Returned rather than raised, since background tasks only run with a returned response
+        background_tasks.add_task(fill_quick_reference, study_plan.id, study_plan.topic, study_plan_agent)
+        return ORJSONResponse(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Quick reference guide not found for this study plan"
+            content={"detail": "Quick reference guide not found for this study plan"},
+            headers={"Retry-After": "30"}
         )
     
+    response.headers.update(cache_headers(artifact_etag("reference", study_plan.id, study_plan.created_at)))
     return {
         "id": study_plan.id,
         "topic": study_plan.topic,
@@ -157,18 +248,18 @@ async def get_quick_reference(
 @router.delete('/{plan_id}', status_code=status.HTTP_204_NO_CONTENT)
 async def delete_studyplan(
     plan_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Delete a study plan
     """
-    study_plan_query = db.query(StudyPlan).filter(
+    result = await db.execute(select(StudyPlan.id).where(
         StudyPlan.id == plan_id,
         StudyPlan.user_id == current_user.id
-    )
+    ))
     
-    study_plan = study_plan_query.first()
+    study_plan = result.first()
     
     if not study_plan:
         raise HTTPException(
@@ -176,5 +267,5 @@ async def delete_studyplan(
             detail=f"Study plan with ID {plan_id} not found"
         )
     
-    study_plan_query.delete(synchronize_session=False)
-    db.commit()
\ No newline at end of file
+    await db.execute(delete(StudyPlan).where(StudyPlan.id == plan_id))
+    await db.commit()
\ No newline at end of file
@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Query, File, UploadFile, HTTPException, status, Depends
-from utils import SummaryQuestionGeneratorAgent, get_summary_question_generator_agent, extract_text_from_file
+from fastapi import APIRouter, Query, File, UploadFile, Header, HTTPException, Response, status, Depends
+from fastapi.responses import StreamingResponse
+from utils import SummaryQuestionGeneratorAgent, get_summary_question_generator_agent, extract_text_from_file_async
 from typing import Optional, List
-from schemas import SummaryResponse
-from sqlalchemy.orm import Session
-from database import get_db
+from schemas import SummaryResponse, SummaryListing
+from pagination import LIST_PAGE_SIZE, LIST_MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, keyset_page, listing_response
+from http_cache import artifact_etag, cache_headers, not_modified
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db, AsyncSessionLocal
 import models
-from oauth2 import get_current_user
+import json
+from oauth2 import get_current_user, get_current_user_id
 
 
 router = APIRouter(
@@ -22,7 +27,7 @@ async def summarize(
         description="Level of detail (low, medium, high)"
     ),
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     agent: SummaryQuestionGeneratorAgent = Depends(get_summary_question_generator_agent)  # Dependency injection for the agent
 ):
     """
@@ -41,7 +46,7 @@ async def summarize(
     
     try:
         # Extract text from the uploaded file
-        text = extract_text_from_file(file)
+        text = await extract_text_from_file_async(file)
         
         if not text or len(text.strip()) == 0:
             raise HTTPException(
@@ -66,48 +71,160 @@ async def summarize(
         )
         
         db.add(new_summary)
-        db.commit()
-        db.refresh(new_summary)
+        await db.commit()
+        await db.refresh(new_summary)
         
         return new_summary
         
+    except HTTPException as http_exc:
+        await db.rollback()
+        raise http_exc
     except Exception as e:
-        db.rollback()  # Rollback the transaction in case of error
+        await db.rollback()  # Rollback the transaction in case of error
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An error occurred while processing the file: {str(e)}"
         )
 
-@router.get("/", response_model=List[SummaryResponse])
-async def get_user_summaries(
+@router.post("/generate-summary/stream")
+async def summarize_stream(
+    file: UploadFile = File(...),
+    word_length: Optional[int] = Query(150, description="Target word count for the summary"),
+    detail_level: Optional[str] = Query(
+        "medium", 
+        description="Level of detail (low, medium, high)"
+    ),
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    agent: SummaryQuestionGeneratorAgent = Depends(get_summary_question_generator_agent)
 ):
     """
-    Retrieve all summaries created by the current user.
+    Summarize text from an uploaded file, streaming the markdown as server-sent events.
+    
+    Each `data` event carries a `delta` of the summary. Once the summary is complete it is saved
+    and a final `done` event carries the id of the new summary. Nothing is saved if the client disconnects.
     
-    Returns a list of summaries ordered by creation date (newest first).
+    - **file**: The document to summarize (PDF, DOCX, TXT supported)
+    - **word_length**: Target length of the summary in words
+    - **detail_level**: Level of detail in the summary (low, medium, high)
     """
-    summaries = db.query(models.Summary).filter(
-        models.Summary.user_id == current_user.id
-    ).order_by(models.Summary.created_at.desc()).all()
+    # Validate detail level
+    if detail_level not in ["low", "medium", "high"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="detail_level must be one of: low, medium, high"
+        )
+
+    # Extract the text before the stream starts, so that extraction errors are still plain HTTP errors
+    text = await extract_text_from_file_async(file)
+    filename = file.filename
+    user_id = current_user.id
+
+    async def event_stream():
+        chunks = []
+        try:
+            async for delta in agent.stream_summary(text=text, word_length=word_length, detail_level=detail_level):
+                chunks.append(delta)
+                yield f"data: {json.dumps({'delta': delta})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'detail': f'An error occurred while generating the summary: {str(e)}'})}\n\n"
+            return
+
+        # The request session is already closed once streaming starts, so use a dedicated one
+        async with AsyncSessionLocal() as db:
+            try:
+                new_summary = models.Summary(
+                    content="".join(chunks),
+                    original_filename=filename,
+                    word_count=word_length,
+                    detail_level=detail_level,
+                    user_id=user_id
+                )
+                db.add(new_summary)
+                await db.commit()
+                await db.refresh(new_summary)
+
+                yield f"event: done\ndata: {json.dumps({'id': new_summary.id})}\n\n"
+            except Exception as e:
+                await db.rollback()
+                yield f"event: error\ndata: {json.dumps({'detail': f'An error occurred while saving the summary: {str(e)}'})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def select_summary_listing():
+    """
+    Selects the listing fields of the summaries, without their content
+    """
+    return select(
+        models.Summary.id,
+        models.Summary.original_filename,
+        models.Summary.word_count,
+        models.Summary.detail_level,
+        models.Summary.created_at
+    )
+
+@router.get("/", response_model=List[SummaryResponse])
+async def get_user_summaries(
+    response: Response,
+    limit: int = Query(LIST_PAGE_SIZE, ge=1, le=LIST_MAX_PAGE_SIZE, description="Number of summaries per page"),
+    cursor: Optional[str] = Query(None, description="Cursor of the page to fetch, from the X-Next-Cursor header"),
+    view: str = Query("full", pattern="^(full|listing)$", description="'listing' leaves out the summary content"),
+    current_user_id: int = Depends(get_current_user_id),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Retrieve the summaries created by the current user, one page at a time.
     
+    Returns summaries ordered by creation date (newest first). The `X-Next-Cursor` response header
+    holds the cursor of the next page and is absent on the last page.
+    """
+    if view == "listing":
+        stmt = select_summary_listing()
+    else:
+        stmt = select(models.Summary)
+
+    summaries, next_cursor = await keyset_page(
+        db,
+        stmt.where(models.Summary.user_id == current_user_id),
+        models.Summary,
+        cursor,
+        limit
+    )
+
+    if view == "listing":
+        return listing_response(summaries, SummaryListing, next_cursor)
+
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     return summaries
 
 # Get a specific summary by ID
 @router.get("/{summary_id}", response_model=SummaryResponse)
 async def get_summary_by_id(
     summary_id: int,
-    db: Session = Depends(get_db)
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Retrieve a specific summary by ID.
     
+    Summaries never change, so the response carries a strong ETag and a 304 is returned
+    when `If-None-Match` matches it.
+    
     - **summary_id**: The ID of the summary to retrieve
     """
-    summary = db.query(models.Summary).filter(
+    cached = await not_modified(db, models.Summary, summary_id, "summary", if_none_match)
+    if cached:
+        return cached
+
+    result = await db.execute(select(models.Summary).where(
         models.Summary.id == summary_id,
-    ).first()
+    ))
+    summary = result.scalars().first()
     
     if not summary:
         raise HTTPException(
@@ -115,6 +232,7 @@ async def get_summary_by_id(
             detail=f"Summary with ID {summary_id} not found or you don't have access to it"
         )
     
+    response.headers.update(cache_headers(artifact_etag("summary", summary.id, summary.created_at)))
     return summary
 
 # Delete a summary
@@ -122,19 +240,19 @@ async def get_summary_by_id(
 async def delete_summary(
     summary_id: int,
     current_user: models.User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Delete a summary.
     
     - **summary_id**: The ID of the summary to delete
     """
-    summary_query = db.query(models.Summary).filter(
+    result = await db.execute(select(models.Summary.id).where(
         models.Summary.id == summary_id,
         models.Summary.user_id == current_user.id
-    )
+    ))
     
-    summary = summary_query.first()
+    summary = result.first()
     
     if not summary:
         raise HTTPException(
@@ -142,7 +260,7 @@ async def delete_summary(
             detail=f"Summary with ID {summary_id} not found or you don't have access to it"
         )
     
-    summary_query.delete(synchronize_session=False)
-    db.commit()
+    await db.execute(delete(models.Summary).where(models.Summary.id == summary_id))
+    await db.commit()
     
     return None
\ No newline at end of file
@@ -4,6 +4,7 @@ from database import get_db
 from models import User
 from schemas import CreateUser, ResponseUser
 from utils import hash
+from oauth2 import invalidate_cached_user
 
 
 router = APIRouter(
@@ -20,6 +21,7 @@ def create_user(user: CreateUser, db: Session = Depends(get_db)):
     db.add(new_user)
     db.commit() 
     db.refresh(new_user)
+    invalidate_cached_user(new_user.id)
 
     return new_user
 
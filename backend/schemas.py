@@ -48,6 +48,13 @@ class ResponseQuestions(BaseModel):
     option_d: str
     answer: str
 
+class BatchQuestionsResult(BaseModel):
+    filename: str
+    status: str # "succeeded" or "failed"
+    test_id: Optional[int] = None
+    questions: List[ResponseQuestions] = []
+    error: Optional[str] = None
+
 class SummaryResponse(BaseModel):
     id: int
     content: str
@@ -60,6 +67,17 @@ class SummaryResponse(BaseModel):
         "from_attributes": True
     }
 
+class SummaryListing(BaseModel):
+    id: int
+    original_filename: Optional[str]
+    word_count: int
+    detail_level: str
+    created_at: datetime
+
+    model_config = {
+        "from_attributes": True
+    }
+
 class StudyPlanRequest(BaseModel):
     topic: str
 
@@ -91,6 +109,15 @@ class StudyPlanResponse(BaseModel):
         "from_attributes": True
     }
 
+class StudyPlanListing(BaseModel):
+    id: int
+    topic: str
+    created_at: datetime
+
+    model_config = {
+        "from_attributes": True
+    }
+
 class QuickReferenceResponse(BaseModel):
     id: int
     topic: str
@@ -135,6 +162,30 @@ class InterviewCreate(BaseModel):
         "from_attributes": True 
     }
 
+class InterviewListing(BaseModel):
+    id: int
+    role: str
+    type: str
+    level: str
+    techstack: str
+    finalized: bool
+    created_at: datetime
+
+    model_config = {
+        "from_attributes": True
+    }
+
+class TestListing(BaseModel):
+    id: int
+    title: str
+    num_questions: int
+    difficulty: str
+    created_at: datetime
+
+    model_config = {
+        "from_attributes": True
+    }
+
 class InterviewReviewAnswers(BaseModel):
     interview_id: int
     questions: str
@@ -144,3 +195,17 @@ class InterviewReviewResponse(BaseModel):
     category: str
     rating: int
     review: str
+
+class JobResponse(BaseModel):
+    id: int
+    kind: str
+    status: str
+    result_id: Optional[int] = None
+    error: Optional[str] = None
+    attempts: int
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = {
+        "from_attributes": True
+    }
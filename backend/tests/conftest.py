@@ -0,0 +1,70 @@
+import asyncio
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The backend modules import each other as top-level modules (from database import ...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings read when the app modules are imported, with the on-disk caches kept out of the working directory
+_cache_dir = tempfile.mkdtemp(prefix="backend-tests-")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("GEMINI_API_KEY", "test")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_cache_dir, 'app.db')}")
+os.environ.setdefault("LLM_CACHE_PATH", os.path.join(_cache_dir, "llm_cache.db"))
+os.environ.setdefault("PAGE_CACHE_PATH", os.path.join(_cache_dir, "page_cache.db"))
+os.environ.setdefault("KNOWLEDGE_STORE_PATH", os.path.join(_cache_dir, "knowledge.db"))
+os.environ.setdefault("RETRIEVAL_INDEX_DIR", os.path.join(_cache_dir, "retrieval_index"))
+
+
+@pytest.fixture
+def app_client(tmp_path):
+    """
+    TestClient of the app on a temporary SQLite database holding users 1 and 2, authenticated as user 1.
+    Yields the client and a sessionmaker of the database, to seed and inspect it.
+    """
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from sqlalchemy.orm import sessionmaker
+    from database import Base, create_async_db_engine, create_db_engine, get_async_db, get_db
+    from models import User
+    from oauth2 import create_access_token
+    from main import app
+
+    url = f"sqlite:///{tmp_path / 'app.db'}"
+    engine = create_db_engine(url)
+    async_engine = create_async_db_engine(url)
+    Base.metadata.create_all(engine)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    with SessionLocal() as db:
+        db.add_all([
+            User(id=1, username="ada", email="ada@example.com", password="x"),
+            User(id=2, username="grace", email="grace@example.com", password="x"),
+        ])
+        db.commit()
+
+    def override_get_db():
+        with SessionLocal() as db:
+            yield db
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    try:
+        # Not used as a context manager, so the startup handlers (job workers, model client) don't run
+        client = TestClient(app)
+        client.headers["Authorization"] = f"Bearer {create_access_token({'user_id': 1})}"
+        yield client, SessionLocal
+    finally:
+        app.dependency_overrides.clear()
+        engine.dispose()
+        asyncio.run(async_engine.dispose())
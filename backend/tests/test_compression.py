@@ -0,0 +1,122 @@
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+import gzip
+import json
+import pytest
+
+from compression import CompressionMiddleware, negotiate_encoding, parse_accept_encoding, precompress
+from models import StudyPlan
+from routers.studyplan import serialize_study_plan
+
+ENCODINGS = ["zstd", "br", "gzip"]
+BODY = "# Photosynthesis\n\n" + "The light reactions take place in the thylakoid membranes.\n" * 200
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, br, zstd", "zstd"),
+    ("gzip;q=1, br;q=0.8, zstd;q=0.5", "gzip"),
+    ("br;q=0.9, gzip;q=0.9", "br"),
+    ("zstd;q=0, br;q=0, gzip", "gzip"),
+    ("*;q=0.5, zstd;q=0", "br"),
+    ("gzip;q=0", None),
+    ("identity", None),
+    ("", None),
+    (None, None),
+])
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header, ENCODINGS) == expected
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("GZIP;q=0.5, br, zstd;q=abc") == {"gzip": 0.5, "br": 1.0, "zstd": 0.0}
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/large")
+    def large():
+        return PlainTextResponse(BODY, headers={"ETag": '"large"'})
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("Small")
+
+    @app.get("/events")
+    def events():
+        async def stream():
+            for _ in range(20):
+                yield f"data: {json.dumps({'delta': BODY[:500]})}\n\n"
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=1024, encodings=["gzip"])
+    return TestClient(app)
+
+
+def test_large_body_compressed(client):
+    response = client.get("/large", headers={"Accept-Encoding": "br, gzip;q=0.5"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert int(response.headers["Content-Length"]) < len(BODY)
+    assert response.headers["ETag"] == 'W/"large"'
+    assert response.text == BODY
+
+
+def test_refused_encoding_not_used(client):
+    response = client.get("/large", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["ETag"] == '"large"'
+    assert response.text == BODY
+
+
+def test_small_body_passed_through(client):
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.text == "Small"
+
+
+def test_event_stream_not_compressed(client):
+    with client.stream("GET", "/events", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["Content-Type"].startswith("text/event-stream")
+        assert "Content-Encoding" not in response.headers
+        raw = b"".join(response.iter_raw())
+    assert raw.count(b"data: ") == 20
+
+
+@pytest.mark.parametrize("module, encoding", [("brotli", "br"), ("zstandard", "zstd")])
+def test_optional_encodings(module, encoding):
+    pytest.importorskip(module)
+    from compression import compress
+
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    app.get("/large")(lambda: PlainTextResponse(BODY))
+
+    response = TestClient(app).get("/large", headers={"Accept-Encoding": f"gzip;q=0.5, {encoding}"})
+    assert response.headers["Content-Encoding"] == encoding
+    assert len(compress(BODY.encode(), encoding)) < len(BODY)
+
+
+def test_precompressed_study_plan_served_as_stored(app_client):
+    client, SessionLocal = app_client
+    with SessionLocal() as db:
+        plan = StudyPlan(id=1, topic="Photosynthesis", content=json.dumps({"overview": BODY}), user_id=1)
+        db.add(plan)
+        db.flush()
+        plan.response_body = serialize_study_plan(plan)
+        plan.response_body_gzip = precompress(plan.response_body)
+        db.commit()
+        body, stored = plan.response_body, plan.response_body_gzip
+
+    with client.stream("GET", "/studyplan/1", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["Vary"]
+        raw = b"".join(response.iter_raw())
+    assert raw == stored
+    assert gzip.decompress(raw).decode() == body
+
+    response = client.get("/studyplan/1", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+    assert response.text == body
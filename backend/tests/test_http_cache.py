@@ -0,0 +1,91 @@
+from datetime import datetime
+import json
+import pytest
+
+from http_cache import artifact_etag, etag_matches
+from models import Interview, Question, StudyPlan, Summary
+import models  # Test is not imported by name, pytest would try to collect it
+from routers.studyplan import serialize_study_plan
+from compression import precompress
+
+ARTIFACT_PATHS = ["/summary/1", "/studyplan/1", "/studyplan/1/reference", "/questions/1", "/interviews/1"]
+
+
+@pytest.fixture
+def client(app_client):
+    client, SessionLocal = app_client
+    with SessionLocal() as db:
+        db.add(Summary(id=1, content="Summary", original_filename="notes.txt", word_count=10, detail_level="low", user_id=1))
+        db.add(models.Test(id=1, title="Test", num_questions=1, difficulty="easy", user_id=1))
+        db.add(Question(question="Q", option_a="a", option_b="b", option_c="c", option_d="d", answer="a", test_id=1))
+        db.add(Interview(id=1, role="dev", type="technical", level="junior", techstack="[]", questions="[]", user_id=1))
+        plan = StudyPlan(id=1, topic="Topic", content=json.dumps({"overview": "Overview"}), quick_reference="# Topic", user_id=1)
+        db.add(plan)
+        db.flush()
+        plan.response_body = serialize_study_plan(plan)
+        plan.response_body_gzip = precompress(plan.response_body)
+        db.commit()
+    return client
+
+
+def test_etag_matches():
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('W/"abc"', etag)
+    assert etag_matches('"other", W/"abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches('"abc', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches("", etag)
+
+
+@pytest.mark.parametrize("path", ARTIFACT_PATHS)
+def test_matching_etag_returns_304(client, path):
+    response = client.get(path, headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert not etag.startswith("W/")
+    assert "immutable" in response.headers["Cache-Control"]
+
+    for if_none_match in (etag, "W/" + etag, f'"other", {etag}', f'W/"other", W/{etag}', "*"):
+        cached = client.get(path, headers={"If-None-Match": if_none_match, "Accept-Encoding": "identity"})
+        assert cached.status_code == 304, if_none_match
+        assert cached.content == b""
+        assert cached.headers["ETag"] == etag
+
+
+@pytest.mark.parametrize("path", ARTIFACT_PATHS)
+def test_mismatching_etag_returns_200(client, path):
+    response = client.get(path, headers={"If-None-Match": '"other", W/"another"', "Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert response.content
+    assert response.headers["ETag"] != '"other"'
+
+
+def test_compressed_study_plan_etag_returns_304(client):
+    response = client.get("/studyplan/1", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    # The gzipped body is another representation, so its ETag is weak
+    assert response.headers["ETag"].startswith("W/")
+
+    cached = client.get("/studyplan/1", headers={"If-None-Match": response.headers["ETag"], "Accept-Encoding": "gzip"})
+    assert cached.status_code == 304
+
+
+def test_etag_changes_when_artifact_is_replaced(client, app_client):
+    _, SessionLocal = app_client
+    etag = client.get("/summary/1").headers["ETag"]
+
+    assert client.delete("/summary/1").status_code == 204
+    with SessionLocal() as db:
+        # A new summary that got the id of the deleted one
+        db.add(Summary(id=1, content="Other", original_filename="other.txt", word_count=10, detail_level="low",
+                       user_id=1, created_at=datetime(2100, 1, 1)))
+        db.commit()
+
+    response = client.get("/summary/1", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["content"] == "Other"
+    assert response.headers["ETag"] != etag
+    assert response.headers["ETag"] == artifact_etag("summary", 1, datetime(2100, 1, 1))
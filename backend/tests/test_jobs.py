@@ -0,0 +1,244 @@
+"""
+Runs the job queue against a temporary SQLite database, with handlers that stand in for the agent calls.
+"""
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from datetime import timedelta
+import asyncio
+import time
+import pytest
+
+from database import Base, create_async_db_engine, create_db_engine
+from models import Job, Summary, User
+from oauth2 import create_access_token
+import jobs
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'jobs.db'}"
+    engine = create_db_engine(url)
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add_all([
+            User(id=1, username="ada", email="ada@example.com", password="x"),
+            User(id=2, username="grace", email="grace@example.com", password="x"),
+        ])
+        db.commit()
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def run_with_queue_db(database_url, monkeypatch):
+    """
+    Runs a coroutine function in a new event loop, with the queue's sessions bound to the test database.
+    """
+    def run(scenario):
+        async def main():
+            engine = create_async_db_engine(database_url)
+            AsyncSessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+            monkeypatch.setattr(jobs, "AsyncSessionLocal", AsyncSessionLocal)
+            try:
+                return await scenario(AsyncSessionLocal)
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    return run
+
+
+def make_queue(handler, **options) -> jobs.JobQueue:
+    settings = dict(num_workers=2, max_attempts=3, retry_backoff=0.1, lease_seconds=2, heartbeat_seconds=0.1)
+    settings.update(options)
+    queue = jobs.JobQueue(**settings)
+    queue.register("test", handler)
+    return queue
+
+
+async def add_summary(db, job: Job) -> int:
+    summary = Summary(content="Summary", original_filename="notes.txt", word_count=1, detail_level="low", user_id=job.user_id)
+    db.add(summary)
+    await db.flush()
+    return summary.id
+
+
+async def wait_for_status(AsyncSessionLocal, job_id: int, status: str, timeout: float = 5) -> Job:
+    deadline = time.monotonic() + timeout
+    while True:
+        async with AsyncSessionLocal() as db:
+            job = await db.get(Job, job_id)
+        if job.status == status or time.monotonic() > deadline:
+            return job
+        await asyncio.sleep(0.02)
+
+
+async def count_summaries(AsyncSessionLocal) -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count(Summary.id)))
+
+
+def test_job_claimed_once_by_two_workers(run_with_queue_db):
+    runs = []
+
+    async def handler(db, job, payload):
+        runs.append(job.id)
+        await asyncio.sleep(0.2)
+        return await add_summary(db, job)
+
+    async def scenario(AsyncSessionLocal):
+        first, second = make_queue(handler), make_queue(handler)
+        await first.start()
+        await second.start()
+        try:
+            async with AsyncSessionLocal() as db:
+                job = await first.submit(db, "test", {}, 1)
+            # Both processes have the job queued, as after a recovery
+            second._enqueue(job.id)
+            job = await wait_for_status(AsyncSessionLocal, job.id, jobs.SUCCEEDED)
+            await asyncio.sleep(0.3)
+        finally:
+            await first.stop()
+            await second.stop()
+        return job, await count_summaries(AsyncSessionLocal)
+
+    job, summaries = run_with_queue_db(scenario)
+    assert runs == [job.id]
+    assert (job.status, job.attempts, job.worker_id) == (jobs.SUCCEEDED, 1, None)
+    assert job.result_id is not None
+    assert summaries == 1
+
+
+def test_failed_job_retried_with_backoff_until_max_attempts(run_with_queue_db):
+    attempts = []
+
+    async def handler(db, job, payload):
+        attempts.append(time.monotonic())
+        raise RuntimeError("model error")
+
+    async def scenario(AsyncSessionLocal):
+        queue = make_queue(handler, max_attempts=3, retry_backoff=0.1)
+        await queue.start()
+        try:
+            async with AsyncSessionLocal() as db:
+                job = await queue.submit(db, "test", {}, 1)
+            return await wait_for_status(AsyncSessionLocal, job.id, jobs.FAILED)
+        finally:
+            await queue.stop()
+
+    job = run_with_queue_db(scenario)
+    assert (job.status, job.attempts, job.error) == (jobs.FAILED, 3, "model error")
+    assert len(attempts) == 3
+    # The delay doubles after each attempt
+    assert attempts[1] - attempts[0] >= 0.1
+    assert attempts[2] - attempts[1] >= 0.2
+
+
+def test_cancel_stops_running_job(run_with_queue_db):
+    cancelled = []
+
+    async def handler(db, job, payload):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(job.id)
+            raise
+        return await add_summary(db, job)
+
+    async def scenario(AsyncSessionLocal):
+        queue = make_queue(handler)
+        await queue.start()
+        try:
+            async with AsyncSessionLocal() as db:
+                job = await queue.submit(db, "test", {}, 1)
+            await wait_for_status(AsyncSessionLocal, job.id, jobs.RUNNING)
+            async with AsyncSessionLocal() as db:
+                await queue.cancel(db, await db.get(Job, job.id))
+            await asyncio.sleep(0.3)
+            async with AsyncSessionLocal() as db:
+                job = await db.get(Job, job.id)
+        finally:
+            await queue.stop()
+        return job, await count_summaries(AsyncSessionLocal)
+
+    job, summaries = run_with_queue_db(scenario)
+    assert cancelled == [job.id]
+    assert (job.status, job.result_id) == (jobs.CANCELLED, None)
+    assert summaries == 0
+
+
+def test_result_discarded_when_job_cancelled_before_finish(run_with_queue_db):
+    async def scenario(AsyncSessionLocal):
+        async def handler(db, job, payload):
+            # Cancelled from another process once the agent call is done, before the result is stored
+            async with AsyncSessionLocal() as other:
+                await other.execute(jobs.cancel_job(job.id))
+                await other.commit()
+            return await add_summary(db, job)
+
+        queue = make_queue(handler)
+        await queue.start()
+        try:
+            async with AsyncSessionLocal() as db:
+                job = await queue.submit(db, "test", {}, 1)
+            await asyncio.sleep(0.3)
+            async with AsyncSessionLocal() as db:
+                job = await db.get(Job, job.id)
+        finally:
+            await queue.stop()
+        return job, await count_summaries(AsyncSessionLocal)
+
+    job, summaries = run_with_queue_db(scenario)
+    assert (job.status, job.result_id) == (jobs.CANCELLED, None)
+    assert summaries == 0
+
+
+def test_running_job_recovered_after_lease_expiry(run_with_queue_db):
+    async def handler(db, job, payload):
+        return await add_summary(db, job)
+
+    async def scenario(AsyncSessionLocal):
+        expired = jobs.utcnow() - timedelta(seconds=10)
+        async with AsyncSessionLocal() as db:
+            interrupted = Job(kind="test", status=jobs.RUNNING, payload="{}", attempts=1, worker_id="dead", updated_at=expired, user_id=1)
+            exhausted = Job(kind="test", status=jobs.RUNNING, payload="{}", attempts=3, worker_id="dead", updated_at=expired, user_id=1)
+            alive = Job(kind="test", status=jobs.RUNNING, payload="{}", attempts=1, worker_id="alive", updated_at=jobs.utcnow(), user_id=1)
+            db.add_all([interrupted, exhausted, alive])
+            await db.commit()
+            ids = interrupted.id, exhausted.id, alive.id
+
+        queue = make_queue(handler, max_attempts=3)
+        await queue.start()
+        try:
+            recovered = await wait_for_status(AsyncSessionLocal, ids[0], jobs.SUCCEEDED)
+            async with AsyncSessionLocal() as db:
+                return recovered, await db.get(Job, ids[1]), await db.get(Job, ids[2])
+        finally:
+            await queue.stop()
+
+    recovered, exhausted, alive = run_with_queue_db(scenario)
+    assert (recovered.status, recovered.attempts) == (jobs.SUCCEEDED, 2)
+    assert recovered.result_id is not None
+    assert (exhausted.status, exhausted.error) == (jobs.FAILED, "The job was interrupted too many times")
+    assert (alive.status, alive.worker_id) == (jobs.RUNNING, "alive")
+
+
+def test_jobs_only_visible_to_their_user(app_client):
+    client, SessionLocal = app_client
+    with SessionLocal() as db:
+        job = Job(kind="summary", status=jobs.QUEUED, payload="{}", user_id=1)
+        db.add(job)
+        db.commit()
+        job_id = job.id
+
+    other = {"Authorization": f"Bearer {create_access_token({'user_id': 2})}"}
+
+    response = client.get(f"/jobs/{job_id}")
+    assert response.status_code == 200
+    assert response.json()["status"] == jobs.QUEUED
+
+    assert client.get(f"/jobs/{job_id}", headers=other).status_code == 404
+    assert client.delete(f"/jobs/{job_id}", headers=other).status_code == 404
+    assert client.get(f"/jobs/{job_id}").json()["status"] == jobs.QUEUED
@@ -0,0 +1,36 @@
+from typing import List
+
+from schemas import ResponseQuestions, StudyPlanData
+import utils
+from utils import LLMResultCache, prompt_signature
+
+
+def _prompt(ctx) -> str:
+    return f"Write {ctx.deps.word_length} words."
+
+
+def _changed_prompt(ctx) -> str:
+    return f"Write exactly {ctx.deps.word_length} words."
+
+
+def test_key_stable_for_same_generation():
+    signature = prompt_signature(str, "Summarize.", _prompt)
+    assert signature == prompt_signature(str, "Summarize.", _prompt)
+    assert LLMResultCache.make_key("summary", "text", signature=signature, word_length=100) == \
+        LLMResultCache.make_key("summary", "text", signature=signature, word_length=100)
+
+
+def test_signature_changes_with_prompts_and_result_type():
+    signature = prompt_signature(str, "Summarize.", _prompt)
+    assert prompt_signature(str, "Summarize briefly.", _prompt) != signature
+    assert prompt_signature(str, "Summarize.", _changed_prompt) != signature
+    assert prompt_signature(List[ResponseQuestions], "Summarize.", _prompt) != signature
+    assert prompt_signature(StudyPlanData, "Plan.") != prompt_signature(str, "Plan.")
+
+
+def test_key_changes_with_signature_and_version(monkeypatch):
+    key = LLMResultCache.make_key("studyplan", "Topic", signature=utils.STUDY_PLAN_SIGNATURE)
+    assert LLMResultCache.make_key("studyplan", "Topic", signature=prompt_signature(StudyPlanData, "Other.")) != key
+
+    monkeypatch.setattr(utils, "LLM_CACHE_VERSION", "2")
+    assert LLMResultCache.make_key("studyplan", "Topic", signature=utils.STUDY_PLAN_SIGNATURE) != key
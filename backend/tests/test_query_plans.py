@@ -0,0 +1,10 @@
+from query_plan_audit import collect_plans, find_scans
+
+
+def test_no_statement_scans_or_sorts(tmp_path):
+    plans = collect_plans(str(tmp_path / "audit.db"))
+
+    statements = " ".join(statement for statement, _ in plans)
+    for table in ("tests", "questions", "summaries", "studyplans", "interviews", "jobs", "users"):
+        assert f"FROM {table}" in statements or f"UPDATE {table}" in statements
+    assert find_scans(plans) == []
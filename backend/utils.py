@@ -1,17 +1,36 @@
 import logging
+from pydantic import TypeAdapter
 from pydantic_ai import settings as pydantic_ai_settings
 from fastapi import UploadFile, HTTPException
 from passlib.context import CryptContext
 from pydantic_ai.models.gemini import GeminiModel
-from pydantic_ai import Agent, Tool
-from typing import List
+from pydantic_ai import Agent, RunContext, Tool
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+from contextlib import asynccontextmanager
+from enum import Enum
+from dataclasses import dataclass
+from collections import OrderedDict
+from urllib.parse import urlparse
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import PyPDF2
 import docx
-import io
+import asyncio
+import hashlib
+import httpx
 import json
+import mmap
 import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
 from dotenv import load_dotenv
 from schemas import ResponseQuestions, StudyPlanData, InterviewReviewResponse
+from retrieval import KnowledgeStore, VectorIndex, index_store, knowledge_store
 
 # Set the debug mode on
 pydantic_ai_settings.debug = True
@@ -22,6 +41,68 @@ logging.getLogger("pydantic_ai").setLevel(logging.DEBUG)
 
 load_dotenv()
 API_KEY = str(os.getenv("GEMINI_API_KEY"))
+MODEL_NAME = 'gemini-1.5-flash'
+
+# Per-branch timeouts (seconds) when the study plan and quick reference are generated concurrently
+STUDY_PLAN_TIMEOUT = float(os.getenv("STUDY_PLAN_TIMEOUT", "90"))
+QUICK_REFERENCE_TIMEOUT = float(os.getenv("QUICK_REFERENCE_TIMEOUT", "60"))
+
+# LLM result cache configuration ("memory" or "sqlite")
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./llm_cache.db")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+# Bumped to invalidate every cached output, for changes that the prompt signatures do not cover (e.g. tools)
+LLM_CACHE_VERSION = os.getenv("LLM_CACHE_VERSION", "1")
+
+# File extraction worker pool configuration
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+EXTRACTION_MAX_PENDING = int(os.getenv("EXTRACTION_MAX_PENDING", "8"))
+EXTRACTION_TIMEOUT = float(os.getenv("EXTRACTION_TIMEOUT", "60"))
+EXTRACTION_PAGES_PER_JOB = int(os.getenv("EXTRACTION_PAGES_PER_JOB", "25"))
+# Only a bounded amount of text ends up in the prompt, so stop extracting past this many characters
+EXTRACTION_MAX_CHARS = int(os.getenv("EXTRACTION_MAX_CHARS", "200000"))
+
+# Batch generation: files per request
+QUESTIONS_BATCH_MAX_FILES = int(os.getenv("QUESTIONS_BATCH_MAX_FILES", "20"))
+# Process-wide limits on concurrent and per-minute agent runs, across requests, batches and jobs
+GENERATION_CONCURRENCY = int(os.getenv("GENERATION_CONCURRENCY", "4"))
+GENERATION_RATE_PER_MINUTE = int(os.getenv("GENERATION_RATE_PER_MINUTE", "60"))
+
+# Web scraper HTTP client configuration
+SEARCH_URL = os.getenv("SEARCH_URL", "https://www.google.com/search")
+SCRAPER_REQUEST_TIMEOUT = float(os.getenv("SCRAPER_REQUEST_TIMEOUT", "10"))
+SCRAPER_DEADLINE = float(os.getenv("SCRAPER_DEADLINE", "15"))
+SCRAPER_MAX_CONNECTIONS = int(os.getenv("SCRAPER_MAX_CONNECTIONS", "20"))
+SCRAPER_PER_HOST_LIMIT = int(os.getenv("SCRAPER_PER_HOST_LIMIT", "2"))
+# Hosts whose request limit a scraper remembers, the least recently used idle ones are dropped above it
+SCRAPER_MAX_HOSTS = int(os.getenv("SCRAPER_MAX_HOSTS", "256"))
+
+# Scraped page cache configuration
+PAGE_CACHE_PATH = os.getenv("PAGE_CACHE_PATH", "./page_cache.db")
+PAGE_CACHE_MAX_BYTES = int(os.getenv("PAGE_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+PAGE_CACHE_FRESH_SECONDS = int(os.getenv("PAGE_CACHE_FRESH_SECONDS", "3600"))
+PAGE_CACHE_NEGATIVE_TTL = int(os.getenv("PAGE_CACHE_NEGATIVE_TTL", "600"))
+
+# Texts over the chunk budget are summarized chunk by chunk, and the chunk notes are then summarized
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "8000"))
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", "4"))
+
+# Documents over these budgets are cut down to their most relevant passages before they are sent to the model.
+# The summary budget keeps the map step of long summaries to a single round of concurrent chunk calls.
+RETRIEVAL_ENABLED = os.getenv("RETRIEVAL_ENABLED", "true").lower() == "true"
+RETRIEVAL_QUESTIONS_TOKENS = int(os.getenv("RETRIEVAL_QUESTIONS_TOKENS", "6000"))
+RETRIEVAL_SUMMARY_TOKENS = int(os.getenv("RETRIEVAL_SUMMARY_TOKENS", str(SUMMARY_CHUNK_TOKENS * SUMMARY_MAP_CONCURRENCY)))
+RETRIEVAL_SECTION_TOKENS = int(os.getenv("RETRIEVAL_SECTION_TOKENS", "4000"))
+RETRIEVAL_PASSAGE_TOKENS = int(os.getenv("RETRIEVAL_PASSAGE_TOKENS", "300"))
+
+# Agents search the local knowledge store first, and the web only when fewer than KNOWLEDGE_MIN_RESULTS passages
+# contain at least KNOWLEDGE_MIN_COVERAGE of the query terms
+KNOWLEDGE_MIN_RESULTS = int(os.getenv("KNOWLEDGE_MIN_RESULTS", "2"))
+KNOWLEDGE_MIN_COVERAGE = float(os.getenv("KNOWLEDGE_MIN_COVERAGE", "0.5"))
+KNOWLEDGE_PAGE_CHARS = int(os.getenv("KNOWLEDGE_PAGE_CHARS", "8000"))
+# Summaries are made from the documents users upload, so they are shared with other users' agents only when enabled
+KNOWLEDGE_INCLUDE_SUMMARIES = os.getenv("KNOWLEDGE_INCLUDE_SUMMARIES", "false").lower() == "true"
 
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -34,53 +115,585 @@ def hash(password: str):
 def verify(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
+# Caching LLM results
+class MemoryCacheBackend:
+    """
+    In-process LRU cache backend.
+    """
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteCacheBackend:
+    """
+    Disk-backed cache backend, shared between worker processes on the same host.
+    """
+    # Reads and writes block on SQLite, so LLMResultCache runs them in a thread
+    blocking = True
+
+    def __init__(self, path: str = "./llm_cache.db", max_entries: int = 512):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_cache_accessed_at ON llm_cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            if row[1] < now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: int):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now)
+            )
+            # Drop expired entries, then the least recently used ones above the size limit
+            self._conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+
+class LLMResultCache:
+    """
+    Content-addressed cache for model outputs, keyed on the model name, the cache version,
+    the kind of generation and its prompt signature, the input text and the generation parameters.
+    """
+    def __init__(self, backend, ttl: int = 86400):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(kind: str, text: str, *, signature: str = "", **params) -> str:
+        payload = json.dumps(
+            {"model": MODEL_NAME, "version": LLM_CACHE_VERSION, "kind": kind, "signature": signature, "params": params},
+            sort_keys=True
+        )
+        digest = hashlib.sha256(payload.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    async def _call(self, method: Callable, *args):
+        if getattr(self.backend, "blocking", False):
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            value = await self._call(self.backend.get, key)
+        except Exception as e:
+            logging.warning(f"LLM cache lookup failed: {e}")
+            value = None
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str):
+        try:
+            await self._call(self.backend.set, key, value, self.ttl)
+        except Exception as e:
+            logging.warning(f"LLM cache write failed: {e}")
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+def prompt_signature(result_type, *prompts) -> str:
+    """
+    Digest of the instructions and the result schema of a generation, so that outputs cached before either
+    of them changed are not served. Prompt builders are hashed through the string literals of their code.
+    """
+    parts = [json.dumps(TypeAdapter(result_type).json_schema(), sort_keys=True)]
+    for prompt in prompts:
+        if callable(prompt):
+            prompt = "\0".join(const for const in prompt.__code__.co_consts if isinstance(const, str))
+        parts.append(prompt)
+    return hashlib.sha256("\0\0".join(parts).encode("utf-8")).hexdigest()
+
+
+def get_llm_cache() -> LLMResultCache:
+    """
+    Builds the LLM result cache from the LLM_CACHE_* settings.
+    """
+    if LLM_CACHE_BACKEND == "sqlite":
+        backend = SQLiteCacheBackend(LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES)
+    else:
+        backend = MemoryCacheBackend(max_entries=LLM_CACHE_MAX_ENTRIES)
+    return LLMResultCache(backend, ttl=LLM_CACHE_TTL)
+
+
+llm_cache = get_llm_cache()
+
 # Extracting text from files
-def extract_text_from_file(file: UploadFile) -> str:
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt")
+
+
+def _check_supported(filename: str):
+    if not filename or not filename.endswith(SUPPORTED_EXTENSIONS):
+        raise ValueError("Unsupported file format. Please upload a PDF, DOCX, or TXT file.")
+
+
+def _spool_path() -> str:
     """
-    Extracts text from a given file (PDF, DOCX, TXT).
+    Creates an empty temporary file for an upload and returns its path, which the caller unlinks.
     """
-    content = ""
+    fd, path = tempfile.mkstemp(suffix=".upload")
+    os.close(fd)
+    return path
 
-    # Check file type
-    if file.filename.endswith(".pdf"):
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file.file.read()))
-        content = "\n".join(page.extract_text() for page in pdf_reader.pages if page.extract_text())
-    
-    elif file.filename.endswith(".docx"):
-        doc = docx.Document(io.BytesIO(file.file.read()))
+
+def _spool_upload(fileobj, path: str):
+    """
+    Copies an upload to the temporary file at path.
+    """
+    fileobj.seek(0)
+    with open(path, "wb") as spooled:
+        shutil.copyfileobj(fileobj, spooled, length=1024 * 1024)
+
+
+def _map_file(path: str) -> mmap.mmap:
+    if os.path.getsize(path) == 0:
+        raise ValueError("Extracted text is empty.")
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _count_pdf_pages(path: str) -> int:
+    with _map_file(path) as data:
+        return len(PyPDF2.PdfReader(data).pages)
+
+
+def _extract_pdf_pages(path: str, start: int, end: Optional[int], max_chars: int) -> List[str]:
+    """
+    Extracts the text of pages [start, end) of a spooled PDF, stopping once max_chars is reached.
+    Every page is extracted exactly once.
+    """
+    pages = []
+    total = 0
+    with _map_file(path) as data:
+        reader = PyPDF2.PdfReader(data)
+        end = len(reader.pages) if end is None else min(end, len(reader.pages))
+        for index in range(start, end):
+            text = reader.pages[index].extract_text()
+            if text:
+                pages.append(text)
+                total += len(text) + 1
+            if total >= max_chars:
+                break
+    return pages
+
+
+def _extract_text(path: str, filename: str, max_chars: int) -> str:
+    """
+    Extracts text from a spooled DOCX or TXT file, up to max_chars characters. PDFs are split into page ranges
+    by TextExtractionService instead.
+    Runs inside the extraction worker processes, so it raises ValueError instead of HTTPException.
+    """
+    _check_supported(filename)
+
+    if filename.endswith(".docx"):
+        doc = docx.Document(path)
         content = "\n".join([para.text for para in doc.paragraphs])
     
-    elif file.filename.endswith(".txt"):
-        content = file.file.read().decode("utf-8")
-    
     else:
-        raise HTTPException(status_code=400, detail="Unsupported file format. Please upload a PDF, DOCX, or TXT file.")
+        with _map_file(path) as data:
+            content = data[:max_chars * 4].decode("utf-8", errors="ignore")
 
+    content = content[:max_chars]
     if not content.strip():
-        raise HTTPException(status_code=400, detail="Extracted text is empty.")
+        raise ValueError("Extracted text is empty.")
 
     return content
 
+
+class TextExtractionService:
+    """
+    Parses uploaded files in a bounded process pool so that CPU-bound parsing
+    does not block the event loop.
+
+    A pool whose worker died (e.g. killed while parsing a bad PDF) is replaced instead of failing every later upload,
+    and the pool is recycled when an extraction times out, so the timed-out work does not keep a worker busy.
+    """
+    def __init__(self, max_workers: int = 2, max_pending: int = 8, timeout: float = 60,
+                 pages_per_job: int = 25, max_chars: int = 200000):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.pages_per_job = pages_per_job
+        self.max_chars = max_chars
+        self._executor = None
+        self._pending = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _discard_executor(self, executor: Optional[ProcessPoolExecutor], terminate: bool = False) -> bool:
+        """
+        Drops the given pool so that the next job starts a new one. With terminate, its workers are killed,
+        which stops the work still running in them; the other jobs of the pool get BrokenProcessPool and are retried.
+        """
+        if executor is None or executor is not self._executor:
+            return False
+
+        self._executor = None
+        if terminate:
+            # ProcessPoolExecutor has no public way to stop running work
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+        return True
+
+    async def _run(self, fn: Callable, *args):
+        """
+        Runs fn in the pool. When the pool is broken, it is replaced and the call is retried once.
+        """
+        for attempt in range(2):
+            executor = self._get_executor()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                if self._discard_executor(executor):
+                    logging.warning("Text extraction worker died, restarting the pool")
+
+        raise HTTPException(
+            status_code=503,
+            detail="Text extraction failed because a worker stopped unexpectedly. Please try again shortly.",
+            headers={"Retry-After": "5"}
+        )
+
+    async def _extract_pdf(self, path: str) -> str:
+        """
+        Splits the PDF into page ranges and extracts them across the worker processes,
+        one wave at a time, until the character budget is reached.
+        """
+        num_pages = await self._run(_count_pdf_pages, path)
+
+        pages = []
+        total = 0
+        start = 0
+        size = self.pages_per_job
+        while start < num_pages and total < self.max_chars:
+            ranges = []
+            for _ in range(self.max_workers):
+                if start >= num_pages:
+                    break
+                ranges.append((start, min(start + size, num_pages)))
+                start += size
+
+            remaining = self.max_chars - total
+            results = await asyncio.gather(*[
+                self._run(_extract_pdf_pages, path, first, end, remaining)
+                for first, end in ranges
+            ])
+            for chunk in results:
+                pages.extend(chunk)
+                total += sum(len(page) + 1 for page in chunk)
+
+            # Every job reads the page tree of the whole PDF, so the waves left after the first one take
+            # larger ranges to keep that cost from growing with the square of the page count
+            size *= 2
+
+        return "\n".join(pages)[:self.max_chars]
+
+    async def _extract_path(self, path: str, filename: str) -> str:
+        if filename.endswith(".pdf"):
+            content = await self._extract_pdf(path)
+        else:
+            content = await self._run(_extract_text, path, filename, self.max_chars)
+
+        if not content.strip():
+            raise ValueError("Extracted text is empty.")
+        return content
+
+    async def extract(self, file: UploadFile) -> str:
+        # Reject new jobs once the queue is full instead of letting them pile up
+        if self._pending >= self.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many files are being processed right now. Please try again shortly.",
+                headers={"Retry-After": "5"}
+            )
+
+        self._pending += 1
+        path = None
+        try:
+            _check_supported(file.filename)
+            # Spool the upload to disk so the workers can map it instead of receiving a copy of the bytes.
+            # The file is created here rather than in the thread, so that it is unlinked below even if the copy
+            # is cancelled (e.g. the client disconnected) or fails halfway.
+            path = _spool_path()
+            await asyncio.get_running_loop().run_in_executor(None, _spool_upload, file.file, path)
+            return await asyncio.wait_for(self._extract_path(path, file.filename), timeout=self.timeout)
+
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except asyncio.TimeoutError:
+            # The timed-out work would keep running in the pool, unaccounted for by _pending, so the pool is recycled
+            logging.warning(f"Extraction of {file.filename} timed out, recycling the extraction pool")
+            self._discard_executor(self._executor, terminate=True)
+            raise HTTPException(status_code=504, detail="Timed out while extracting text from the file.")
+        finally:
+            self._pending -= 1
+            if path:
+                os.unlink(path)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+extraction_service = TextExtractionService(
+    max_workers=EXTRACTION_WORKERS,
+    max_pending=EXTRACTION_MAX_PENDING,
+    timeout=EXTRACTION_TIMEOUT,
+    pages_per_job=EXTRACTION_PAGES_PER_JOB,
+    max_chars=EXTRACTION_MAX_CHARS
+)
+
+
+async def extract_text_from_file_async(file: UploadFile) -> str:
+    """
+    Extracts text from a given file (PDF, DOCX, TXT) without blocking the event loop.
+    """
+    return await extraction_service.extract(file)
+
+# Caching scraped pages
+class PageCache:
+    """
+    On-disk cache of scraped pages. Stores the raw response with its validators
+    (ETag / Last-Modified) and the cleaned text, evicts the least recently used
+    pages above max_bytes, and remembers failing URLs for negative_ttl seconds.
+    The methods block on SQLite, so async code calls them with asyncio.to_thread.
+    """
+    def __init__(self, path: str = "./page_cache.db", max_bytes: int = 100 * 1024 * 1024, negative_ttl: int = 600):
+        self.max_bytes = max_bytes
+        self.negative_ttl = negative_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, raw BLOB, text TEXT, "
+            "size INTEGER NOT NULL DEFAULT 0, fetched_at REAL NOT NULL, accessed_at REAL NOT NULL, "
+            "failed_until REAL NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_pages_accessed_at ON pages (accessed_at)")
+        self._conn.commit()
+        # Running total of the page sizes, so that a put does not sum the whole table
+        self._total_bytes = self._stored_bytes()
+
+    def get(self, url: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, text, fetched_at, failed_until FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            self._conn.execute("UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+
+        return {"etag": row[0], "last_modified": row[1], "text": row[2], "fetched_at": row[3], "failed_until": row[4]}
+
+    def put(self, url: str, raw: bytes, text: str, etag: Optional[str], last_modified: Optional[str]):
+        now = time.time()
+        size = len(raw) + len(text)
+        with self._lock:
+            replaced = self._conn.execute("SELECT size FROM pages WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, etag, last_modified, raw, text, size, fetched_at, accessed_at, failed_until) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (url, etag, last_modified, raw, text, size, now, now)
+            )
+            self._total_bytes += size - (replaced[0] if replaced else 0)
+            self._evict()
+            self._conn.commit()
+
+    def touch(self, url: str):
+        """
+        Marks a cached page as fresh again after a 304 revalidation.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("UPDATE pages SET fetched_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+            self._conn.commit()
+
+    def mark_failed(self, url: str):
+        now = time.time()
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE pages SET failed_until = ?, accessed_at = ? WHERE url = ?", (now + self.negative_ttl, now, url)
+            ).rowcount
+            if not updated:
+                self._conn.execute(
+                    "INSERT INTO pages (url, fetched_at, accessed_at, failed_until) VALUES (?, 0, ?, ?)",
+                    (url, now, now + self.negative_ttl)
+                )
+            self._conn.commit()
+
+    def cached_pages(self) -> List[Tuple[str, str]]:
+        """
+        Returns the url and text of every page that was fetched successfully.
+        """
+        with self._lock:
+            return self._conn.execute("SELECT url, text FROM pages WHERE text IS NOT NULL AND text != ''").fetchall()
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+
+    def _evict(self):
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        # Other processes sharing the file also add and evict pages, so the total is checked before evicting
+        self._total_bytes = self._stored_bytes()
+        if self._total_bytes <= self.max_bytes:
+            return
+
+        for url, size in self._conn.execute("SELECT url, size FROM pages ORDER BY accessed_at").fetchall():
+            self._conn.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self._total_bytes -= size
+            if self._total_bytes <= self.max_bytes:
+                break
+
+
+page_cache = PageCache(PAGE_CACHE_PATH, max_bytes=PAGE_CACHE_MAX_BYTES, negative_ttl=PAGE_CACHE_NEGATIVE_TTL)
+
 # Scraping the web for RAG
 class WebScraper:
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+    }
+
+    # Shared by every scraper so that connections are kept alive across requests
+    _client: Optional[httpx.AsyncClient] = None
+
+    def __init__(self, search_url: str = SEARCH_URL, per_host_limit: int = SCRAPER_PER_HOST_LIMIT, deadline: float = SCRAPER_DEADLINE,
+                 cache: Optional[PageCache] = None, max_hosts: int = SCRAPER_MAX_HOSTS):
+        self.search_url = search_url
+        self.cache = cache or page_cache
+        self.per_host_limit = per_host_limit
+        self.deadline = deadline
+        self.max_hosts = max_hosts
+        # host -> [semaphore, requests holding or waiting for it], least recently used first
+        self._host_limits = OrderedDict()
+
+    @classmethod
+    def get_client(cls) -> httpx.AsyncClient:
+        if cls._client is None or cls._client.is_closed:
+            cls._client = httpx.AsyncClient(
+                headers=cls.headers,
+                timeout=SCRAPER_REQUEST_TIMEOUT,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=SCRAPER_MAX_CONNECTIONS,
+                    max_keepalive_connections=SCRAPER_MAX_CONNECTIONS
+                )
+            )
+        return cls._client
+
+    @classmethod
+    async def close_client(cls):
+        if cls._client is not None:
+            await cls._client.aclose()
+            cls._client = None
+
+    async def _get(self, url: str, **kwargs) -> httpx.Response:
+        """
+        Performs a GET on the shared client, allowing at most per_host_limit concurrent requests per host
+        """
+        host = urlparse(url).netloc
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = [asyncio.Semaphore(self.per_host_limit), 0]
+        self._host_limits.move_to_end(host)
+
+        limit[1] += 1
+        try:
+            async with limit[0]:
+                return await self.get_client().get(url, **kwargs)
+        finally:
+            limit[1] -= 1
+            self._prune_hosts()
+
+    def _prune_hosts(self):
+        """
+        Drops the least recently used hosts above max_hosts. Hosts with requests in flight are kept,
+        since a new semaphore for them would let more than per_host_limit requests through.
+        """
+        if len(self._host_limits) <= self.max_hosts:
+            return
+
+        for host, (_, users) in list(self._host_limits.items()):
+            if len(self._host_limits) <= self.max_hosts:
+                break
+            if not users:
+                del self._host_limits[host]
+
     async def search_web(self, query: str, num_results: int = 5) -> List[dict]:
         """
         Search the web for relevant information on the topic
         """
         try:
-            import requests
             from bs4 import BeautifulSoup
             
             # Format search query
             search_query = f"{query} study guide curriculum syllabus"
-            query_encoded = search_query.replace(" ", "+")
             
             # Perform search
-            response = requests.get(
-                f"https://www.google.com/search?q={query_encoded}", 
-                headers=self.headers,
-                timeout=10
-            )
+            response = await self._get(self.search_url, params={"q": search_query})
             
             if response.status_code != 200:
                 return []
@@ -111,37 +724,72 @@ class WebScraper:
             return search_results
         
         except Exception as e:
-            print(f"Error searching web: {str(e)}")
+            logging.warning(f"Error searching web: {e}")
             return []
     
+    @staticmethod
+    def _clean_html(content: bytes) -> str:
+        """
+        Strips markup, scripts and navigation from a page and normalizes whitespace
+        """
+        from bs4 import BeautifulSoup
+        import re
+
+        soup = BeautifulSoup(content, "html.parser")
+        
+        # Remove script, style, and navigation elements
+        for element in soup(["script", "style", "header", "footer", "nav"]):
+            element.decompose()
+        
+        # Get text content
+        text = soup.get_text(separator=" ", strip=True)
+        
+        # Clean up the text
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        text = " ".join(lines)
+        
+        # Remove excess whitespace
+        return re.sub(r'\s+', ' ', text).strip()
+
     async def extract_content_from_url(self, url: str, max_chars: int = 4000) -> str:
         """
         Extract main text content from a webpage
         """
         try:
-            import requests
-            from bs4 import BeautifulSoup
-            import re
-            
-            response = requests.get(url, headers=self.headers, timeout=10)
-            if response.status_code != 200:
+            cached = await asyncio.to_thread(self.cache.get, url)
+            now = time.time()
+
+            if cached and cached["failed_until"] > now:
                 return ""
-            
-            soup = BeautifulSoup(response.content, "html.parser")
-            
-            # Remove script, style, and navigation elements
-            for element in soup(["script", "style", "header", "footer", "nav"]):
-                element.decompose()
-            
-            # Get text content
-            text = soup.get_text(separator=" ", strip=True)
-            
-            # Clean up the text
-            lines = [line.strip() for line in text.splitlines() if line.strip()]
-            text = " ".join(lines)
-            
-            # Remove excess whitespace
-            text = re.sub(r'\s+', ' ', text).strip()
+
+            if cached and cached["text"] is not None and cached["fetched_at"] + PAGE_CACHE_FRESH_SECONDS > now:
+                text = cached["text"]
+            else:
+                # Revalidate stale pages instead of downloading them again
+                headers = {}
+                if cached and cached["etag"]:
+                    headers["If-None-Match"] = cached["etag"]
+                if cached and cached["last_modified"]:
+                    headers["If-Modified-Since"] = cached["last_modified"]
+
+                response = await self._get(url, headers=headers)
+
+                if response.status_code == 304 and cached and cached["text"] is not None:
+                    await asyncio.to_thread(self.cache.touch, url)
+                    text = cached["text"]
+                elif response.status_code == 200:
+                    text = self._clean_html(response.content)
+                    await asyncio.to_thread(
+                        self.cache.put,
+                        url,
+                        response.content,
+                        text,
+                        response.headers.get("ETag"),
+                        response.headers.get("Last-Modified")
+                    )
+                else:
+                    await asyncio.to_thread(self.cache.mark_failed, url)
+                    return ""
             
             # Limit content length (LLMs have token limits)
             if len(text) > max_chars:
@@ -150,70 +798,540 @@ class WebScraper:
             return text
         
         except Exception as e:
-            print(f"Error extracting content from {url}: {str(e)}")
+            logging.warning(f"Error extracting content from {url}: {e}")
+            try:
+                await asyncio.to_thread(self.cache.mark_failed, url)
+            except Exception:
+                pass
             return ""
 
+    async def extract_contents(self, urls: List[str], max_chars: int = 4000) -> List[str]:
+        """
+        Extracts the content of several webpages concurrently.
+        Pages that are not done by the deadline are returned as empty strings.
+        """
+        if not urls:
+            return []
+
+        tasks = [asyncio.create_task(self.extract_content_from_url(url, max_chars=max_chars)) for url in urls]
+        done, pending = await asyncio.wait(tasks, timeout=self.deadline)
+
+        for task in pending:
+            task.cancel()
+        if pending:
+            logging.warning(f"Web content extraction deadline reached, skipping {len(pending)} page(s)")
+
+        return [task.result() if task in done else "" for task in tasks]
+
+
+# Chunking
+# Rough number of characters per token of English text, used to budget prompts without a tokenizer
+CHARS_PER_TOKEN = 4
+
+_HEADING = re.compile(r"^\s{0,3}#{1,6}\s")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _split_units(text: str, max_tokens: int) -> List[str]:
+    """
+    Splits text into paragraphs, falling back to lines and then to fixed-size pieces for
+    paragraphs that are over the budget on their own (PDF text often has no blank lines).
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    units = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            units.append(paragraph)
+            continue
+        for line in paragraph.splitlines():
+            line = line.strip()
+            units.extend(line[i:i + max_chars] for i in range(0, len(line), max_chars))
+    return units
+
+
+def split_into_chunks(text: str, max_tokens: int = SUMMARY_CHUNK_TOKENS) -> List[str]:
+    """
+    Splits text into chunks of at most max_tokens on paragraph boundaries, starting a new chunk at headings.
+
+    Once a chunk is half full it also ends before any paragraph whose hash has its low five bits clear.
+    Boundaries then depend on the nearby text only, so an edit changes the chunks around it
+    instead of shifting every later chunk, and the cached summaries of the other chunks still apply.
+    """
+    chunks, current, current_tokens = [], [], 0
+
+    for unit in _split_units(text, max_tokens):
+        tokens = estimate_tokens(unit)
+        boundary = _HEADING.match(unit) or zlib.crc32(unit.encode("utf-8")) % 32 == 0
+
+        if current and (current_tokens + tokens > max_tokens or (boundary and current_tokens >= max_tokens // 2)):
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+
+        current.append(unit)
+        current_tokens += tokens
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+# Retrieval
+def split_into_passages(text: str) -> List[str]:
+    return split_into_chunks(text, RETRIEVAL_PASSAGE_TOKENS)
+
+
+def _build_document_index(text: str) -> VectorIndex:
+    passages, sections = [], []
+    for section, section_text in enumerate(split_into_chunks(text, RETRIEVAL_SECTION_TOKENS)):
+        for passage in split_into_passages(section_text):
+            passages.append(passage)
+            sections.append(section)
+    return VectorIndex.build(index_store.embedder, passages, sections)
+
+
+def _select_passages(text: str, max_tokens: int, query: Optional[str]) -> str:
+    key = index_store.make_key(text, section_tokens=RETRIEVAL_SECTION_TOKENS, passage_tokens=RETRIEVAL_PASSAGE_TOKENS)
+    index = index_store.get_or_build(key, lambda: _build_document_index(text))
+
+    # Every section adds a share of the budget proportional to its size, and what a section leaves unused
+    # carries over to the next one, so the selection stays within the budget and covers the whole document
+    ratio = max_tokens / estimate_tokens(text)
+    ids, allowance, used = [], 0.0, 0
+    for ranked in index.rank_sections(query):
+        allowance += ratio * sum(estimate_tokens(index.passages[i]) for i in ranked)
+        for i in ranked:
+            tokens = estimate_tokens(index.passages[i])
+            if used + tokens > allowance:
+                break
+            ids.append(int(i))
+            used += tokens
+    ids.sort()
+
+    # Gaps are marked so that the model does not read unrelated passages as continuous text
+    parts = []
+    for previous, current in zip([-1] + ids, ids):
+        if current != previous + 1:
+            parts.append("[...]")
+        parts.append(index.passages[current])
+
+    logging.info(f"Retrieved {len(ids)} of {len(index.passages)} passages from a document of {estimate_tokens(text)} tokens")
+    return "\n\n".join(parts)
+
+
+async def retrieve_passages(text: str, max_tokens: int, query: Optional[str] = None) -> str:
+    """
+    Returns the text as is when it fits in max_tokens. Otherwise returns the passages of each section
+    that are most representative of it, and most relevant to the query when one is given.
+    The passage index of the text is stored on disk and reused when the same document comes again.
+    """
+    if not RETRIEVAL_ENABLED or estimate_tokens(text) <= max_tokens:
+        return text
+    return await asyncio.get_running_loop().run_in_executor(None, _select_passages, text, max_tokens, query)
+
+
+class KnowledgeSearch:
+    """
+    Searches the local knowledge store, and the web when the store has too few relevant passages.
+    Pages fetched by the web search are added to the store, so later searches on the same subject stay local.
+    The store blocks on SQLite, so the coroutines below run it in a thread.
+    """
+    def __init__(self, web_scraper: "WebScraper", store: Optional[KnowledgeStore] = None,
+                 min_results: int = KNOWLEDGE_MIN_RESULTS, min_coverage: float = KNOWLEDGE_MIN_COVERAGE):
+        self.web_scraper = web_scraper
+        self.store = store or knowledge_store
+        self.min_results = min_results
+        self.min_coverage = min_coverage
+
+    async def search_knowledge(self, query: str, num_results: int = 5) -> List[dict]:
+        """
+        Search for reference material on a topic. Returns passages with their title, source and content.
+        """
+        results = await self._search_store(query, num_results)
+        if len(results) >= self.min_results:
+            return results
+
+        logging.info(f"Local knowledge has {len(results)} relevant passage(s) for {query!r}, searching the web")
+        if await self._fetch_from_web(query):
+            results = await self._search_store(query, num_results)
+        return results
+
+    async def _search_store(self, query: str, num_results: int) -> List[dict]:
+        results = await asyncio.to_thread(self.store.search, query, num_results)
+        return [result for result in results if result["coverage"] >= self.min_coverage]
+
+    async def add(self, source: str, kind: str, title: Optional[str], text: str):
+        """
+        Splits the text into passages and stores them under source, replacing what was stored there before.
+        """
+        await asyncio.to_thread(lambda: self.store.add(source, kind, title, split_into_passages(text)))
+
+    async def _fetch_from_web(self, query: str) -> int:
+        search_results = await self.web_scraper.search_web(query, num_results=3)
+        contents = await self.web_scraper.extract_contents(
+            [result['url'] for result in search_results], max_chars=KNOWLEDGE_PAGE_CHARS
+        )
+
+        added = 0
+        for result, content in zip(search_results, contents):
+            if content:
+                await self.add(result['url'], "page", result['title'], content)
+                added += 1
+        return added
+
+    def index_cached_pages(self) -> int:
+        """
+        Adds the pages of the scrape cache that are not in the store yet. Blocking, meant to run in an executor.
+        """
+        added = 0
+        for url, text in self.web_scraper.cache.cached_pages():
+            if not self.store.has(url):
+                self.store.add(url, "page", None, split_into_passages(text[:KNOWLEDGE_PAGE_CHARS]))
+                added += 1
+
+        logging.info(f"Added {added} cached page(s) to the knowledge store")
+        return added
+
+
+def study_plan_text(plan: StudyPlanData) -> str:
+    """
+    Renders a study plan as markdown text, for the knowledge store.
+    """
+    parts = [f"# {plan.topic}", plan.overview]
+    if plan.learning_objectives:
+        parts.append("\n".join(f"- {objective}" for objective in plan.learning_objectives))
+
+    for section in plan.sections:
+        lines = [f"## {section.title}", section.description]
+        lines.extend(f"- {topic}" for topic in section.topics)
+        lines.extend(f"- {activity}" for activity in section.activities)
+        parts.append("\n".join(lines))
+
+    return "\n\n".join(parts)
+
 
 # Agent-related 
+class RateLimiter:
+    """
+    Async context manager that allows at most max_concurrency calls at a time, and at most per_minute calls
+    per minute on average. Starts are limited with a token bucket, so a burst of max_concurrency calls starts at once.
+    """
+    def __init__(self, max_concurrency: int, per_minute: int = 0):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._capacity = max_concurrency
+        self._rate = per_minute / 60
+        self._tokens = float(max_concurrency)
+        self._updated_at = time.monotonic()
+
+    def _reserve(self) -> float:
+        """
+        Takes a token, and returns how long to wait until it is actually available.
+        """
+        if self._rate <= 0:
+            return 0
+
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+        self._tokens -= 1
+        return max(0, -self._tokens / self._rate)
+
+    async def __aenter__(self):
+        await self._semaphore.acquire()
+        wait = self._reserve()
+
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except BaseException:
+                self._semaphore.release()
+                raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._semaphore.release()
+
+
+# Shared by every agent run (requests, batches and jobs), so that together they stay within the provider limits
+generation_limiter = RateLimiter(GENERATION_CONCURRENCY, GENERATION_RATE_PER_MINUTE)
+
+
+class AgentRegistry:
+    """
+    Process-wide registry that owns the model client and its HTTP connection pool,
+    and builds each agent once per (name, result type, tool set).
+    Agents are run through run and run_stream, which hold a slot of the limiter for the whole run.
+    """
+    def __init__(self, limiter: RateLimiter):
+        self._limiter = limiter
+        self._model = None
+        self._http_client = None
+        self._agents = {}
+        self._usage = {}
+
+    def get_model(self) -> GeminiModel:
+        if self._model is None:
+            self._http_client = httpx.AsyncClient(timeout=httpx.Timeout(timeout=600, connect=5))
+            self._model = GeminiModel(MODEL_NAME, api_key=API_KEY, http_client=self._http_client)
+        return self._model
+
+    def get_agent(self, name: str, result_type, system_prompt=(), prompt_builder: Callable = None,
+                  tools: List[Tool] = None, deps_type=type(None)) -> Agent:
+        """
+        Returns the agent registered under the given key, building it on first use.
+        Per-call parameters are passed as deps and rendered by prompt_builder at run time.
+        """
+        tools = tools or []
+        key = (name, repr(result_type), tuple(tool.name for tool in tools))
+
+        agent = self._agents.get(key)
+        if agent is None:
+            agent = Agent(
+                self.get_model(),
+                result_type=result_type,
+                system_prompt=system_prompt,
+                deps_type=deps_type,
+                tools=tools
+            )
+            if prompt_builder is not None:
+                agent.system_prompt(prompt_builder)
+            self._agents[key] = agent
+        return agent
+
+    async def run(self, name: str, agent: Agent, prompt: str, **kwargs):
+        """
+        Runs the agent registered under name and records its usage.
+        """
+        async with self._limiter:
+            result = await agent.run(prompt, **kwargs)
+        self.record_usage(name, result, prompt)
+        return result
+
+    @asynccontextmanager
+    async def run_stream(self, name: str, agent: Agent, prompt: str, **kwargs):
+        """
+        Streams a run of the agent registered under name, and records its usage once the stream is consumed.
+        """
+        async with self._limiter:
+            async with agent.run_stream(prompt, **kwargs) as result:
+                yield result
+        self.record_usage(name, result, prompt)
+
+    def record_usage(self, name: str, result, prompt: str = ""):
+        """
+        Logs the tokens used by a run of the named agent and adds them to its totals.
+        prompt is the user prompt of the run, whose estimated size is logged next to the reported input tokens.
+        """
+        usage = result.usage()
+        totals = self._usage.setdefault(name, {"runs": 0, "requests": 0, "request_tokens": 0, "response_tokens": 0})
+        totals["runs"] += 1
+        totals["requests"] += usage.requests
+        totals["request_tokens"] += usage.request_tokens or 0
+        totals["response_tokens"] += usage.response_tokens or 0
+
+        logging.info(
+            f"Agent {name}: {usage.requests} request(s), {usage.request_tokens} input tokens "
+            f"(~{estimate_tokens(prompt)} in the user prompt), {usage.response_tokens} output tokens"
+        )
+
+    def usage_stats(self) -> dict:
+        return {name: dict(totals) for name, totals in self._usage.items()}
+
+    async def aclose(self):
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        self._model = None
+        self._http_client = None
+        self._agents = {}
+
+
+agent_registry = AgentRegistry(generation_limiter)
+
+
+
+
+@dataclass
+class QuestionParams:
+    num_questions: int
+    difficulty: str
+
+
+@dataclass
+class SummaryParams:
+    word_length: int
+    detail_level: str
+
+
+@dataclass
+class ChunkSummaryParams:
+    detail_level: str
+
+
+@dataclass
+class InterviewParams:
+    role: str
+    interview_type: str
+    level: str
+    techstack: str
+    num_questions: int
+
+
+# Prompt assembly
+#
+# Each agent gets its instructions as a static system prompt, which comes first and is identical across requests,
+# so that provider-side prompt caching can reuse it. The per-request parameters follow as a short dynamic
+# system prompt, and the large content (document, questions and answers) is sent once, as the user prompt.
+
+def content_prompt(**sections: str) -> str:
+    """
+    User prompt carrying the content of a request, one tagged section per keyword argument.
+    """
+    return "\n\n".join(f"<{name}>\n{content}\n</{name}>" for name, content in sections.items())
+
+
+QUESTIONS_INSTRUCTIONS = (
+    "You are a teacher tasked with creating multiple-choice questions on the document given by the user. "
+    "Each question should have four options (a, b, c, d) and a correct answer. "
+    "Focus your questions on the core text provided, using the additional information only for context and enrichment. "
+    "Use the _enhance_with_web_content tool with the topic of the document to retrieve additional information on it. "
+    "The questions should be clear, concise, and relevant to the text."
+)
+
+SUMMARY_INSTRUCTIONS = (
+    "You are an expert summarizer who specializes in creating well-structured markdown documents. "
+    "Create a clear, organized summary of the document given by the user. "
+    "The level of detail is either 'low', meaning only key points, 'medium', meaning important details and main ideas, "
+    "or 'high', meaning comprehensive coverage of significant details. "
+
+    "Structure your response using these markdown formatting guidelines:\n"
+    "1. Begin with a level-1 heading (# ) for the main title\n"
+    "2. Use level-2 headings (## ) for major sections\n"
+    "3. Use level-3 headings (### ) for subsections\n"
+    "4. Use bullet points (- ) for listing related items\n"
+    "5. Use numbered lists (1. ) for sequential or prioritized information\n"
+    "6. Use **bold text** for emphasis on key terms or concepts\n"
+    "7. Use *italics* for definitions or secondary emphasis\n"
+    "8. Use > blockquotes for important quotations or takeaways\n"
+    "9. Use horizontal rules (---) to separate major sections when appropriate\n"
+    "10. Use tables for comparing information when relevant\n\n"
+
+    "Maintain the original meaning and include the most important information from the text. "
+    "Create a logical hierarchy with clear sections and subsections. "
+    "Be comprehensive but concise, focusing on the most significant concepts. "
+    "While using supplementary information for context, prioritize the original text in your summary. "
+    "Use the _enhance_with_web_content tool with the topic of the document to retrieve additional information on it."
+)
+
+CHUNK_SUMMARY_INSTRUCTIONS = (
+    "You are summarizing one part of a longer document. The notes for all parts will be combined into a single summary later. "
+    "Write concise markdown notes on the part given by the user, covering its key ideas, definitions, facts and examples, "
+    "and keeping its headings. "
+    "Do not add an introduction or a conclusion, and do not refer to 'this part' or 'the text'."
+)
+
+INTERVIEW_QUESTIONS_INSTRUCTIONS = (
+    "You prepare interview questions for a job interview, for the role, experience level, tech stack and focus given below.\n"
+    "Please return ONLY the questions themselves, without any introductory text, numbering, or explanations.\n"
+    "The questions are going to be read by a voice assistant, so do not use special characters like '/' or '*' which might break the voice assistant. Use words instead if necessary (e.g., 'slash', 'star').\n"
+    "Return the questions formatted exactly like this JSON array string:\n"
+    '["Question 1", "Question 2", "Question 3"]\n\n'
+    'Example for 3 questions: ["Tell me about a time you faced a technical challenge.", "Explain the concept of closures in JavaScript.", "How do you handle conflicts within a team?"]'
+)
+
+INTERVIEW_REVIEW_INSTRUCTIONS = (
+    "You are an expert interview coach and evaluator. Review the interview questions and the candidate's answers given by the user. "
+    "For each answer, provide a comprehensive analysis with the following components:\n"
+    "1. Identify the category of the question (e.g., 'Technical Knowledge', 'Problem Solving', 'Communication Skills', 'Experience', 'Behavioral')\n"
+    "2. Assign a rating from 0 to 100, where:\n"
+    "   - 0-20: Poor/Inadequate response\n"
+    "   - 21-40: Below average response\n"
+    "   - 41-60: Average/Acceptable response\n"
+    "   - 61-80: Good/Strong response\n"
+    "   - 81-100: Excellent/Outstanding response\n"
+    "3. Provide a detailed review with specific strengths and areas for improvement, constructive feedback, and actionable suggestions.\n\n"
+    "Be objective, fair, and constructive in your evaluation. Focus on both content and delivery aspects of the answers. "
+    "Consider factors such as accuracy, completeness, clarity, relevance, and how well the candidate addressed the specific question asked."
+)
+
+
+def _questions_prompt(ctx: RunContext[QuestionParams]) -> str:
+    params = ctx.deps
+    return f"Create {params.num_questions} questions. Make sure the difficulty of each question is {params.difficulty}."
+
+
+def _summary_prompt(ctx: RunContext[SummaryParams]) -> str:
+    params = ctx.deps
+    return f"Write approximately {params.word_length} words at a {params.detail_level} level of detail."
+
+
+def _chunk_summary_prompt(ctx: RunContext[ChunkSummaryParams]) -> str:
+    return f"Write the notes at a {ctx.deps.detail_level} level of detail."
+
+
+def _interview_questions_prompt(ctx: RunContext[InterviewParams]) -> str:
+    params = ctx.deps
+    return (
+        f"Prepare exactly {params.num_questions} interview questions.\n"
+        f"The job role is: {params.role}.\n"
+        f"The job experience level is: {params.level}.\n"
+        f"The tech stack used in the job includes: {params.techstack}.\n"
+        f"The focus between behavioural and technical questions should lean towards: {params.interview_type}."
+    )
+
+
+QUESTIONS_SIGNATURE = prompt_signature(List[ResponseQuestions], QUESTIONS_INSTRUCTIONS, _questions_prompt)
+SUMMARY_SIGNATURE = prompt_signature(str, SUMMARY_INSTRUCTIONS, _summary_prompt, CHUNK_SUMMARY_INSTRUCTIONS, _chunk_summary_prompt)
+CHUNK_SUMMARY_SIGNATURE = prompt_signature(str, CHUNK_SUMMARY_INSTRUCTIONS, _chunk_summary_prompt)
+
+
 class SummaryQuestionGeneratorAgent:
     def __init__(self):
-        self.model = GeminiModel('gemini-1.5-flash', api_key=API_KEY)
         self.web_scraper = WebScraper()
-        self.headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
+        self.knowledge = KnowledgeSearch(self.web_scraper)
+        self.headers = WebScraper.headers
+        self.tools = [Tool(self._enhance_with_web_content)]
 
-    async def _enhance_with_web_content(self, text: str, topic: str = None) -> str:
+    async def _enhance_with_web_content(self, topic: str) -> str:
         """
-        Enhances the input text with relevant web content for RAG.
+        Retrieves reference material on the given topic, as context for the document.
         """
-        if not topic:
-            # Extract a topic from the text if none provided
-            topic = text.split(".")[0] if "." in text else text[:50]
-        
-        # Search the web for additional information
-        search_results = await self.web_scraper.search_web(topic, num_results=3)
-        
-        # Extract content from search results
-        additional_content = []
-        for result in search_results:
-            content = await self.web_scraper.extract_content_from_url(result['url'], max_chars=2000)
-            if content:
-                additional_content.append({
-                    "source": result['url'],
-                    "title": result['title'],
-                    "content": content
-                })
-        
-        # Combine original text with additional content
-        enhanced_text = text + "\n\n" + "\n\n".join([
-            f"Additional information from {item['title']}:\n{item['content'][:1000]}" 
-            for item in additional_content
+        results = await self.knowledge.search_knowledge(topic, num_results=3)
+
+        # Only the additional content is returned, the model already has the document in its prompt
+        return "\n\n".join([
+            f"Additional information from {result['title']}:\n{result['content'][:1000]}"
+            for result in results
         ])
-        
-        return enhanced_text
 
     async def generate_questions(self, text: str, num_questions: int = 5, difficulty: str = 'easy', topic: str = None) -> List[ResponseQuestions]:
         """
         Generates multiple-choice questions based on the given text.
         If use_rag is True, enhances the input with web content.
         """
+        # The enum and its value (as stored in job payloads) must key the same entry and render the same prompt
+        difficulty = difficulty.value if isinstance(difficulty, Enum) else str(difficulty)
+        cache_key = llm_cache.make_key("questions", text, signature=QUESTIONS_SIGNATURE, num_questions=num_questions, difficulty=difficulty, topic=topic)
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            return [ResponseQuestions(**q) for q in json.loads(cached)]
 
-        agent = Agent(
-            self.model,
-            result_type=List[ResponseQuestions],
-            system_prompt=(
-                f'You are a teacher tasked with creating {num_questions} multiple-choice questions on the following information: {text} '
-                'Each question should have four options (a, b, c, d) and a correct answer.'
-                f'Make sure the difficulty of each question is {difficulty}. '
-                f'Focus your questions on the core text provided, using the additional information only for context and enrichment.'
-                'Make use of the self._enhance_with_web_content function in order to retrieve additional information from the web.'
-                'The questions should be clear, concise, and relevant to the text.'
-            ),
-            tools=[Tool(self._enhance_with_web_content)]
+        agent = agent_registry.get_agent(
+            "questions",
+            List[ResponseQuestions],
+            system_prompt=QUESTIONS_INSTRUCTIONS,
+            prompt_builder=_questions_prompt,
+            tools=self.tools,
+            deps_type=QuestionParams
         )
 
-        response = await agent.run(text)
+        prompt = content_prompt(document=await retrieve_passages(text, RETRIEVAL_QUESTIONS_TOKENS, topic))
+        response = await agent_registry.run("questions", agent, prompt, deps=QuestionParams(num_questions, difficulty))
+        await llm_cache.set(cache_key, json.dumps([q.model_dump() for q in response.data]))
         return response.data
     
     async def summarize_text(self, text: str, word_length: int = 150, detail_level: str = 'medium', topic: str = None) -> str:
@@ -221,92 +1339,165 @@ class SummaryQuestionGeneratorAgent:
         Summarizes the provided text based on specified word length and detail level.
         If use_rag is True, enhances the input with web content.
         """
+        cache_key = llm_cache.make_key("summary", text, signature=SUMMARY_SIGNATURE, word_length=word_length, detail_level=detail_level, topic=topic)
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
             
-        agent = Agent(
-            self.model,
-            result_type=str,
-            system_prompt=(
-                f"You are an expert summarizer who specializes in creating well-structured markdown documents. "
-                f"Create a clear, organized summary of the following text in approximately {word_length} words. "
-                f"The summary should be at a {detail_level} level of detail, where 'low' means only key points, "
-                f"'medium' means important details and main ideas, and 'high' means comprehensive coverage of significant details. "
-                
-                f"Structure your response using these markdown formatting guidelines:\n"
-                f"1. Begin with a level-1 heading (# ) for the main title\n"
-                f"2. Use level-2 headings (## ) for major sections\n" 
-                f"3. Use level-3 headings (### ) for subsections\n"
-                f"4. Use bullet points (- ) for listing related items\n"
-                f"5. Use numbered lists (1. ) for sequential or prioritized information\n"
-                f"6. Use **bold text** for emphasis on key terms or concepts\n"
-                f"7. Use *italics* for definitions or secondary emphasis\n"
-                f"8. Use > blockquotes for important quotations or takeaways\n"
-                f"9. Use horizontal rules (---) to separate major sections when appropriate\n"
-                f"10. Use tables for comparing information when relevant\n\n"
-                
-                f"Maintain the original meaning and include the most important information from the text. "
-                f"Create a logical hierarchy with clear sections and subsections. "
-                f"Be comprehensive but concise, focusing on the most significant concepts. "
-                f"While using supplementary information for context, prioritize the original text in your summary."
-                "Make use of the self._enhance_with_web_content function in order to retrieve additional information from the web."
-            ),
-            tools=[Tool(self._enhance_with_web_content)]
-        )
+        agent = self._summary_agent()
         
-        response = await agent.run(text)
+        text = await retrieve_passages(text, RETRIEVAL_SUMMARY_TOKENS, topic)
+        prompt = content_prompt(document=await self._condense(text, detail_level))
+        response = await agent_registry.run("summary", agent, prompt, deps=SummaryParams(word_length, detail_level))
+        await llm_cache.set(cache_key, response.data)
+        await self._add_summary_to_knowledge(cache_key, response.data)
+        return response.data
+
+    async def stream_summary(self, text: str, word_length: int = 150, detail_level: str = 'medium', topic: str = None) -> AsyncIterator[str]:
+        """
+        Summarizes the provided text like summarize_text, yielding the markdown as it is generated.
+        """
+        cache_key = llm_cache.make_key("summary", text, signature=SUMMARY_SIGNATURE, word_length=word_length, detail_level=detail_level, topic=topic)
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        agent = self._summary_agent()
+
+        chunks = []
+        text = await retrieve_passages(text, RETRIEVAL_SUMMARY_TOKENS, topic)
+        prompt = content_prompt(document=await self._condense(text, detail_level))
+        async with agent_registry.run_stream("summary", agent, prompt, deps=SummaryParams(word_length, detail_level)) as result:
+            async for delta in result.stream_text(delta=True):
+                chunks.append(delta)
+                yield delta
+
+        await llm_cache.set(cache_key, "".join(chunks))
+        await self._add_summary_to_knowledge(cache_key, "".join(chunks))
+
+    async def _add_summary_to_knowledge(self, cache_key: str, summary: str):
+        if not KNOWLEDGE_INCLUDE_SUMMARIES:
+            return
+        title = summary.splitlines()[0].lstrip("# ").strip() if summary else None
+        await self.knowledge.add(f"summary:{cache_key}", "summary", title, summary)
+
+    def _summary_agent(self) -> Agent:
+        return agent_registry.get_agent(
+            "summary",
+            str,
+            system_prompt=SUMMARY_INSTRUCTIONS,
+            prompt_builder=_summary_prompt,
+            tools=self.tools,
+            deps_type=SummaryParams
+        )
+
+    async def _summarize_chunk(self, chunk: str, detail_level: str, semaphore: asyncio.Semaphore) -> str:
+        cache_key = llm_cache.make_key("summary_chunk", chunk, signature=CHUNK_SUMMARY_SIGNATURE, detail_level=detail_level)
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # No web tool here, one search per chunk would multiply the scraping for little gain
+        agent = agent_registry.get_agent(
+            "summary_chunk",
+            str,
+            system_prompt=CHUNK_SUMMARY_INSTRUCTIONS,
+            prompt_builder=_chunk_summary_prompt,
+            deps_type=ChunkSummaryParams
+        )
+
+        prompt = content_prompt(document=chunk)
+        async with semaphore:
+            response = await agent_registry.run("summary_chunk", agent, prompt, deps=ChunkSummaryParams(detail_level))
+        await llm_cache.set(cache_key, response.data)
         return response.data
 
+    async def _condense(self, text: str, detail_level: str) -> str:
+        """
+        Returns the text as is when it fits in one chunk. Otherwise the chunks are summarized concurrently
+        and their notes are joined, repeating on the notes until they fit, so the final summary sees the whole document.
+        """
+        semaphore = asyncio.Semaphore(SUMMARY_MAP_CONCURRENCY)
+
+        while estimate_tokens(text) > SUMMARY_CHUNK_TOKENS:
+            chunks = split_into_chunks(text)
+            notes = await asyncio.gather(*(self._summarize_chunk(chunk, detail_level, semaphore) for chunk in chunks))
+            condensed = "\n\n".join(notes)
+
+            logging.info(f"Condensed {estimate_tokens(text)} tokens in {len(chunks)} chunks to {estimate_tokens(condensed)} tokens")
+            if len(condensed) >= len(text):
+                break
+            text = condensed
+
+        return text
+
+summary_question_generator_agent = SummaryQuestionGeneratorAgent()
+
+
 def get_summary_question_generator_agent():
     """
-    Returns an instance of the SummaryQuestionGeneratorAgent.
+    Returns the shared instance of the SummaryQuestionGeneratorAgent.
     """
-    return SummaryQuestionGeneratorAgent()
+    return summary_question_generator_agent
+
+
+
+STUDY_PLAN_INSTRUCTIONS = (
+    "You are an expert educational consultant specialized in creating comprehensive study plans. "
+    "Analyze the provided information about the topic and create a detailed, structured learning path. "
+    "Focus on organizing the content logically from foundational concepts to advanced applications. "
 
+    "For the study plan, include these components:\n"
+    "1. An overview of the topic\n"
+    "2. Learning objectives\n"
+    "3. A progressive sequence of topics to study, from basic to advanced\n"
+    "4. Recommended resources (books, videos, websites, etc.) for each section\n"
+    "5. Practice exercises or activities for each section\n"
+    "6. Estimated time to complete each section\n"
+    "7. Assessment methods to check understanding\n"
+
+    "The structure of your response should be well-organized with clear sections and subsections. "
+    "Make the plan adaptable for different learning styles. "
+    "Use the search_knowledge tool to retrieve reference material on the topic."
+)
+
+STUDY_PLAN_SIGNATURE = prompt_signature(StudyPlanData, STUDY_PLAN_INSTRUCTIONS)
 
 
 class StudyPlanAgent:
     def __init__(self):
-        self.model = GeminiModel('gemini-1.5-flash', api_key=API_KEY)
-        self.headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
+        self.headers = WebScraper.headers
         self.web_scraper = WebScraper()
+        self.knowledge = KnowledgeSearch(self.web_scraper)
+        self.tools = [Tool(self.knowledge.search_knowledge)]
 
     
     async def generate_study_plan(self, topic: str) -> StudyPlanData:
         """
         Generates a comprehensive study plan for the given topic
         """
+        cache_key = llm_cache.make_key("studyplan", topic, signature=STUDY_PLAN_SIGNATURE)
+        cached = await llm_cache.get(cache_key)
+        if cached is not None:
+            return StudyPlanData.model_validate_json(cached)
+
         try:
-            agent = Agent(
-                self.model,
-                result_type=StudyPlanData,  
-                system_prompt=(
-                    "You are an expert educational consultant specialized in creating comprehensive study plans. "
-                    "Analyze the provided information about the topic and create a detailed, structured learning path. "
-                    "Focus on organizing the content logically from foundational concepts to advanced applications. "
-                    
-                    "For the study plan, include these components:\n"
-                    "1. An overview of the topic\n"
-                    "2. Learning objectives\n"
-                    "3. A progressive sequence of topics to study, from basic to advanced\n"
-                    "4. Recommended resources (books, videos, websites, etc.) for each section\n"
-                    "5. Practice exercises or activities for each section\n"
-                    "6. Estimated time to complete each section\n"
-                    "7. Assessment methods to check understanding\n"
-                    
-                    "The structure of your response should be well-organized with clear sections and subsections. "
-                    "Make the plan adaptable for different learning styles."
-                    "Make use of the web_scraper.search_web function in order to retrieve additional information from the web."
-                ),
-                tools=[Tool(self.web_scraper.search_web)]
+            agent = agent_registry.get_agent(
+                "studyplan",
+                StudyPlanData,
+                system_prompt=STUDY_PLAN_INSTRUCTIONS,
+                tools=self.tools
             )
             
-            response = await agent.run(topic)
+            response = await agent_registry.run("studyplan", agent, topic)
             study_plan_data = response.data
+            await llm_cache.set(cache_key, study_plan_data.model_dump_json())
+            await self.knowledge.add(f"studyplan:{cache_key}", "studyplan", study_plan_data.topic, study_plan_text(study_plan_data))
             return study_plan_data
         
         except Exception as e:
-            print(f"Error generating study plan: {str(e)}")
+            logging.error(f"Error generating study plan: {e}")
             # Return a valid StudyPlanData object with error information
             return StudyPlanData(
                 topic=topic,
@@ -317,83 +1508,106 @@ class StudyPlanAgent:
                 error=str(e)
             )
     
-    async def generate_quick_reference_guide(self, topic: str) -> str:
+    async def _build_quick_reference_guide(self, topic: str) -> str:
         """
-        Generates a markdown-formatted quick reference guide for the given topic
+        Runs the quick reference agent for the given topic. Errors are propagated to the caller.
+        """
+        agent = agent_registry.get_agent(
+            "quick_reference",
+            str,
+            system_prompt=(
+                "You are an expert at creating concise, information-dense quick reference guides. "
+                "Create a markdown-formatted quick reference guide for the given topic. "
+                "The guide should be structured as follows:\n"
+                "1. A brief description of the topic (2-3 sentences)\n"
+                "2. Key concepts and definitions (use a table or bullet points)\n"
+                "3. Important formulas or principles (if applicable)\n"
+                "4. Common applications or use cases\n"
+                "5. Quick tips for remembering important aspects\n"
+                
+                "The guide should be comprehensive yet concise, suitable for printing on 1-2 pages. "
+                "Use markdown formatting for clear structure: headings, tables, code blocks, etc. "
+                "Use the search_knowledge tool to retrieve reference material on the topic."
+            ),
+            tools=self.tools
+        )
+
+        response = await agent_registry.run("quick_reference", agent, topic)
+        return response.data
+
+    async def generate_quick_reference_guide(self, topic: str) -> Optional[str]:
+        """
+        Generates a markdown-formatted quick reference guide for the given topic, within QUICK_REFERENCE_TIMEOUT.
+        Returns None when it fails, so that no error text is stored as the guide.
         """
         try:
+            return await asyncio.wait_for(self._build_quick_reference_guide(topic), timeout=QUICK_REFERENCE_TIMEOUT)
 
-            agent = Agent(
-                self.model,
-                result_type=str,
-                system_prompt=(
-                    "You are an expert at creating concise, information-dense quick reference guides. "
-                    "Create a markdown-formatted quick reference guide for the given topic. "
-                    "The guide should be structured as follows:\n"
-                    "1. A brief description of the topic (2-3 sentences)\n"
-                    "2. Key concepts and definitions (use a table or bullet points)\n"
-                    "3. Important formulas or principles (if applicable)\n"
-                    "4. Common applications or use cases\n"
-                    "5. Quick tips for remembering important aspects\n"
-                    
-                    "The guide should be comprehensive yet concise, suitable for printing on 1-2 pages. "
-                    "Use markdown formatting for clear structure: headings, tables, code blocks, etc."
-                    "Make use of the web_scraper.extract_content_from_url function in order to retrieve additional information from the web."
-                    "Make use of the web_scraper.search_web function in order to retrieve additional information from the web."
-                ),
-            tools=[Tool(self.web_scraper.search_web)]
+        except Exception as e:
+            error = "timed out" if isinstance(e, asyncio.TimeoutError) else str(e)
+            logging.error(f"Error generating quick reference guide: {error}")
+            return None
 
+    async def generate_study_plan_with_reference(self, topic: str) -> Tuple[StudyPlanData, Optional[str]]:
+        """
+        Generates the study plan and the quick reference guide concurrently, each with its own timeout.
+        The quick reference is None if it failed or timed out, so that it can be filled in later.
+        """
+        plan_result, reference_result = await asyncio.gather(
+            asyncio.wait_for(self.generate_study_plan(topic), timeout=STUDY_PLAN_TIMEOUT),
+            asyncio.wait_for(self._build_quick_reference_guide(topic), timeout=QUICK_REFERENCE_TIMEOUT),
+            return_exceptions=True
+        )
+
+        if isinstance(plan_result, BaseException):
+            error = "timed out" if isinstance(plan_result, asyncio.TimeoutError) else str(plan_result)
+            logging.error(f"Error generating study plan: {error}")
+            plan_result = StudyPlanData(
+                topic=topic,
+                overview=f"Could not generate study plan due to an error: {error}",
+                learning_objectives=[],
+                sections=[],
+                total_estimated_time="",
+                error=error
             )
-            
-            
-            response = await agent.run(topic)
-            return response.data
-        
-        except Exception as e:
-            print(f"Error generating quick reference guide: {str(e)}")
-            return f"# Error generating quick reference guide for {topic}\n\nThere was a problem creating your reference guide: {str(e)}"
+
+        if isinstance(reference_result, BaseException):
+            error = "timed out" if isinstance(reference_result, asyncio.TimeoutError) else str(reference_result)
+            logging.error(f"Error generating quick reference guide: {error}")
+            reference_result = None
+
+        return plan_result, reference_result
+
+
+study_plan_agent = StudyPlanAgent()
 
 
 def get_study_plan_agent():
     """
-    Returns an instance of the StudyPlanAgent.
+    Returns the shared instance of the StudyPlanAgent.
     """
-    return StudyPlanAgent()
+    return study_plan_agent
 
 
 class InterviewAgent:
-    def __init__(self):
-        self.model = GeminiModel('gemini-1.5-flash', api_key=API_KEY)
-
     async def generate_interview_questions(self, role: str, interview_type: str, level: str, techstack: List[str], num_questions: int) -> List[str]:
         """
         Generates interview questions based on the specified parameters.
         """
-        techstack_str = ", ".join(techstack)
-        prompt = (
-            f"Prepare exactly {num_questions} interview questions for a job interview.\n"
-            f"The job role is: {role}.\n"
-            f"The job experience level is: {level}.\n"
-            f"The tech stack used in the job includes: {techstack_str}.\n"
-            f"The focus between behavioural and technical questions should lean towards: {interview_type}.\n"
-            f"Please return ONLY the questions themselves, without any introductory text, numbering, or explanations.\n"
-            f"The questions are going to be read by a voice assistant, so do not use special characters like '/' or '*' which might break the voice assistant. Use words instead if necessary (e.g., 'slash', 'star').\n"
-            f"Return the questions formatted exactly like this JSON array string:\n"
-            f'["Question 1", "Question 2", "Question 3"]\n\n'
-            f'Example for 3 questions: ["Tell me about a time you faced a technical challenge.", "Explain the concept of closures in JavaScript.", "How do you handle conflicts within a team?"]'
-        )
+        params = InterviewParams(role, interview_type, level, ", ".join(techstack), num_questions)
 
         try:
             # Using Agent to get structured output (a string that should be JSON)
-            agent = Agent(
-                self.model,
-                result_type=str, # Expecting a string that represents a JSON list
-                system_prompt=prompt
+            agent = agent_registry.get_agent(
+                "interview_questions",
+                str, # Expecting a string that represents a JSON list
+                system_prompt=INTERVIEW_QUESTIONS_INSTRUCTIONS,
+                prompt_builder=_interview_questions_prompt,
+                deps_type=InterviewParams
             )
 
-            # Run the agent with a simple input (the prompt itself contains all info)
-            # We pass a dummy input as Agent expects one, but our prompt is self-contained.
-            response = await agent.run("Generate questions based on the system prompt.")
+            # The system prompts hold all the info, the user prompt only asks for the questions
+            response = await agent_registry.run("interview_questions", agent, "Generate the interview questions.", deps=params)
 
             raw_questions_string = response.data
 
@@ -421,33 +1635,22 @@ class InterviewAgent:
             raise HTTPException(status_code=500, detail=f"Failed to generate interview questions: {str(e)}")
 
     async def review_interview(self, questions: str, answers: str):
-        agent = Agent(
-            self.model, 
-            result_type=List[InterviewReviewResponse],
-            system_prompt=(
-            "You are an expert interview coach and evaluator. Review the interview questions and the candidate's answers provided. "
-            f"Following are the questions asked to the user: {questions}"
-            f"Following are the answers to the questions asked: {answers}"
-            "For each answer, provide a comprehensive analysis with the following components:\n"
-            "1. Identify the category of the question (e.g., 'Technical Knowledge', 'Problem Solving', 'Communication Skills', 'Experience', 'Behavioral')\n"
-            "2. Assign a rating from 0 to 100, where:\n"
-            "   - 0-20: Poor/Inadequate response\n"
-            "   - 21-40: Below average response\n"
-            "   - 41-60: Average/Acceptable response\n"
-            "   - 61-80: Good/Strong response\n"
-            "   - 81-100: Excellent/Outstanding response\n"
-            "3. Provide a detailed review with specific strengths and areas for improvement, constructive feedback, and actionable suggestions.\n\n"
-            "Be objective, fair, and constructive in your evaluation. Focus on both content and delivery aspects of the answers. "
-            "Consider factors such as accuracy, completeness, clarity, relevance, and how well the candidate addressed the specific question asked."
-            )
+        agent = agent_registry.get_agent(
+            "interview_review",
+            List[InterviewReviewResponse],
+            system_prompt=INTERVIEW_REVIEW_INSTRUCTIONS
         )
         
-        response = await agent.run("Generate a review based on the system prompt")
+        prompt = content_prompt(questions=questions, answers=answers)
+        response = await agent_registry.run("interview_review", agent, prompt)
         return response.data
 
 
+interview_agent = InterviewAgent()
+
+
 def get_interview_agent():
     """
-    Returns an instance of the InterviewGenerationAgent.
+    Returns the shared instance of the InterviewAgent.
     """
-    return InterviewAgent()
+    return interview_agent
@@ -53,6 +53,35 @@ interface Interview {
   created_at: string;
 }
 
+// The list endpoints return one page at a time; the X-Next-Cursor header holds the cursor of the next page
+async function fetchAllPages<T>(url: string, token: string, label: string): Promise<T[]> {
+  const items: T[] = [];
+  let cursor: string | null = null;
+
+  do {
+    const pageUrl = new URL(url);
+    if (cursor) {
+      pageUrl.searchParams.set('cursor', cursor);
+    }
+
+    const response = await fetch(pageUrl.toString(), {
+      headers: {
+        'Content-Type': 'application/json',
+        'Authorization': `Bearer ${token}`,
+      },
+    });
+
+    if (!response.ok) {
+      throw new Error(`Failed to fetch ${label}: ${response.status} ${response.statusText}`);
+    }
+
+    items.push(...await response.json());
+    cursor = response.headers.get('X-Next-Cursor');
+  } while (cursor);
+
+  return items;
+}
+
 export default function ProfilePage() {
   const [tests, setTests] = useState<Test[]>([]);
   const [summaries, setSummaries] = useState<Summary[]>([]);
@@ -85,19 +114,8 @@ export default function ProfilePage() {
           throw new Error('Authentication token not found. Please log in.');
         }
         
-        // Fetch tests from API
-        const response = await fetch('http://localhost:8000/questions/my-tests', {
-          headers: {
-            'Content-Type': 'application/json',
-            'Authorization': `Bearer ${token}`,
-          },
-        });
-        
-        if (!response.ok) {
-          throw new Error(`Failed to fetch tests: ${response.status} ${response.statusText}`);
-        }
-        
-        const data = await response.json();
+        // Fetch tests from API, following the pages
+        const data = await fetchAllPages<Test>('http://localhost:8000/questions/my-tests', token, 'tests');
         setTests(data);
       } catch (err) {
         console.error('Error fetching tests:', err);
@@ -120,19 +138,8 @@ export default function ProfilePage() {
           throw new Error('Authentication token not found. Please log in.');
         }
         
-        // Fetch summaries from API
-        const response = await fetch('http://localhost:8000/summary', {
-          headers: {
-            'Content-Type': 'application/json',
-            'Authorization': `Bearer ${token}`,
-          },
-        });
-        
-        if (!response.ok) {
-          throw new Error(`Failed to fetch summaries: ${response.status} ${response.statusText}`);
-        }
-        
-        const data = await response.json();
+        // Fetch summaries from API, following the pages
+        const data = await fetchAllPages<Summary>('http://localhost:8000/summary/', token, 'summaries');
         setSummaries(data);
       } catch (err) {
         console.error('Error fetching summaries:', err);
@@ -156,19 +163,8 @@ export default function ProfilePage() {
           throw new Error('Authentication token not found. Please log in.');
         }
         
-        // Fetch study plans from API
-        const response = await fetch('http://localhost:8000/studyplan/', {
-          headers: {
-            'Content-Type': 'application/json',
-            'Authorization': `Bearer ${token}`,
-          },
-        });
-        
-        if (!response.ok) {
-          throw new Error(`Failed to fetch study plans: ${response.status} ${response.statusText}`);
-        }
-        
-        const data = await response.json();
+        // Fetch study plans from API, following the pages
+        const data = await fetchAllPages<StudyPlan>('http://localhost:8000/studyplan/', token, 'study plans');
         setStudyPlans(data);
       } catch (err) {
         console.error('Error fetching study plans:', err);
@@ -192,19 +188,8 @@ export default function ProfilePage() {
           throw new Error('Authentication token not found. Please log in.');
         }
         
-        // Fetch interviews from API
-        const response = await fetch('http://localhost:8000/interviews/', {
-          headers: {
-            'Content-Type': 'application/json',
-            'Authorization': `Bearer ${token}`,
-          },
-        });
-        
-        if (!response.ok) {
-          throw new Error(`Failed to fetch interviews: ${response.status} ${response.statusText}`);
-        }
-        
-        const data = await response.json();
+        // Fetch interviews from API, following the pages
+        const data = await fetchAllPages<Interview>('http://localhost:8000/interviews/', token, 'interviews');
         setInterviews(data);
       } catch (err) {
         console.error('Error fetching interviews:', err);